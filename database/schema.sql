@@ -46,10 +46,30 @@ CREATE TABLE mixpanel_event (
     refund_flag BOOLEAN DEFAULT FALSE,
     is_late_event BOOLEAN DEFAULT FALSE,
     trial_expiration_at_calc DATETIME, -- Changed from TEXT to DATETIME
-    event_json TEXT,
+    event_date DATE, -- UTC calendar date of event_time, stored at ingest for index range scans
+    product_id TEXT, -- properties.product_id, extracted from event_json at ingest
+    store TEXT, -- properties.store (raw, normalized by 04_assign_product_information)
+    device TEXT, -- properties.device
     FOREIGN KEY (distinct_id) REFERENCES mixpanel_user(distinct_id)
 );
 
+-- Raw Event Payloads
+-- Status: NEW - Full Mixpanel event JSON moved out of mixpanel_event to keep event rows narrow
+-- Purpose: zlib-compressed payload per event, read lazily (see utils/database_utils.get_event_payloads)
+CREATE TABLE mixpanel_event_payload (
+    event_uuid TEXT PRIMARY KEY, -- mixpanel_event.event_uuid
+    payload BLOB NOT NULL -- zlib-compressed event JSON
+);
+
+-- Identity Resolution Map
+-- Status: NEW - Maintained by 03_ingest_data at user ingest
+-- Purpose: $user_id aliases from user profiles -> canonical mixpanel_user.distinct_id, used to
+-- merge events tracked under a user's $user_id without re-parsing profile_json
+CREATE TABLE user_identity_map (
+    alias_id TEXT PRIMARY KEY, -- $user_id found on a user profile
+    distinct_id TEXT NOT NULL -- mixpanel_user.distinct_id owning the alias
+);
+
 -- CONSOLIDATED USER PRODUCT TABLE (REPLACES BOTH fact_user_products AND user_product_metrics)
 -- Status: CONSOLIDATED FROM ANALYTICS DB + PLANNED STRUCTURE
 -- Purpose: Complete user-product analytics with lifecycle tracking, attribution, and conversion metrics
@@ -214,6 +234,18 @@ CREATE TABLE processed_event_days (
     status TEXT -- 'complete', 'partial', 'failed'
 );
 
+-- Pre-processing Dirty-Set Ledger
+-- Status: NEW - Written by 03_ingest_data, 06_validate_event_lifecycle and the pre-processing run
+-- Purpose: user-product pairs whose credited date, price bucket, rates or value may be stale;
+-- incremental pre-processing works only on these and clears them when 03_estimate_values completes
+CREATE TABLE dirty_user_products (
+    distinct_id TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    reason TEXT, -- 'ingest', 'ingest_refresh', 'lifecycle_validation', 'value_window', 'rate_changed'
+    marked_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (distinct_id, product_id)
+);
+
 -- Dynamic Schema Discovery
 -- Status: EXISTS - No changes needed
 CREATE TABLE discovered_properties (
@@ -355,6 +387,8 @@ CREATE INDEX idx_mixpanel_user_abi_campaign_id ON mixpanel_user(abi_campaign_id)
 CREATE INDEX idx_mixpanel_user_abi_ad_set_id ON mixpanel_user(abi_ad_set_id); -- Attribution lookup
 
 -- Event table indexes
+CREATE INDEX idx_user_identity_map_distinct_id ON user_identity_map(distinct_id); -- Per-user alias refresh
+
 CREATE INDEX idx_mixpanel_event_distinct_id ON mixpanel_event(distinct_id);
 CREATE INDEX idx_mixpanel_event_name ON mixpanel_event(event_name);
 CREATE INDEX idx_mixpanel_event_time ON mixpanel_event(event_time);
@@ -363,6 +397,11 @@ CREATE INDEX idx_mixpanel_event_revenue ON mixpanel_event(revenue_usd);
 CREATE INDEX idx_mixpanel_event_abi_ad_id ON mixpanel_event(abi_ad_id); -- Attribution lookup
 CREATE INDEX idx_mixpanel_event_abi_campaign_id ON mixpanel_event(abi_campaign_id); -- Attribution lookup
 CREATE INDEX idx_mixpanel_event_abi_ad_set_id ON mixpanel_event(abi_ad_set_id); -- Attribution lookup
+CREATE INDEX idx_mixpanel_event_date ON mixpanel_event(event_date); -- Day-level deletes and date range scans
+CREATE INDEX idx_mixpanel_event_name_date ON mixpanel_event(event_name, event_date); -- Event type + date range filters
+CREATE INDEX idx_mixpanel_event_user_name_time ON mixpanel_event(distinct_id, event_name, event_time); -- Per-user event lookups
+CREATE INDEX idx_mixpanel_event_user_product ON mixpanel_event(distinct_id, product_id, event_time); -- User-product lifecycle scans
+CREATE INDEX idx_mixpanel_event_product_name ON mixpanel_event(product_id, event_name); -- Product filters by event type
 
 -- Consolidated User Product Metrics indexes (combines all analytics and lifecycle tracking indexes)
 CREATE INDEX idx_upm_distinct_id ON user_product_metrics (distinct_id);
@@ -459,6 +498,30 @@ CREATE TABLE daily_mixpanel_metrics (
     UNIQUE (date, entity_type, entity_id)
 );
 
+-- Daily Metrics Per-User State
+-- Status: NEW - Written by 08_compute_daily_metrics
+-- Purpose: each attributed user's contribution to daily_mixpanel_metrics as of the last run;
+-- incremental runs diff touched users against it to find the (entity, date) rows to recompute
+CREATE TABLE daily_metrics_user_state (
+    distinct_id TEXT PRIMARY KEY,
+    abi_campaign_id TEXT,
+    abi_ad_set_id TEXT,
+    abi_ad_id TEXT,
+    latest_trial_date DATE,           -- Latest 'RC Trial started' event_date
+    latest_purchase_date DATE,        -- Latest 'RC Initial purchase' event_date
+    estimated_revenue_usd REAL NOT NULL DEFAULT 0.0 -- SUM(current_value) over the user's products
+);
+
+-- Precomputed Data Version
+-- Status: NEW - Written when daily_mixpanel_metrics, id_name_mapping or id_hierarchy_mapping is republished
+-- Purpose: version number per precomputed table, increasing across all of them; full rebuilds are
+-- built in a <table>__shadow copy and renamed over the live table in the same transaction as the bump
+CREATE TABLE precomputed_data_version (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    published_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Performance Indexes for Pipeline Enhancement Tables
 CREATE INDEX idx_id_name_mapping_type_id ON id_name_mapping(entity_type, entity_id);
 CREATE INDEX idx_id_name_mapping_name ON id_name_mapping(canonical_name);
@@ -473,6 +536,10 @@ CREATE INDEX idx_daily_metrics_entity_type ON daily_mixpanel_metrics(entity_type
 CREATE INDEX idx_daily_metrics_date_range ON daily_mixpanel_metrics(date);
 CREATE INDEX idx_daily_metrics_computed ON daily_mixpanel_metrics(computed_at);
 
+CREATE INDEX idx_metrics_user_state_campaign ON daily_metrics_user_state(abi_campaign_id);
+CREATE INDEX idx_metrics_user_state_adset ON daily_metrics_user_state(abi_ad_set_id);
+CREATE INDEX idx_metrics_user_state_ad ON daily_metrics_user_state(abi_ad_id);
+
 -- ========================================
 -- MERGE BENEFITS & RELATIONSHIPS
 -- ========================================
@@ -197,6 +197,16 @@ class PipelineRunner:
         except Exception:
             pass  # Don't let websocket failures prevent status file updates
     
+    def build_step_command(self, step, relative_script_path):
+        """
+        Command line and environment for a step: optional 'args' (list) and 'env' (mapping)
+        keys in pipeline.yaml are appended to the command and layered over os.environ
+        """
+        command = ['python3', relative_script_path] + [str(arg) for arg in step.get('args', [])]
+        step_env = dict(os.environ)
+        step_env.update({key: str(value) for key, value in (step.get('env') or {}).items()})
+        return command, step_env
+    
     def run_step(self, pipeline_name, step_id):
         """Run a single step in a pipeline"""
         pipeline = self.pipelines.get(pipeline_name)
@@ -239,10 +249,12 @@ class PipelineRunner:
                 self.update_step_status(pipeline_name, step_id, 'running')
                 
                 # Run the step with Popen so we can track and cancel it
-                print(f"   Executing: python3 {relative_script_path}")
+                command, step_env = self.build_step_command(target_step, relative_script_path)
+                print(f"   Executing: {' '.join(command)}")
                 process = subprocess.Popen(
-                    ['python3', relative_script_path],
+                    command,
                     cwd=project_root,
+                    env=step_env,
                     stdout=None,  # Don't capture stdout - let it show live
                     stderr=None,  # Don't capture stderr - let it show live
                     text=True
@@ -394,10 +406,12 @@ class PipelineRunner:
                     self.update_step_status(pipeline_name, step['id'], 'running')
                     
                     # Run the step with Popen so we can track and cancel it
-                    print(f"   Executing: python3 {relative_script_path}")
+                    command, step_env = self.build_step_command(step, relative_script_path)
+                    print(f"   Executing: {' '.join(command)}")
                     process = subprocess.Popen(
-                        ['python3', relative_script_path],
+                        command,
                         cwd=project_root,
+                        env=step_env,
                         stdout=None,  # Don't capture stdout - let it show live
                         stderr=None,  # Don't capture stderr - let it show live
                         text=True
@@ -1527,41 +1541,91 @@ def conversion_probability_hierarchical():
     })
 
 # Pricing API endpoints
+def get_pricing_engine():
+    """Shared compiled pricing rules (the same engine the value estimator reads)"""
+    # Ensure project root is in path for utils import
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+    
+    from utils.pricing_rule_engine import get_pricing_rule_engine
+    return get_pricing_rule_engine()
+
 @app.route('/api/pricing/rules', methods=['GET'])
 def pricing_rules_get():
     """Get pricing rules"""
-    return jsonify({
-        "success": True,
-        "data": {
-            "rules": [],
-            "schema_version": "1.0",
-            "products": [],
-            "missing_products": []
-        },
-        "timestamp": now_in_timezone().isoformat()
-    })
+    try:
+        engine = get_pricing_engine()
+        rules_data = engine.get_rules_data()
+        return jsonify({
+            "success": True,
+            "data": {
+                "rules": rules_data.get('rules', []),
+                "schema_version": rules_data.get('schema_version', "1.0"),
+                "products": rules_data.get('products', {}),
+                "missing_products": [],
+                "version": engine.version
+            },
+            "timestamp": now_in_timezone().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Failed to load pricing rules: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/api/pricing/rules', methods=['POST'])
 def pricing_rules_post():
     """Create pricing rule"""
+    payload = request.get_json(silent=True) or {}
+    try:
+        rule = get_pricing_engine().create_rule(
+            product_id=payload.get('product_id'),
+            price_usd=payload.get('price_usd', 0),
+            start_date=payload.get('start_date'),
+            countries=payload.get('countries') or [],
+            notes=payload.get('notes', '')
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Failed to create pricing rule: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
     return jsonify({
         "success": True,
         "message": "Pricing rule created",
+        "data": rule,
         "timestamp": now_in_timezone().isoformat()
     })
 
 @app.route('/api/pricing/rules/<rule_id>', methods=['PUT'])
 def pricing_rules_put(rule_id):
     """Update pricing rule"""
+    payload = request.get_json(silent=True) or {}
+    try:
+        rule = get_pricing_engine().update_rule(rule_id, payload)
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Failed to update pricing rule {rule_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+    if rule is None:
+        return jsonify({"success": False, "error": f"Pricing rule {rule_id} not found"}), 404
     return jsonify({
         "success": True,
         "message": f"Pricing rule {rule_id} updated",
+        "data": rule,
         "timestamp": now_in_timezone().isoformat()
     })
 
 @app.route('/api/pricing/rules/<rule_id>', methods=['DELETE'])
 def pricing_rules_delete(rule_id):
     """Delete pricing rule"""
+    try:
+        deleted = get_pricing_engine().delete_rule(rule_id)
+    except Exception as e:
+        logger.error(f"Failed to delete pricing rule {rule_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+    if not deleted:
+        return jsonify({"success": False, "error": f"Pricing rule {rule_id} not found"}), 404
     return jsonify({
         "success": True,
         "message": f"Pricing rule {rule_id} deleted",
@@ -1571,10 +1635,16 @@ def pricing_rules_delete(rule_id):
 @app.route('/api/pricing/products', methods=['GET'])
 def pricing_products():
     """Get pricing products"""
+    try:
+        rules_data = get_pricing_engine().get_rules_data()
+        product_ids = set(rules_data.get('products', {})) | {rule['product_id'] for rule in rules_data.get('rules', [])}
+    except Exception as e:
+        logger.error(f"Failed to load pricing products: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
     return jsonify({
         "success": True,
         "data": {
-            "products": []
+            "products": [{"product_id": product_id} for product_id in sorted(product_ids)]
         },
         "timestamp": now_in_timezone().isoformat()
     })
@@ -1582,10 +1652,18 @@ def pricing_products():
 @app.route('/api/pricing/countries', methods=['GET'])
 def pricing_countries():
     """Get pricing countries"""
+    try:
+        rules_data = get_pricing_engine().get_rules_data()
+        countries = {country for rule in rules_data.get('rules', []) for country in rule['countries']}
+        for product_countries in rules_data.get('products', {}).values():
+            countries.update(product_countries)
+    except Exception as e:
+        logger.error(f"Failed to load pricing countries: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
     return jsonify({
         "success": True,
         "data": {
-            "countries": []
+            "countries": [{"country_code": country} for country in sorted(countries)]
         },
         "timestamp": now_in_timezone().isoformat()
     })
@@ -1601,10 +1679,15 @@ def pricing_repair_rules():
 
 @app.route('/api/pricing/rules/<rule_id>/history', methods=['GET'])
 def pricing_rule_history(rule_id):
-    """Get pricing rule history"""
+    """Get pricing rule history (the dashboard passes a product_id here)"""
+    try:
+        history = get_pricing_engine().get_rules_data().get('rule_history', {}).get(rule_id, [])
+    except Exception as e:
+        logger.error(f"Failed to load pricing rule history for {rule_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
     return jsonify({
         "success": True,
-        "data": [],
+        "data": {"history": history},
         "timestamp": now_in_timezone().isoformat()
     })
 
@@ -1908,13 +1991,13 @@ def mixpanel_debug_database_stats():
             # Get daily breakdown (last 30 days)
             cursor.execute("""
                 SELECT 
-                    DATE(event_time) as date,
+                    event_date as date,
                     COUNT(*) as events,
                     COUNT(DISTINCT distinct_id) as users,
                     COUNT(DISTINCT event_name) as uniqueEvents
                 FROM mixpanel_event
-                WHERE event_time >= DATE('now', '-30 days')
-                GROUP BY DATE(event_time)
+                WHERE event_date >= DATE('now', '-30 days')
+                GROUP BY event_date
                 ORDER BY date DESC
                 LIMIT 30
             """)
@@ -1962,7 +2045,7 @@ def mixpanel_debug_user_events():
         if project_root not in sys.path:
             sys.path.insert(0, project_root)
         
-        from utils.database_utils import get_database_connection
+        from utils.database_utils import get_database_connection, decompress_event_payload
         from flask import request
         
         user_id = request.args.get('user_id')
@@ -1977,26 +2060,27 @@ def mixpanel_debug_user_events():
             # Get all events for the user, ordered by time
             cursor.execute("""
                 SELECT 
-                    event_name,
-                    event_time,
-                    revenue_usd,
-                    raw_amount,
-                    currency,
-                    refund_flag,
-                    event_json
-                FROM mixpanel_event
-                WHERE distinct_id = ?
-                ORDER BY event_time ASC
+                    e.event_name,
+                    e.event_time,
+                    e.revenue_usd,
+                    e.raw_amount,
+                    e.currency,
+                    e.refund_flag,
+                    p.payload
+                FROM mixpanel_event e
+                LEFT JOIN mixpanel_event_payload p ON p.event_uuid = e.event_uuid
+                WHERE e.distinct_id = ?
+                ORDER BY e.event_time ASC
             """, (user_id,))
             
             events = []
             for row in cursor.fetchall():
-                # Parse event properties from JSON if available
+                # Decompress and parse the stored event payload if available
                 properties = {}
-                if row[6]:  # event_json
+                if row[6]:  # compressed payload
                     try:
                         import json
-                        properties = json.loads(row[6])
+                        properties = json.loads(decompress_event_payload(row[6]))
                     except:
                         properties = {}
                 
@@ -3122,7 +3122,7 @@ class AnalyticsQueryService:
                                 SELECT event_time 
                                 FROM mixpanel_event 
                                 WHERE distinct_id = ? 
-                                  AND JSON_EXTRACT(event_json, '$.properties.product_id') = ?
+                                  AND product_id = ?
                                   AND event_name = 'RC Trial started'
                                 ORDER BY event_time DESC
                                 LIMIT 1
@@ -3230,11 +3230,11 @@ class AnalyticsQueryService:
                     batch_events_query = f"""
                     SELECT 
                         distinct_id,
-                        JSON_EXTRACT(event_json, '$.properties.product_id') as product_id,
+                        product_id,
                         event_name,
                         CASE WHEN revenue_usd < 0 THEN 1 ELSE 0 END as is_refund
                     FROM mixpanel_event 
-                    WHERE (distinct_id, JSON_EXTRACT(event_json, '$.properties.product_id')) IN (VALUES {placeholders})
+                    WHERE (distinct_id, product_id) IN (VALUES {placeholders})
                       AND event_name IN ('RC Trial converted', 'RC Initial purchase', 'RC Cancellation')
                     """
                     
@@ -3792,7 +3792,7 @@ class AnalyticsQueryService:
                 # Query for trial/purchase events aggregated by event date
                 events_query = """
                 SELECT 
-                    DATE(e.event_time) as date,
+                    e.event_date as date,
                     COUNT(DISTINCT CASE WHEN e.event_name = 'RC Trial started' THEN u.distinct_id END) as daily_mixpanel_trials,
                     COUNT(DISTINCT CASE WHEN e.event_name = 'RC Initial purchase' THEN u.distinct_id END) as daily_mixpanel_purchases,
                     COUNT(DISTINCT CASE WHEN e.event_name = 'RC Initial purchase' THEN u.distinct_id END) as daily_mixpanel_conversions,
@@ -3800,11 +3800,11 @@ class AnalyticsQueryService:
                     COALESCE(SUM(CASE WHEN e.event_name = 'RC Cancellation' THEN ABS(e.revenue_usd) ELSE 0 END), 0) as daily_mixpanel_refunds
                 FROM mixpanel_event e
                 JOIN mixpanel_user u ON e.distinct_id = u.distinct_id
-                WHERE DATE(e.event_time) BETWEEN ? AND ?
+                WHERE e.event_date BETWEEN ? AND ?
                   AND u.has_abi_attribution = TRUE
                   AND e.event_name IN ('RC Trial started', 'RC Initial purchase', 'RC Cancellation')
-                GROUP BY DATE(e.event_time)
-                ORDER BY DATE(e.event_time)
+                GROUP BY e.event_date
+                ORDER BY e.event_date
                 """
                 
                 mixpanel_cursor.execute(events_query, [start_date, end_date])
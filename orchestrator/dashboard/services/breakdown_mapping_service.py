@@ -489,9 +489,9 @@ class BreakdownMappingService:
                         mixpanel_query = """
                             SELECT 
                                 COUNT(DISTINCT u.distinct_id) as total_users,
-                                SUM(CASE WHEN e.event_name = 'RC Trial started' AND DATE(e.event_time) BETWEEN ? AND ? THEN 1 ELSE 0 END) as mixpanel_trials,
-                                SUM(CASE WHEN e.event_name = 'RC Initial purchase' AND DATE(e.event_time) BETWEEN ? AND ? THEN 1 ELSE 0 END) as mixpanel_purchases,
-                                SUM(CASE WHEN e.event_name = 'RC Initial purchase' AND DATE(e.event_time) BETWEEN ? AND ? THEN COALESCE(e.revenue_usd, 0) ELSE 0 END) as mixpanel_revenue
+                                SUM(CASE WHEN e.event_name = 'RC Trial started' AND e.event_date BETWEEN ? AND ? THEN 1 ELSE 0 END) as mixpanel_trials,
+                                SUM(CASE WHEN e.event_name = 'RC Initial purchase' AND e.event_date BETWEEN ? AND ? THEN 1 ELSE 0 END) as mixpanel_purchases,
+                                SUM(CASE WHEN e.event_name = 'RC Initial purchase' AND e.event_date BETWEEN ? AND ? THEN COALESCE(e.revenue_usd, 0) ELSE 0 END) as mixpanel_revenue
                             FROM mixpanel_user u
                             LEFT JOIN mixpanel_event e ON u.distinct_id = e.distinct_id
                             WHERE u.country = ? AND u.abi_campaign_id = ?
@@ -501,9 +501,9 @@ class BreakdownMappingService:
                         mixpanel_query = """
                             SELECT 
                                 COUNT(DISTINCT u.distinct_id) as total_users,
-                                SUM(CASE WHEN e.event_name = 'RC Trial started' AND DATE(e.event_time) BETWEEN ? AND ? THEN 1 ELSE 0 END) as mixpanel_trials,
-                                SUM(CASE WHEN e.event_name = 'RC Initial purchase' AND DATE(e.event_time) BETWEEN ? AND ? THEN 1 ELSE 0 END) as mixpanel_purchases,
-                                SUM(CASE WHEN e.event_name = 'RC Initial purchase' AND DATE(e.event_time) BETWEEN ? AND ? THEN COALESCE(e.revenue_usd, 0) ELSE 0 END) as mixpanel_revenue
+                                SUM(CASE WHEN e.event_name = 'RC Trial started' AND e.event_date BETWEEN ? AND ? THEN 1 ELSE 0 END) as mixpanel_trials,
+                                SUM(CASE WHEN e.event_name = 'RC Initial purchase' AND e.event_date BETWEEN ? AND ? THEN 1 ELSE 0 END) as mixpanel_purchases,
+                                SUM(CASE WHEN e.event_name = 'RC Initial purchase' AND e.event_date BETWEEN ? AND ? THEN COALESCE(e.revenue_usd, 0) ELSE 0 END) as mixpanel_revenue
                             FROM mixpanel_user u
                             LEFT JOIN mixpanel_event e ON u.distinct_id = e.distinct_id
                             WHERE u.country = ? AND u.abi_ad_set_id = ?
@@ -513,9 +513,9 @@ class BreakdownMappingService:
                         mixpanel_query = """
                             SELECT 
                                 COUNT(DISTINCT u.distinct_id) as total_users,
-                                SUM(CASE WHEN e.event_name = 'RC Trial started' AND DATE(e.event_time) BETWEEN ? AND ? THEN 1 ELSE 0 END) as mixpanel_trials,
-                                SUM(CASE WHEN e.event_name = 'RC Initial purchase' AND DATE(e.event_time) BETWEEN ? AND ? THEN 1 ELSE 0 END) as mixpanel_purchases,
-                                SUM(CASE WHEN e.event_name = 'RC Initial purchase' AND DATE(e.event_time) BETWEEN ? AND ? THEN COALESCE(e.revenue_usd, 0) ELSE 0 END) as mixpanel_revenue
+                                SUM(CASE WHEN e.event_name = 'RC Trial started' AND e.event_date BETWEEN ? AND ? THEN 1 ELSE 0 END) as mixpanel_trials,
+                                SUM(CASE WHEN e.event_name = 'RC Initial purchase' AND e.event_date BETWEEN ? AND ? THEN 1 ELSE 0 END) as mixpanel_purchases,
+                                SUM(CASE WHEN e.event_name = 'RC Initial purchase' AND e.event_date BETWEEN ? AND ? THEN COALESCE(e.revenue_usd, 0) ELSE 0 END) as mixpanel_revenue
                             FROM mixpanel_user u
                             LEFT JOIN mixpanel_event e ON u.distinct_id = e.distinct_id
                             WHERE u.country = ? AND u.abi_ad_id = ?
@@ -76,10 +76,23 @@ def create_minimal_database_structure(conn):
         refund_flag BOOLEAN DEFAULT FALSE,
         is_late_event BOOLEAN DEFAULT FALSE,
         trial_expiration_at_calc DATETIME,
-        event_json TEXT,
+        event_date DATE,
+        product_id TEXT,
+        store TEXT,
+        device TEXT,
         FOREIGN KEY (distinct_id) REFERENCES mixpanel_user(distinct_id)
     );
 
+    CREATE TABLE IF NOT EXISTS mixpanel_event_payload (
+        event_uuid TEXT PRIMARY KEY,
+        payload BLOB NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS user_identity_map (
+        alias_id TEXT PRIMARY KEY,
+        distinct_id TEXT NOT NULL
+    );
+
     CREATE TABLE IF NOT EXISTS user_product_metrics (
         user_product_id INTEGER PRIMARY KEY AUTOINCREMENT,
         distinct_id TEXT NOT NULL,
@@ -105,6 +118,14 @@ def create_minimal_database_structure(conn):
         FOREIGN KEY (distinct_id) REFERENCES mixpanel_user(distinct_id)
     );
 
+    CREATE TABLE IF NOT EXISTS dirty_user_products (
+        distinct_id TEXT NOT NULL,
+        product_id TEXT NOT NULL,
+        reason TEXT,
+        marked_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (distinct_id, product_id)
+    );
+
     CREATE TABLE IF NOT EXISTS pipeline_status (
         id INTEGER PRIMARY KEY,
         status TEXT NOT NULL,
@@ -121,8 +142,12 @@ def create_minimal_database_structure(conn):
 
     -- Create basic indexes
     CREATE INDEX IF NOT EXISTS idx_mixpanel_user_country ON mixpanel_user(country);
+    CREATE INDEX IF NOT EXISTS idx_user_identity_map_distinct_id ON user_identity_map(distinct_id);
     CREATE INDEX IF NOT EXISTS idx_mixpanel_event_distinct_id ON mixpanel_event(distinct_id);
     CREATE INDEX IF NOT EXISTS idx_mixpanel_event_time ON mixpanel_event(event_time);
+    CREATE INDEX IF NOT EXISTS idx_mixpanel_event_date ON mixpanel_event(event_date);
+    CREATE INDEX IF NOT EXISTS idx_mixpanel_event_name_date ON mixpanel_event(event_name, event_date);
+    CREATE INDEX IF NOT EXISTS idx_mixpanel_event_user_product ON mixpanel_event(distinct_id, product_id, event_time);
     CREATE INDEX IF NOT EXISTS idx_upm_distinct_id ON user_product_metrics (distinct_id);
     CREATE INDEX IF NOT EXISTS idx_upm_credited_date ON user_product_metrics (credited_date);
     """
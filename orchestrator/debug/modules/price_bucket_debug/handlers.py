@@ -139,7 +139,7 @@ def _get_price_bucket_table_data(conn: sqlite3.Connection) -> List[Dict[str, Any
                         WHEN EXISTS(
                             SELECT 1 FROM mixpanel_event me 
                             WHERE me.distinct_id = upm.distinct_id 
-                            AND JSON_EXTRACT(me.event_json, '$.properties.product_id') = upm.product_id
+                            AND me.product_id = upm.product_id
                             AND me.event_name = 'RC Initial purchase'
                             AND me.revenue_usd > 0
                             LIMIT 1
@@ -147,7 +147,7 @@ def _get_price_bucket_table_data(conn: sqlite3.Connection) -> List[Dict[str, Any
                         WHEN EXISTS(
                             SELECT 1 FROM mixpanel_event me 
                             WHERE me.distinct_id = upm.distinct_id 
-                            AND JSON_EXTRACT(me.event_json, '$.properties.product_id') = upm.product_id
+                            AND me.product_id = upm.product_id
                             AND me.event_name = 'RC Trial converted'
                             AND me.revenue_usd > 0
                             LIMIT 1
@@ -263,7 +263,7 @@ def handle_search_data(request_data: Dict[str, Any]) -> Dict[str, Any]:
                             WHEN EXISTS(
                                 SELECT 1 FROM mixpanel_event me 
                                 WHERE me.distinct_id = upm.distinct_id 
-                                AND JSON_EXTRACT(me.event_json, '$.properties.product_id') = upm.product_id
+                                AND me.product_id = upm.product_id
                                 AND me.event_name = 'RC Initial purchase'
                                 AND me.revenue_usd > 0
                                 LIMIT 1
@@ -271,7 +271,7 @@ def handle_search_data(request_data: Dict[str, Any]) -> Dict[str, Any]:
                             WHEN EXISTS(
                                 SELECT 1 FROM mixpanel_event me 
                                 WHERE me.distinct_id = upm.distinct_id 
-                                AND JSON_EXTRACT(me.event_json, '$.properties.product_id') = upm.product_id
+                                AND me.product_id = upm.product_id
                                 AND me.event_name = 'RC Trial converted'
                                 AND me.revenue_usd > 0
                                 LIMIT 1
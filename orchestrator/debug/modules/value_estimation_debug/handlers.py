@@ -147,17 +147,17 @@ class ValueEstimationDebugger:
             cursor.execute("""
                 SELECT 
                     e.distinct_id,
-                    JSON_EXTRACT(e.event_json, '$.properties.product_id') as product_id,
+                    e.product_id,
                     e.event_time,
                     upm.value_status,
                     CASE 
-                        WHEN JULIANDAY('now') - JULIANDAY(DATE(e.event_time)) <= 7 THEN 'phase_1_0_7_days'
-                        WHEN JULIANDAY('now') - JULIANDAY(DATE(e.event_time)) <= 37 THEN 'phase_2_8_37_days'
+                        WHEN JULIANDAY('now') - JULIANDAY(e.event_date) <= 7 THEN 'phase_1_0_7_days'
+                        WHEN JULIANDAY('now') - JULIANDAY(e.event_date) <= 37 THEN 'phase_2_8_37_days'
                         ELSE 'phase_3_38_plus_days'
                     END as phase
                 FROM mixpanel_event e
                 JOIN user_product_metrics upm ON e.distinct_id = upm.distinct_id 
-                    AND JSON_EXTRACT(e.event_json, '$.properties.product_id') = upm.product_id
+                    AND e.product_id = upm.product_id
                 JOIN mixpanel_user u ON e.distinct_id = u.distinct_id
                 WHERE e.event_name = 'RC Trial started'
                   AND upm.valid_lifecycle = 1 AND u.valid_user = 1
@@ -335,7 +335,7 @@ class ValueEstimationDebugger:
                 SELECT event_name, event_time, revenue_usd, refund_flag
                 FROM mixpanel_event
                 WHERE distinct_id = ?
-                  AND JSON_EXTRACT(event_json, '$.properties.product_id') = ?
+                  AND product_id = ?
                   AND event_name IN ('RC Trial started', 'RC Trial cancelled', 'RC Trial converted', 'RC Initial purchase', 'RC Cancellation')
                 ORDER BY event_time
             """, (distinct_id, product_id))
@@ -8,7 +8,8 @@ from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 import logging
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from . import meta_service
 import sys
 import os
@@ -22,6 +23,14 @@ from ...utils.timezone_utils import now_in_timezone
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Days fetched concurrently by a collection job (upper bound; errors and high API usage lower it)
+HISTORICAL_COLLECTION_WORKERS = int(os.getenv('META_HISTORICAL_WORKERS', 4))
+# Day statuses and job counters are written once this many days finish, or after this many seconds
+HISTORICAL_PROGRESS_BATCH_DAYS = int(os.getenv('META_HISTORICAL_PROGRESS_BATCH_DAYS', 10))
+HISTORICAL_PROGRESS_FLUSH_SECONDS = float(os.getenv('META_HISTORICAL_PROGRESS_FLUSH_SECONDS', 5))
+# A job stops after this many failed days in a row
+HISTORICAL_MAX_CONSECUTIVE_FAILURES = 3
+
 # Database file path - use the centralized database utilities
 def get_db_path():
     """Get the Meta Analytics database path using the centralized database utilities"""
@@ -85,6 +94,34 @@ class CollectionProgress:
         if self.errors is None:
             self.errors = []
 
+class AdaptiveConcurrency:
+    """
+    Additive-increase / multiplicative-decrease limit on in-flight day requests.
+    
+    A failed day halves the limit; a full round of successes at low API usage raises it
+    by one, up to max_limit. Usage above META_API_SLOWDOWN_PCT (as last reported by the
+    shared meta_service rate limiter) lowers it by one per completed day.
+    """
+    
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.successes = 0
+    
+    def record(self, success: bool):
+        usage_pct = meta_service.get_meta_rate_limiter().usage_pct
+        if not success:
+            self.limit = max(1, self.limit // 2)
+            self.successes = 0
+        elif usage_pct > meta_service.META_API_SLOWDOWN_PCT:
+            self.limit = max(1, self.limit - 1)
+            self.successes = 0
+        else:
+            self.successes += 1
+            if self.successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self.successes = 0
+
 class MetaHistoricalService:
     """Service for managing historical Meta data collection"""
     
@@ -284,9 +321,13 @@ class MetaHistoricalService:
         
         return None
     
-    def fetch_single_day_with_retry(self, date: str, config: RequestConfig, max_retries: int = 3) -> Tuple[bool, Optional[str]]:
-        """Fetch data for a single day with retry logic"""
+    def _fetch_day(self, date: str, config: RequestConfig, max_retries: int = 3,
+                   progress: Optional[CollectionProgress] = None) -> Tuple[Optional[Dict], Optional[str]]:
+        """Fetch one day from the Meta API with retries (no database access, safe on worker threads)"""
         for attempt in range(max_retries):
+            if progress is not None and progress.status == 'cancelled':
+                return None, "Job cancelled"
+            
             try:
                 logger.info(f"Fetching data for {date} (attempt {attempt + 1}/{max_retries})")
                 
@@ -304,13 +345,9 @@ class MetaHistoricalService:
                     if attempt < max_retries - 1:
                         time.sleep(2 ** attempt)  # Exponential backoff
                         continue
-                    return False, error
+                    return None, error
                 
-                # Save the data
-                if self.save_day_data(date, config, result):
-                    return True, None
-                else:
-                    return False, "Failed to save data to database"
+                return result, None
                     
             except Exception as e:
                 error_msg = f"Exception during fetch for {date}: {str(e)}"
@@ -318,9 +355,9 @@ class MetaHistoricalService:
                 if attempt < max_retries - 1:
                     time.sleep(2 ** attempt)
                     continue
-                return False, error_msg
+                return None, error_msg
         
-        return False, f"Failed after {max_retries} attempts"
+        return None, f"Failed after {max_retries} attempts"
     
     def get_date_range_list(self, start_date: str, end_date: str) -> List[str]:
         """Generate list of dates between start and end date (inclusive)"""
@@ -385,46 +422,73 @@ class MetaHistoricalService:
         return job_id
     
     def _run_collection_job(self, job_id: str, missing_dates: List[str], config: RequestConfig):
-        """Run the actual collection job"""
+        """
+        Run the actual collection job.
+        
+        Days are fetched on a worker pool (pacing is left to the shared meta_service rate
+        limiter) with the number in flight adjusted by AdaptiveConcurrency. Fetched days are
+        saved on this thread, and day statuses plus job counters are persisted in batches.
+        Cancellation stops new fetches; days already in flight are still saved.
+        """
         progress = self.collection_progress[job_id]
+        concurrency = AdaptiveConcurrency(HISTORICAL_COLLECTION_WORKERS)
+        queued = deque(missing_dates)
+        in_flight = {}  # future -> date
+        day_updates = []  # (date, status, error_message) not yet persisted
+        last_flush = time.monotonic()
+        consecutive_failures = 0
         
         try:
-            for i, date in enumerate(missing_dates):
-                # Check if job was cancelled
-                if progress.status == 'cancelled':
-                    break
-                
-                progress.current_date = date
-                
-                # Add rate limiting delay
-                if i > 0:
-                    time.sleep(1)  # 1 second delay between requests
-                
-                # Attempt to fetch data for this date
-                success, error = self.fetch_single_day_with_retry(date, config)
-                
-                if success:
-                    progress.completed_days += 1
-                    self._update_day_job_status(job_id, date, 'completed')
-                else:
-                    progress.failed_days += 1
-                    progress.errors.append({
-                        'date': date,
-                        'error': error,
-                        'timestamp': now_in_timezone().isoformat()
-                    })
-                    self._update_day_job_status(job_id, date, 'failed', error_message=error)
+            with ThreadPoolExecutor(max_workers=max(1, HISTORICAL_COLLECTION_WORKERS)) as executor:
+                while queued or in_flight:
+                    # Check if job was cancelled (or stopped after repeated failures)
+                    if progress.status != 'running':
+                        queued.clear()
                     
-                    # If we have too many consecutive failures, stop
-                    if len(progress.errors) >= 3:
-                        last_errors = progress.errors[-3:]
-                        if all(err['date'] in missing_dates[max(0, i-2):i+1] for err in last_errors):
-                            logger.error(f"Too many consecutive failures in job {job_id}, stopping")
-                            progress.status = 'failed'
-                            break
-                
-                # Update job progress in database
-                self._update_collection_job_progress(job_id, progress)
+                    while queued and len(in_flight) < concurrency.limit:
+                        date = queued.popleft()
+                        in_flight[executor.submit(self._fetch_day, date, config, 3, progress)] = date
+                    
+                    if not in_flight:
+                        break
+                    progress.current_date = min(in_flight.values())
+                    
+                    done, _ = wait(list(in_flight), timeout=HISTORICAL_PROGRESS_FLUSH_SECONDS,
+                                   return_when=FIRST_COMPLETED)
+                    for future in done:
+                        date = in_flight.pop(future)
+                        result, error = future.result()
+                        if not error and not self.save_day_data(date, config, result):
+                            error = "Failed to save data to database"
+                        
+                        if not error:
+                            progress.completed_days += 1
+                            consecutive_failures = 0
+                            day_updates.append((date, 'completed', None))
+                        elif progress.status == 'cancelled':
+                            continue
+                        else:
+                            progress.failed_days += 1
+                            consecutive_failures += 1
+                            progress.errors.append({
+                                'date': date,
+                                'error': error,
+                                'timestamp': now_in_timezone().isoformat()
+                            })
+                            day_updates.append((date, 'failed', error))
+                            
+                            # If we have too many consecutive failures, stop
+                            if consecutive_failures >= HISTORICAL_MAX_CONSECUTIVE_FAILURES and progress.status == 'running':
+                                logger.error(f"Too many consecutive failures in job {job_id}, stopping")
+                                progress.status = 'failed'
+                        concurrency.record(not error)
+                    
+                    # Update job progress in database
+                    if len(day_updates) >= HISTORICAL_PROGRESS_BATCH_DAYS or \
+                            time.monotonic() - last_flush >= HISTORICAL_PROGRESS_FLUSH_SECONDS:
+                        self._persist_job_progress(job_id, progress, day_updates)
+                        day_updates = []
+                        last_flush = time.monotonic()
             
             # Finalize job status
             if progress.status == 'running':
@@ -439,7 +503,7 @@ class MetaHistoricalService:
             progress.current_date = None
             
             # Final database update
-            self._update_collection_job_progress(job_id, progress)
+            self._persist_job_progress(job_id, progress, day_updates)
             
             logger.info(f"Collection job {job_id} finished with status: {progress.status}")
             
@@ -451,17 +515,22 @@ class MetaHistoricalService:
                 'error': f"Unexpected error: {str(e)}",
                 'timestamp': now_in_timezone().isoformat()
             })
-            self._update_collection_job_progress(job_id, progress)
+            self._persist_job_progress(job_id, progress, day_updates)
     
-    def _update_day_job_status(self, job_id: str, date: str, status: str, error_message: str = None):
-        """Update status for a specific day in a job"""
+    def _persist_job_progress(self, job_id: str, progress: CollectionProgress, day_updates: List[Tuple]):
+        """Write a batch of day statuses and the job counters in one transaction"""
         with sqlite3.connect(get_db_path()) as conn:
             cursor = conn.cursor()
-            cursor.execute('''
+            cursor.executemany('''
                 INSERT OR REPLACE INTO day_job_status 
                 (job_id, date, status, error_message, updated_at)
                 VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (job_id, date, status, error_message))
+            ''', [(job_id, date, status, error_message) for date, status, error_message in day_updates])
+            cursor.execute('''
+                UPDATE collection_jobs 
+                SET status = ?, completed_days = ?, failed_days = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE job_id = ?
+            ''', (progress.status, progress.completed_days, progress.failed_days, job_id))
             conn.commit()
     
     def _update_collection_job_progress(self, job_id: str, progress: CollectionProgress):
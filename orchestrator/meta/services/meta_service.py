@@ -14,6 +14,10 @@ Key throttling headers to monitor:
 
 Sustainable production rate: ~150-250 Insights requests/second
 Always prefer async jobs for date ranges > 1 day or heavy breakdowns.
+
+All Graph API calls share one keep-alive requests.Session and a token-bucket
+rate limiter (MetaRateLimiter) whose rate is retuned from those headers after
+every response, so callers may fetch from several threads at once.
 """
 
 import requests
@@ -21,6 +25,7 @@ import json
 import os
 import sys
 import time
+import threading
 from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
@@ -34,6 +39,199 @@ load_dotenv(env_file)
 
 logger = logging.getLogger(__name__)
 
+# Graph API host; point at a local stand-in to exercise the fetchers without Meta
+META_GRAPH_API_URL = os.getenv('META_GRAPH_API_URL', 'https://graph.facebook.com').rstrip('/')
+
+# Token bucket for Graph API calls: steady requests/second and burst size at low usage
+META_API_MAX_RPS = float(os.getenv('META_API_MAX_RPS', 10))
+META_API_BURST = int(os.getenv('META_API_BURST', 10))
+# Above this usage % (from the throttle headers) the rate scales down towards the floor...
+META_API_SLOWDOWN_PCT = float(os.getenv('META_API_SLOWDOWN_PCT', 60))
+META_API_MIN_RATE_FRACTION = 0.05
+# ...and at this usage % requests stop for META_API_PAUSE_SECONDS (see META_API_RATE_LIMITING_GUIDE.md)
+META_API_PAUSE_PCT = float(os.getenv('META_API_PAUSE_PCT', 90))
+META_API_PAUSE_SECONDS = float(os.getenv('META_API_PAUSE_SECONDS', 60))
+# Throttled requests (HTTP 429 or a rate-limit error code) are retried this many times
+META_API_MAX_RETRIES = int(os.getenv('META_API_MAX_RETRIES', 3))
+META_API_THROTTLE_ERROR_CODES = {4, 17, 32, 613, 80000, 80003, 80004, 80014}
+# Keep-alive connections kept per host by the shared session (>= concurrent workers)
+META_HTTP_POOL_SIZE = int(os.getenv('META_HTTP_POOL_SIZE', 16))
+
+
+class MetaRateLimiter:
+    """
+    Thread-safe token bucket shared by every Graph API call in the process.
+    
+    The refill rate starts at META_API_MAX_RPS and is steered by Meta's usage headers
+    (X-FB-Ads-Insights-Throttle, X-Business-Use-Case-Usage, X-App-Usage): it scales down
+    linearly once usage passes META_API_SLOWDOWN_PCT, and all callers pause when usage
+    reaches META_API_PAUSE_PCT or Meta reports a time to regain access.
+    """
+    
+    def __init__(self, rate=META_API_MAX_RPS, burst=META_API_BURST):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.usage_pct = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                    self.updated_at = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+    
+    def pause(self, seconds):
+        """Hold every caller back for at least the given number of seconds"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self.updated_at = max(self.updated_at, self.paused_until)
+    
+    def observe(self, headers):
+        """Retune the rate from a response's usage headers"""
+        usage_pct, regain_seconds = parse_usage_headers(headers)
+        if usage_pct is None:
+            return
+        
+        with self._lock:
+            self.usage_pct = usage_pct
+            if usage_pct <= META_API_SLOWDOWN_PCT:
+                fraction = 1.0
+            else:
+                fraction = max(META_API_MIN_RATE_FRACTION,
+                               (100 - usage_pct) / (100 - META_API_SLOWDOWN_PCT))
+            self.rate = self.max_rate * fraction
+        
+        if regain_seconds or usage_pct >= META_API_PAUSE_PCT:
+            logger.warning(f"Meta API usage at {usage_pct:.0f}%, pausing requests for "
+                           f"{max(regain_seconds, META_API_PAUSE_SECONDS):.0f}s")
+            self.pause(max(regain_seconds, META_API_PAUSE_SECONDS))
+
+
+def _parse_header_json(headers, name):
+    raw = headers.get(name)
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_usage_headers(headers):
+    """
+    Read Meta's usage headers.
+    
+    Returns:
+        tuple: (highest usage % reported or None if no usage header was present,
+                seconds until access is regained, 0 when not blocked)
+    """
+    percentages = []
+    regain_minutes = 0
+    
+    insights = _parse_header_json(headers, 'X-FB-Ads-Insights-Throttle')
+    if isinstance(insights, dict):
+        percentages += [insights.get('app_id_util_pct'), insights.get('acc_id_util_pct')]
+    
+    app_usage = _parse_header_json(headers, 'X-App-Usage')
+    if isinstance(app_usage, dict):
+        percentages += [app_usage.get('call_count'), app_usage.get('total_time'), app_usage.get('total_cputime')]
+    
+    business_usage = _parse_header_json(headers, 'X-Business-Use-Case-Usage')
+    if isinstance(business_usage, dict):
+        for entries in business_usage.values():
+            for entry in entries if isinstance(entries, list) else [entries]:
+                if not isinstance(entry, dict):
+                    continue
+                percentages += [entry.get('call_count'), entry.get('total_time'), entry.get('total_cputime')]
+                regain_minutes = max(regain_minutes, entry.get('estimated_time_to_regain_access') or 0)
+    
+    values = []
+    for value in percentages:
+        try:
+            values.append(float(value))
+        except (TypeError, ValueError):
+            continue
+    if not values and not regain_minutes:
+        return None, 0
+    return max(values, default=100.0), regain_minutes * 60
+
+
+_session = None
+_session_lock = threading.Lock()
+_rate_limiter = MetaRateLimiter()
+
+
+def get_meta_session():
+    """Process-wide keep-alive session for Graph API calls"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=META_HTTP_POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def get_meta_rate_limiter():
+    """The token bucket shared by all Graph API calls"""
+    return _rate_limiter
+
+
+def _graph_url(path):
+    api_version = os.getenv('META_API_VERSION', 'v22.0')
+    return f"{META_GRAPH_API_URL}/{api_version}/{path}"
+
+
+def _is_throttled(response):
+    if response.status_code == 429:
+        return True
+    if response.status_code not in (400, 403):
+        return False
+    try:
+        error = response.json().get('error', {})
+    except ValueError:
+        return False
+    return error.get('code') in META_API_THROTTLE_ERROR_CODES
+
+
+def _graph_request(method, url, **kwargs):
+    """
+    Send a Graph API request through the shared session and rate limiter.
+    
+    Throttled responses pause the limiter (doubling each attempt) and are retried up to
+    META_API_MAX_RETRIES times; the last response is returned for the caller's
+    raise_for_status().
+    """
+    session = get_meta_session()
+    for attempt in range(META_API_MAX_RETRIES + 1):
+        _rate_limiter.acquire()
+        response = session.request(method, url, **kwargs)
+        _rate_limiter.observe(response.headers)
+        if not _is_throttled(response) or attempt == META_API_MAX_RETRIES:
+            return response
+        backoff = META_API_PAUSE_SECONDS * (2 ** attempt)
+        logger.warning(f"Meta API throttled (HTTP {response.status_code}), retrying in {backoff:.0f}s")
+        _rate_limiter.pause(backoff)
+    return response
+
 def get_meta_credentials():
     """Get Meta API credentials from environment variables"""
     access_token = os.getenv('META_ACCESS_TOKEN')
@@ -69,11 +267,8 @@ def start_async_meta_job(start_date, end_date, time_increment, fields=None, brea
     access_token = creds['access_token']
     account_id = creds['account_id']
     
-    # API parameters
-    api_version = os.getenv('META_API_VERSION', 'v22.0')
-    
     # Construct API URL for async job
-    api_url = f"https://graph.facebook.com/{api_version}/act_{account_id}/insights"
+    api_url = _graph_url(f"act_{account_id}/insights")
     
     # Default fields if none provided
     default_fields = 'ad_id,ad_name,adset_id,adset_name,campaign_id,campaign_name,impressions,clicks,spend'
@@ -113,7 +308,7 @@ def start_async_meta_job(start_date, end_date, time_increment, fields=None, brea
         logger.debug(f'Meta Async API URL: {api_url}?{query_string}')
         
         # REVERT: Meta async API requires POST method
-        response = requests.post(api_url, data=params)
+        response = _graph_request('POST', api_url, data=params, timeout=60)
         response.raise_for_status()
         
         job_data = response.json()
@@ -170,17 +365,16 @@ def check_async_job_status(report_run_id):
         return None, error
     
     access_token = creds['access_token']
-    api_version = os.getenv('META_API_VERSION', 'v22.0')
     
     # Construct status check URL
-    status_url = f"https://graph.facebook.com/{api_version}/{report_run_id}"
+    status_url = _graph_url(report_run_id)
     
     params = {
         'access_token': access_token
     }
     
     try:
-        response = requests.get(status_url, params=params)
+        response = _graph_request('GET', status_url, params=params, timeout=30)
         response.raise_for_status()
         
         status_data = response.json()
@@ -224,7 +418,6 @@ def get_async_job_results(report_run_id, use_file_url=False):
         return None, error
     
     access_token = creds['access_token']
-    api_version = os.getenv('META_API_VERSION', 'v22.0')
     
     try:
         # First check if job is complete and get file_url if available
@@ -237,7 +430,7 @@ def get_async_job_results(report_run_id, use_file_url=False):
         
         # If we have a file_url and want to use it, download the file
         if use_file_url and status_info.get('file_url'):
-            file_response = requests.get(status_info['file_url'])
+            file_response = get_meta_session().get(status_info['file_url'], timeout=120)
             file_response.raise_for_status()
             
             # The file is gzipped JSON - we'd need to handle decompression here
@@ -245,7 +438,7 @@ def get_async_job_results(report_run_id, use_file_url=False):
             pass
         
         # Get results via API pagination (more reliable for now)
-        results_url = f"https://graph.facebook.com/{api_version}/{report_run_id}/insights"
+        results_url = _graph_url(f"{report_run_id}/insights")
         
         params = {
             'access_token': access_token,
@@ -255,7 +448,7 @@ def get_async_job_results(report_run_id, use_file_url=False):
         all_data = []
         page_count = 0
         
-        response = requests.get(results_url, params=params)
+        response = _graph_request('GET', results_url, params=params, timeout=60)
         response.raise_for_status()
         
         data = response.json()
@@ -267,7 +460,7 @@ def get_async_job_results(report_run_id, use_file_url=False):
             
             # Follow pagination to get all results
             while 'paging' in data and 'next' in data['paging']:
-                response = requests.get(data['paging']['next'])
+                response = _graph_request('GET', data['paging']['next'], timeout=60)
                 response.raise_for_status()
                 data = response.json()
                 
@@ -356,6 +549,9 @@ def fetch_meta_data(start_date, end_date, time_increment, fields=None, breakdown
 def fetch_meta_data_sync(start_date, end_date, time_increment, fields=None, breakdowns=None, action_breakdowns=None):
     """
     Original synchronous fetch method for small requests
+    
+    Safe to call from several threads: pages go through the shared keep-alive
+    session and the process-wide rate limiter.
     """
     # Get credentials
     creds, error = get_meta_credentials()
@@ -365,11 +561,8 @@ def fetch_meta_data_sync(start_date, end_date, time_increment, fields=None, brea
     access_token = creds['access_token']
     account_id = creds['account_id']
     
-    # API parameters
-    api_version = os.getenv('META_API_VERSION', 'v22.0')
-    
     # Construct API URL
-    api_url = f"https://graph.facebook.com/{api_version}/act_{account_id}/insights"
+    api_url = _graph_url(f"act_{account_id}/insights")
     
     # Default fields if none provided
     default_fields = 'ad_id,ad_name,adset_id,adset_name,campaign_id,campaign_name,impressions,clicks,spend'
@@ -402,7 +595,7 @@ def fetch_meta_data_sync(start_date, end_date, time_increment, fields=None, brea
         # Make initial request
         query_string = urllib.parse.urlencode(params, doseq=True)
         logger.debug(f'Meta API URL: {api_url}?{query_string}')
-        response = requests.get(api_url, params=params, timeout=30)
+        response = _graph_request('GET', api_url, params=params, timeout=30)
         response.raise_for_status()  # Check for HTTP errors
         
         data = response.json()
@@ -414,7 +607,7 @@ def fetch_meta_data_sync(start_date, end_date, time_increment, fields=None, brea
             
             # Follow pagination to get all results
             while 'paging' in data and 'next' in data['paging']:
-                response = requests.get(data['paging']['next'], timeout=30)
+                response = _graph_request('GET', data['paging']['next'], timeout=30)
                 response.raise_for_status()
                 data = response.json()
                 
@@ -11,6 +11,11 @@ The module will:
 3. Re-fill the last existing date (overwrite with fresh data)
 4. Fill all missing dates from that point to today
 5. Use async-first processing with sync fallback for reliability
+6. Bulk-load backfills (empty tables or long gaps) with deferred indexes
+7. Fetch (table, date chunk) units concurrently on a bounded worker pool, paced by
+   the shared Meta API rate limiter; results are loaded on the calling thread
+8. Backfill long ranges with many async report runs in flight at once, polled with
+   exponential backoff and loaded as each one completes
 
 Author: Analytics Pipeline Team
 Created: 2025
@@ -22,6 +27,8 @@ import sqlite3
 import json
 import time
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
@@ -44,14 +51,44 @@ sys.path.append(project_root)
 
 try:
     # Import specific Meta API functions using full orchestrator paths
-    from orchestrator.meta.services.meta_service import fetch_meta_data, check_async_job_status, get_async_job_results
-    from database_utils import get_database_path
+    from orchestrator.meta.services.meta_service import fetch_meta_data, start_async_meta_job, check_async_job_status, get_async_job_results
+    from database_utils import get_database_path, get_pending_bulk_load, begin_bulk_load, record_bulk_load_progress, finish_bulk_load
 except ImportError as e:
     logger.error(f"Failed to import required modules: {e}")
     logger.error("Ensure meta_service and utils modules are available")
     sys.exit(1)
 
 
+# Backfills of at least this many dates (or into an empty table) load with deferred indexes
+BULK_LOAD_MIN_DATES = int(os.environ.get('META_BULK_LOAD_MIN_DATES', 30))
+
+# Concurrent Insights requests; pacing is left to the rate limiter in meta_service
+META_FETCH_WORKERS = int(os.environ.get('META_FETCH_WORKERS', 4))
+# Dates covered by one Insights request
+META_FETCH_CHUNK_DAYS = int(os.environ.get('META_FETCH_CHUNK_DAYS', 1))
+
+# Tables with at least this many dates to fill are backfilled with async report runs
+META_ASYNC_MIN_DATES = int(os.environ.get('META_ASYNC_MIN_DATES', 14))
+# Dates covered by one async report run
+META_ASYNC_WINDOW_DAYS = int(os.environ.get('META_ASYNC_WINDOW_DAYS', 7))
+# Report runs submitted to Meta and not yet loaded
+META_ASYNC_MAX_ACTIVE = int(os.environ.get('META_ASYNC_MAX_ACTIVE', 10))
+# Status polls back off from the first to the max interval, doubling per poll
+META_ASYNC_POLL_INITIAL_SECONDS = float(os.environ.get('META_ASYNC_POLL_INITIAL_SECONDS', 2))
+META_ASYNC_POLL_MAX_SECONDS = float(os.environ.get('META_ASYNC_POLL_MAX_SECONDS', 60))
+# A report run still unfinished after this long is refetched synchronously
+META_ASYNC_TIMEOUT_SECONDS = float(os.environ.get('META_ASYNC_TIMEOUT_SECONDS', 1800))
+
+META_INSIGHTS_FIELDS = 'ad_id,ad_name,adset_id,adset_name,campaign_id,campaign_name,spend,impressions,clicks,actions'
+
+# Breakdown type -> Meta API breakdowns parameter
+META_BREAKDOWNS = {
+    'country': 'country',
+    'region': 'region',
+    'device': 'impression_device'
+}
+
+
 class MetaActionProcessor:
     """Process Meta API actions to extract trial and purchase counts"""
     
@@ -112,6 +149,10 @@ class MetaDataUpdater:
         """Initialize the Meta data updater"""
         try:
             self.db_path = get_database_path('meta_analytics')
+            # Long-lived connection used by load_data_to_table while a bulk load is active;
+            # loads into every table go through it until the last bulk load finishes
+            self.bulk_conn = None
+            self.bulk_tables = set()
             logger.info(f"📊 Meta Data Updater initialized")
             logger.info(f"📁 Database path: {self.db_path}")
         except Exception as e:
@@ -323,16 +364,10 @@ class MetaDataUpdater:
         logger.info(f"📡 Fetching Meta data: {from_date} to {to_date} ({breakdown_desc})")
         
         # Define fields for Meta API request
-        fields = 'ad_id,ad_name,adset_id,adset_name,campaign_id,campaign_name,spend,impressions,clicks,actions'
+        fields = META_INSIGHTS_FIELDS
         
         # Map breakdown types to proper field names
-        breakdowns = None
-        if breakdown_type == "country":
-            breakdowns = 'country'
-        elif breakdown_type == "region":
-            breakdowns = 'region'
-        elif breakdown_type == "device":
-            breakdowns = 'impression_device'
+        breakdowns = META_BREAKDOWNS.get(breakdown_type)
         
         try:
             # Use the actual Meta API service - FORCE SYNC for Fill Gaps reliability
@@ -389,6 +424,7 @@ class MetaDataUpdater:
             List of records from completed job
         """
         start_time = time.time()
+        poll_delay = META_ASYNC_POLL_INITIAL_SECONDS
         
         while time.time() - start_time < max_wait_time:
             # Check job status
@@ -421,8 +457,9 @@ class MetaDataUpdater:
                 logger.error(f"   ❌ Async job failed")
                 return []
             
-            # Wait before checking again
-            time.sleep(10)
+            # Wait before checking again, backing off exponentially
+            time.sleep(poll_delay)
+            poll_delay = min(poll_delay * 2, META_ASYNC_POLL_MAX_SECONDS)
         
         logger.error(f"   ❌ Async job timed out after {max_wait_time} seconds")
         return []
@@ -494,8 +531,9 @@ class MetaDataUpdater:
             logger.warning(f"   ⚠️  No records to load to {table_name}")
             return 0
         
+        conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.bulk_conn or sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
             # Build INSERT OR REPLACE statement based on table structure
@@ -556,21 +594,34 @@ class MetaDataUpdater:
             
             else:
                 logger.error(f"   ❌ Unknown table: {table_name}")
-                conn.close()
+                if conn is not self.bulk_conn:
+                    conn.close()
                 return 0
             
             # Execute batch insert
             cursor.executemany(sql, values)
+            loaded_count = cursor.rowcount
+            
+            # Bulk-load bookkeeping commits atomically with the loaded dates
+            if conn is self.bulk_conn and table_name in self.bulk_tables:
+                for date in sorted({r['date'] for r in processed_records}):
+                    record_bulk_load_progress(cursor, self._bulk_load_name(table_name), date)
+            
             conn.commit()
             
-            loaded_count = cursor.rowcount
-            conn.close()
+            if conn is not self.bulk_conn:
+                conn.close()
             
             logger.info(f"   ✅ Loaded {loaded_count} records to {table_name}")
             return loaded_count
             
         except Exception as e:
             logger.error(f"   ❌ Error loading to {table_name}: {e}")
+            # Never leave a partial chunk in the shared transaction for the next commit
+            if conn is not None:
+                conn.rollback()
+                if conn is not self.bulk_conn:
+                    conn.close()
             return 0
     
     def check_existing_dates_in_table(self, table_name: str, start_date: str, end_date: str) -> List[str]:
@@ -638,6 +689,271 @@ class MetaDataUpdater:
         
         return missing_dates
     
+    def _bulk_load_name(self, table_name: str) -> str:
+        """Bookkeeping key of a table's bulk load in interrupted_pipelines"""
+        return f"meta_bulk_load:{table_name}"
+    
+    def begin_table_bulk_load(self, table_name: str, date_count: int, table_is_empty: bool) -> bool:
+        """
+        Enter bulk-load mode for a table when the backfill is large enough (or a previous
+        bulk load of the table was interrupted and must be resumed).
+        
+        Args:
+            table_name: Target table name
+            date_count: Number of dates about to be loaded
+            table_is_empty: True if the table currently has no data
+            
+        Returns:
+            True if bulk-load mode is active (call finish_table_bulk_load when done)
+        """
+        conn = self.bulk_conn or sqlite3.connect(self.db_path)
+        bulk_load_name = self._bulk_load_name(table_name)
+        
+        resume = get_pending_bulk_load(conn, bulk_load_name) is not None
+        if not resume and (date_count == 0 or (not table_is_empty and date_count < BULK_LOAD_MIN_DATES)):
+            if conn is not self.bulk_conn:
+                conn.close()
+            return False
+        
+        try:
+            # Not exclusive: the load is interleaved with long API fetches and
+            # dashboard reads of meta_analytics must keep working meanwhile
+            begin_bulk_load(conn, bulk_load_name, [table_name], exclusive=False)
+        except Exception as e:
+            logger.warning(f"   ⚠️  Could not enter bulk-load mode for {table_name}, loading normally: {e}")
+            finish_bulk_load(conn, bulk_load_name)
+            if conn is not self.bulk_conn:
+                conn.close()
+            return False
+        
+        logger.info(f"🚚 Bulk-load mode enabled for {table_name} ({date_count} dates)")
+        self.bulk_conn = conn
+        self.bulk_tables.add(table_name)
+        return True
+    
+    def finish_table_bulk_load(self, table_name: str):
+        """Rebuild deferred indexes and ANALYZE; the connection closes with the last bulk load"""
+        if not self.bulk_conn:
+            return
+        
+        try:
+            finish_bulk_load(self.bulk_conn, self._bulk_load_name(table_name))
+        finally:
+            self.bulk_tables.discard(table_name)
+            if not self.bulk_tables:
+                self.bulk_conn.close()
+                self.bulk_conn = None
+    
+    def build_fetch_units(self, table_name: str, breakdown_type: Optional[str], dates: List[str],
+                          chunk_days: int = META_FETCH_CHUNK_DAYS) -> List[tuple]:
+        """
+        Split a table's sorted dates into (table, breakdown, from_date, to_date) request units
+        of up to chunk_days consecutive dates (a gap in the dates always starts a new unit)
+        """
+        units = []
+        chunk_dates = []
+        for date in dates:
+            if chunk_dates and (
+                len(chunk_dates) >= chunk_days or
+                datetime.strptime(date, '%Y-%m-%d') - datetime.strptime(chunk_dates[-1], '%Y-%m-%d') != timedelta(days=1)
+            ):
+                units.append((table_name, breakdown_type, chunk_dates[0], chunk_dates[-1]))
+                chunk_dates = []
+            chunk_dates.append(date)
+        if chunk_dates:
+            units.append((table_name, breakdown_type, chunk_dates[0], chunk_dates[-1]))
+        return units
+    
+    def _fetch_unit(self, unit: tuple) -> List[Dict]:
+        """Fetch and process one unit (runs on a worker thread; no database access)"""
+        table_name, breakdown_type, from_date, to_date = unit
+        raw_records = self.fetch_meta_data(from_date=from_date, to_date=to_date, breakdown_type=breakdown_type)
+        if not raw_records:
+            return []
+        return self.process_meta_records(raw_records, breakdown_type)
+    
+    def run_fetch_units(self, units: List[tuple]) -> tuple:
+        """
+        Fetch units on a bounded worker pool and load each result as it completes.
+        
+        Loads stay on the calling thread, so SQLite only ever sees one writer.
+        
+        Returns:
+            tuple: (requests made, requests whose data was loaded)
+        """
+        if not units:
+            return 0, 0
+        
+        total_success = 0
+        total_requests = 0
+        workers = max(1, min(META_FETCH_WORKERS, len(units)))
+        logger.info(f"📡 Fetching {len(units)} request(s) with {workers} worker(s)")
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self._fetch_unit, unit): unit for unit in units}
+            for future in as_completed(futures):
+                total_requests += 1
+                logger.info(f"📡 REQUEST {total_requests}/{len(units)}: {self._describe_unit(futures[future])}")
+                if self._load_unit_result(futures[future], future):
+                    total_success += 1
+        
+        return total_requests, total_success
+    
+    def run_async_units(self, units: List[tuple]) -> tuple:
+        """
+        Backfill units through async report runs, up to META_ASYNC_MAX_ACTIVE in flight.
+        
+        Runs are polled together with per-run exponential backoff; completed runs are
+        downloaded on a worker pool and loaded on the calling thread as they finish. A unit
+        whose run cannot be started, fails or times out is refetched synchronously.
+        
+        Returns:
+            tuple: (units processed, units whose data was loaded)
+        """
+        if not units:
+            return 0, 0
+        
+        total_success = 0
+        total_requests = 0
+        queued = deque(units)
+        # report_run_id -> {'unit', 'submitted_at', 'next_poll', 'delay'}
+        running = {}
+        # download/refetch future -> unit
+        downloads = {}
+        logger.info(f"📡 Backfilling {len(units)} window(s) with async report runs "
+                    f"(max {META_ASYNC_MAX_ACTIVE} in flight)")
+        
+        with ThreadPoolExecutor(max_workers=max(1, META_FETCH_WORKERS)) as executor:
+            while queued or running or downloads:
+                # Keep the pipeline full
+                while queued and len(running) + len(downloads) < META_ASYNC_MAX_ACTIVE:
+                    unit = queued.popleft()
+                    table_name, breakdown_type, from_date, to_date = unit
+                    job_info, error = start_async_meta_job(
+                        from_date, to_date, 1, fields=META_INSIGHTS_FIELDS,
+                        breakdowns=META_BREAKDOWNS.get(breakdown_type)
+                    )
+                    if error:
+                        logger.warning(f"   ⚠️  Async run not started for {self._describe_unit(unit)}, fetching synchronously: {error}")
+                        downloads[executor.submit(self._fetch_unit, unit)] = unit
+                        continue
+                    now = time.monotonic()
+                    running[job_info['report_run_id']] = {
+                        'unit': unit,
+                        'submitted_at': now,
+                        'next_poll': now + META_ASYNC_POLL_INITIAL_SECONDS,
+                        'delay': META_ASYNC_POLL_INITIAL_SECONDS
+                    }
+                    logger.info(f"   ✅ Async run {job_info['report_run_id']} started: {self._describe_unit(unit)}")
+                
+                # Poll the runs that are due
+                now = time.monotonic()
+                for report_run_id, run in list(running.items()):
+                    if run['next_poll'] > now:
+                        continue
+                    
+                    status_info, error = check_async_job_status(report_run_id)
+                    async_status = status_info.get('async_status', '') if status_info else ''
+                    timed_out = time.monotonic() - run['submitted_at'] > META_ASYNC_TIMEOUT_SECONDS
+                    
+                    if async_status == 'Job Completed':
+                        del running[report_run_id]
+                        downloads[executor.submit(self._download_report, report_run_id, run['unit'])] = run['unit']
+                    elif error or async_status in ('Job Failed', 'Job Skipped') or timed_out:
+                        del running[report_run_id]
+                        reason = error or (async_status if not timed_out else f"timed out, {async_status}")
+                        logger.warning(f"   ⚠️  Async run {report_run_id} ({self._describe_unit(run['unit'])}) "
+                                       f"did not complete ({reason}), fetching synchronously")
+                        downloads[executor.submit(self._fetch_unit, run['unit'])] = run['unit']
+                    else:
+                        run['delay'] = min(run['delay'] * 2, META_ASYNC_POLL_MAX_SECONDS)
+                        run['next_poll'] = time.monotonic() + run['delay']
+                
+                # Load whatever has finished downloading
+                finished = [future for future in downloads if future.done()]
+                for future in finished:
+                    unit = downloads.pop(future)
+                    total_requests += 1
+                    logger.info(f"📡 REQUEST {total_requests}/{len(units)}: {self._describe_unit(unit)}")
+                    if self._load_unit_result(unit, future):
+                        total_success += 1
+                
+                if finished or (queued and len(running) + len(downloads) < META_ASYNC_MAX_ACTIVE):
+                    continue
+                
+                # Sleep until the next poll is due or a download finishes
+                timeout = None
+                if running:
+                    timeout = max(0.0, min(run['next_poll'] for run in running.values()) - time.monotonic())
+                if downloads:
+                    wait(list(downloads), timeout=timeout, return_when=FIRST_COMPLETED)
+                elif timeout:
+                    time.sleep(timeout)
+        
+        return total_requests, total_success
+    
+    def _download_report(self, report_run_id: str, unit: tuple) -> List[Dict]:
+        """Download and process a completed report run (runs on a worker thread)"""
+        results, error = get_async_job_results(report_run_id)
+        if error:
+            logger.warning(f"   ⚠️  Could not download async run {report_run_id}, fetching synchronously: {error}")
+            return self._fetch_unit(unit)
+        raw_records = results['data']['data'] if results and 'data' in results else []
+        return self.process_meta_records(raw_records, unit[1])
+    
+    def build_table_units(self, table_name: str, breakdown_type: Optional[str], dates: List[str]) -> tuple:
+        """
+        Plan a table's requests: (sync units, async units). Backfills of at least
+        META_ASYNC_MIN_DATES dates go to async report runs of META_ASYNC_WINDOW_DAYS.
+        """
+        if len(dates) >= META_ASYNC_MIN_DATES:
+            return [], self.build_fetch_units(table_name, breakdown_type, dates, META_ASYNC_WINDOW_DAYS)
+        return self.build_fetch_units(table_name, breakdown_type, dates), []
+    
+    def run_units(self, sync_units: List[tuple], async_units: List[tuple]) -> tuple:
+        """Run planned sync and async units; returns (requests made, requests loaded)"""
+        sync_requests, sync_success = self.run_fetch_units(sync_units)
+        async_requests, async_success = self.run_async_units(async_units)
+        return sync_requests + async_requests, sync_success + async_success
+    
+    @staticmethod
+    def _describe_unit(unit: tuple) -> str:
+        table_name, _, from_date, to_date = unit
+        return f"{table_name} {from_date} to {to_date}"
+    
+    def _load_unit_result(self, unit: tuple, future) -> bool:
+        """Load one finished unit's records; returns True if any were loaded"""
+        table_name = unit[0]
+        try:
+            processed_records = future.result()
+        except Exception as e:
+            logger.error(f"   ❌ Error fetching Meta data: {e}")
+            return False
+        
+        if not processed_records:
+            logger.warning(f"   ⚠️  No data fetched")
+            return False
+        
+        # Log summary
+        total_trials = sum(r.get('meta_trials', 0) for r in processed_records)
+        total_purchases = sum(r.get('meta_purchases', 0) for r in processed_records)
+        total_spend = sum(r.get('spend', 0) for r in processed_records)
+        
+        logger.info(f"   📊 Data summary:")
+        logger.info(f"      Records: {len(processed_records)}")
+        logger.info(f"      Total spend: ${total_spend:.2f}")
+        logger.info(f"      Total trials: {total_trials}")
+        logger.info(f"      Total purchases: {total_purchases}")
+        
+        # Load to database
+        loaded_count = self.load_data_to_table(processed_records, table_name)
+        
+        if loaded_count > 0:
+            logger.info(f"   🎯 SUCCESS: {loaded_count} records loaded")
+            return True
+        logger.warning(f"   ⚠️  FAILED: Could not load data")
+        return False
+    
     def update_specific_breakdown_table(self, 
                                       table_name: str, 
                                       breakdown_type: str, 
@@ -689,62 +1005,17 @@ class MetaDataUpdater:
                 
                 logger.info(f"📊 Will process {len(dates_to_update)} dates (overwrite mode)")
             
-            # Step 2: Process dates in chunks
-            chunk_size = 1
-            total_success = 0
-            total_requests = 0
+            # Step 2: Fetch date chunks concurrently (async report runs for long ranges)
+            table_is_empty = self.get_table_latest_date(table_name) is None
+            bulk_load = self.begin_table_bulk_load(table_name, len(dates_to_update), table_is_empty)
             
-            for i in range(0, len(dates_to_update), chunk_size):
-                chunk_dates = dates_to_update[i:i+chunk_size]
-                from_date = chunk_dates[0]
-                to_date = chunk_dates[-1]
-                
-                total_requests += 1
-                
-                logger.info(f"📡 REQUEST {total_requests}: {from_date} to {to_date}")
-                
-                # Fetch raw data
-                raw_records = self.fetch_meta_data(
-                    from_date=from_date,
-                    to_date=to_date,
-                    breakdown_type=breakdown_type
+            try:
+                total_requests, total_success = self.run_units(
+                    *self.build_table_units(table_name, breakdown_type, dates_to_update)
                 )
-                
-                if not raw_records:
-                    logger.warning(f"   ⚠️  No data fetched")
-                    continue
-                
-                # Process records
-                processed_records = self.process_meta_records(raw_records, breakdown_type)
-                
-                if not processed_records:
-                    logger.warning(f"   ⚠️  No records processed")
-                    continue
-                
-                # Log summary
-                total_trials = sum(r.get('meta_trials', 0) for r in processed_records)
-                total_purchases = sum(r.get('meta_purchases', 0) for r in processed_records)
-                total_spend = sum(r.get('spend', 0) for r in processed_records)
-                
-                logger.info(f"   📊 Data summary:")
-                logger.info(f"      Records: {len(processed_records)}")
-                logger.info(f"      Total spend: ${total_spend:.2f}")
-                logger.info(f"      Total trials: {total_trials}")
-                logger.info(f"      Total purchases: {total_purchases}")
-                
-                # Load to database
-                loaded_count = self.load_data_to_table(processed_records, table_name)
-                
-                if loaded_count > 0:
-                    total_success += 1
-                    logger.info(f"   🎯 SUCCESS: {loaded_count} records loaded")
-                else:
-                    logger.warning(f"   ⚠️  FAILED: Could not load data")
-                
-                # Rate limiting
-                if i + chunk_size < len(dates_to_update):
-                    logger.info("   ⏳ Waiting 5 seconds (rate limiting)...")
-                    time.sleep(5)
+            finally:
+                if bulk_load:
+                    self.finish_table_bulk_load(table_name)
             
             # Final summary
             elapsed_time = time.time() - start_time
@@ -805,89 +1076,53 @@ class MetaDataUpdater:
                 # }
             ]
             
-            # Process each table individually
-            total_success = 0
-            total_requests = 0
+            # Plan every table first so all bulk loads begin before any fetching starts
             today = now_in_timezone().strftime('%Y-%m-%d')
+            sync_units = []
+            async_units = []
+            bulk_tables = []
             
-            for table_config in table_configs:
-                table_name = table_config['table']
-                breakdown_type = table_config['breakdown']
-                description = table_config['description']
-                
-                logger.info(f"📋 PROCESSING TABLE: {table_name}")
-                logger.info(f"🔍 Breakdown: {description}")
-                logger.info("-" * 50)
-                
-                # Step 1: Find most recent data in THIS specific table
-                table_latest_date = self.get_table_latest_date(table_name)
-                
-                # Step 2: Calculate dates to update for THIS specific table
-                dates_to_update = self.calculate_dates_to_update_for_table(table_latest_date, today, table_name)
-                
-                if not dates_to_update:
-                    logger.info(f"✅ No dates to update for {table_name} - already current")
-                    continue
-                
-                logger.info(f"📅 {table_name}: Will update {len(dates_to_update)} dates from {dates_to_update[0]} to {dates_to_update[-1]}")
-                
-                # Step 3: Process dates in chunks
-                chunk_size = 1
-                
-                for i in range(0, len(dates_to_update), chunk_size):
-                    chunk_dates = dates_to_update[i:i+chunk_size]
-                    from_date = chunk_dates[0]
-                    to_date = chunk_dates[-1]
-                    
-                    total_requests += 1
-                    
-                    logger.info(f"📡 REQUEST {total_requests}: {from_date} to {to_date}")
-                    
-                    # Fetch raw data
-                    raw_records = self.fetch_meta_data(
-                        from_date=from_date,
-                        to_date=to_date,
-                        breakdown_type=breakdown_type
-                    )
-                    
-                    if not raw_records:
-                        logger.warning(f"   ⚠️  No data fetched")
-                        continue
-                    
-                    # Process records
-                    processed_records = self.process_meta_records(raw_records, breakdown_type)
-                    
-                    if not processed_records:
-                        logger.warning(f"   ⚠️  No records processed")
-                        continue
+            try:
+                for table_config in table_configs:
+                    table_name = table_config['table']
+                    breakdown_type = table_config['breakdown']
+                    description = table_config['description']
                     
-                    # Log summary
-                    total_trials = sum(r.get('meta_trials', 0) for r in processed_records)
-                    total_purchases = sum(r.get('meta_purchases', 0) for r in processed_records)
-                    total_spend = sum(r.get('spend', 0) for r in processed_records)
+                    logger.info(f"📋 PLANNING TABLE: {table_name}")
+                    logger.info(f"🔍 Breakdown: {description}")
+                    logger.info("-" * 50)
                     
-                    logger.info(f"   📊 Data summary:")
-                    logger.info(f"      Records: {len(processed_records)}")
-                    logger.info(f"      Total spend: ${total_spend:.2f}")
-                    logger.info(f"      Total trials: {total_trials}")
-                    logger.info(f"      Total purchases: {total_purchases}")
+                    # Step 1: Find most recent data in THIS specific table
+                    table_latest_date = self.get_table_latest_date(table_name)
                     
-                    # Load to database
-                    loaded_count = self.load_data_to_table(processed_records, table_name)
+                    # Step 2: Calculate dates to update for THIS specific table
+                    dates_to_update = self.calculate_dates_to_update_for_table(table_latest_date, today, table_name)
                     
-                    if loaded_count > 0:
-                        total_success += 1
-                        logger.info(f"   🎯 SUCCESS: {loaded_count} records loaded")
+                    if not dates_to_update:
+                        logger.info(f"✅ No dates to update for {table_name} - already current")
                     else:
-                        logger.warning(f"   ⚠️  FAILED: Could not load data")
+                        logger.info(f"📅 {table_name}: Will update {len(dates_to_update)} dates from {dates_to_update[0]} to {dates_to_update[-1]}")
+                        table_sync_units, table_async_units = self.build_table_units(table_name, breakdown_type, dates_to_update)
+                        sync_units.extend(table_sync_units)
+                        async_units.extend(table_async_units)
                     
-                    # Rate limiting
-                    if i + chunk_size < len(dates_to_update):
-                        logger.info("   ⏳ Waiting 5 seconds (rate limiting)...")
-                        time.sleep(5)
+                    table_config['dates'] = dates_to_update
+                    table_config['is_empty'] = table_latest_date is None
+                
+                # Resumes an interrupted bulk load even when there is nothing new to fetch
+                for table_config in table_configs:
+                    if self.begin_table_bulk_load(table_config['table'], len(table_config['dates']), table_config['is_empty']):
+                        bulk_tables.append(table_config['table'])
                 
-                logger.info(f"✅ Completed {table_name}")
-                logger.info("")
+                # Step 3: Fetch all (table, date chunk) units concurrently; long backfills
+                # go through async report runs
+                total_requests, total_success = self.run_units(sync_units, async_units)
+            finally:
+                for table_name in bulk_tables:
+                    self.finish_table_bulk_load(table_name)
+            
+            logger.info(f"✅ Completed {', '.join(c['table'] for c in table_configs)}")
+            logger.info("")
             
             # Final summary
             elapsed_time = time.time() - start_time
@@ -12,6 +12,7 @@ Key Features:
 - Handles name changes and updates over time
 - Provides confidence scoring and audit trail
 - Optimized for dashboard display consistency
+- Builds into a shadow table swapped in atomically, so readers never see a partial table
 
 Dependencies: Requires Meta data tables (ad_performance_daily_*)
 Outputs: Populated id_name_mapping table
@@ -28,7 +29,7 @@ from datetime import datetime, date
 # Add utils directory to path for database utilities
 utils_path = str(Path(__file__).resolve().parent.parent.parent / "utils")
 sys.path.append(utils_path)
-from database_utils import get_database_connection
+from database_utils import get_database_connection, create_shadow_table, swap_shadow_table
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -163,9 +164,9 @@ class NameMappingProcessor:
         """Create canonical mappings for all entity types"""
         logger.info("Creating canonical ID-name mappings...")
         
-        # Clear existing mappings (fresh start)
-        self.output_cursor.execute("DELETE FROM id_name_mapping")
-        self.output_conn.commit()
+        # Fresh start in a shadow copy; the build and the swap commit as one transaction
+        self.output_cursor.execute("BEGIN IMMEDIATE")
+        shadow_table = create_shadow_table(self.output_conn, 'id_name_mapping')
         
         # Entity type configurations
         entity_configs = [
@@ -185,9 +186,9 @@ class NameMappingProcessor:
                     logger.warning(f"No {entity_type} mappings found")
                     continue
                 
-                # Insert mappings into database
-                insert_query = """
-                INSERT INTO id_name_mapping 
+                # Insert mappings into the shadow table
+                insert_query = f"""
+                INSERT INTO {shadow_table} 
                 (entity_type, entity_id, canonical_name, frequency_count, last_seen_date, created_at, updated_at)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
                 """
@@ -199,7 +200,6 @@ class NameMappingProcessor:
                 ]
                 
                 self.output_cursor.executemany(insert_query, mapping_data)
-                self.output_conn.commit()
                 
                 # Update stats
                 count = len(mappings)
@@ -219,8 +219,11 @@ class NameMappingProcessor:
                 self.output_conn.rollback()
                 raise
         
+        version = swap_shadow_table(self.output_conn, 'id_name_mapping')
+        self.output_conn.commit()
+        
         self.stats['total_mappings_created'] = total_mappings
-        logger.info(f"✅ Successfully created {total_mappings} total canonical mappings")
+        logger.info(f"✅ Successfully created {total_mappings} total canonical mappings (data version {version})")
     
     def validate_mappings(self):
         """Validate the created mappings"""
@@ -11,6 +11,7 @@ Key Features:
 - Uses Meta data as authoritative source (100% confidence)
 - Simple, reliable approach - no complex analysis needed
 - Optimized for dashboard aggregation queries
+- Builds into a shadow table swapped in atomically, so readers never see a partial table
 
 Dependencies: Requires Meta data table (ad_performance_daily)
 Outputs: Populated id_hierarchy_mapping table
@@ -28,7 +29,7 @@ from collections import defaultdict
 # Add utils directory to path for database utilities
 utils_path = str(Path(__file__).resolve().parent.parent.parent / "utils")
 sys.path.append(utils_path)
-from database_utils import get_database_connection
+from database_utils import get_database_connection, create_shadow_table, swap_shadow_table
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -117,10 +118,6 @@ class HierarchyMappingProcessor:
         """Create hierarchy mappings for all ads"""
         logger.info("Creating advertising hierarchy mappings...")
         
-        # Clear existing mappings (fresh start)
-        self.output_cursor.execute("DELETE FROM id_hierarchy_mapping")
-        self.output_conn.commit()
-        
         try:
             # Analyze hierarchy relationships
             hierarchies = self.analyze_hierarchy_relationships()
@@ -129,9 +126,13 @@ class HierarchyMappingProcessor:
                 logger.warning("No hierarchy relationships found")
                 return
             
-            # Insert mappings into database
-            insert_query = """
-            INSERT INTO id_hierarchy_mapping 
+            # Fresh start in a shadow copy; the build and the swap commit as one transaction
+            self.output_cursor.execute("BEGIN IMMEDIATE")
+            shadow_table = create_shadow_table(self.output_conn, 'id_hierarchy_mapping')
+            
+            # Insert mappings into the shadow table
+            insert_query = f"""
+            INSERT INTO {shadow_table} 
             (ad_id, adset_id, campaign_id, relationship_confidence, first_seen_date, last_seen_date, created_at, updated_at)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """
@@ -143,10 +144,11 @@ class HierarchyMappingProcessor:
             ]
             
             self.output_cursor.executemany(insert_query, mapping_data)
+            version = swap_shadow_table(self.output_conn, 'id_hierarchy_mapping')
             self.output_conn.commit()
             
             self.stats['hierarchies_created'] = len(hierarchies)
-            logger.info(f"✅ Created {len(hierarchies)} hierarchy mappings")
+            logger.info(f"✅ Created {len(hierarchies)} hierarchy mappings (data version {version})")
             
         except Exception as e:
             logger.error(f"Failed to create hierarchy mappings: {e}")
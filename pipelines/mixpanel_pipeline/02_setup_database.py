@@ -12,6 +12,8 @@ MISSION-CRITICAL DATABASE SETUP:
 • Optimizes performance with WAL mode, caching, and indexing
 • Provides bulletproof error handling and transaction rollback
 • Supports both fresh installation and existing database validation
+• --migrate upgrades an existing database in place (adds and backfills new columns);
+  the pipeline.yaml steps pass it so scheduled runs keep data for incremental steps
 
 DEPENDENCIES: Requires database/schema.sql
 OUTPUTS: Fully initialized database/mixpanel_data.db ready for data ingestion
@@ -22,13 +24,14 @@ import sys
 import sqlite3
 import logging
 import re
+import argparse
 from typing import Dict, Any, List, Optional, Tuple, Set
 from pathlib import Path
 
 # Add utils directory to path for database utilities
 utils_path = str(Path(__file__).resolve().parent.parent.parent / "utils")
 sys.path.append(utils_path)
-from database_utils import get_database_path
+from database_utils import get_database_path, compress_event_payload
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -55,6 +58,16 @@ logger.info(f"Schema path: {SCHEMA_PATH}")
 logger.info(f"Schema file exists: {SCHEMA_PATH.exists()}")
 logger.info(f"Database path: {DATABASE_PATH}")
 
+# Columns materialized on mixpanel_event at ingest, with the expression that backfills them
+# for rows ingested before the column existed
+MIXPANEL_EVENT_MIGRATIONS = [
+    ('event_date', 'DATE', "DATE(event_time)"),
+    ('product_id', 'TEXT', "JSON_EXTRACT(event_json, '$.properties.product_id')"),
+    ('store', 'TEXT', "JSON_EXTRACT(event_json, '$.properties.store')"),
+    ('device', 'TEXT', "JSON_EXTRACT(event_json, '$.properties.device')"),
+]
+MIGRATION_BATCH_SIZE = 50000
+
 # Expected schema structure for validation
 EXPECTED_TABLES = {
     'mixpanel_user': {
@@ -88,7 +101,18 @@ EXPECTED_TABLES = {
         'refund_flag': 'BOOLEAN',
         'is_late_event': 'BOOLEAN',
         'trial_expiration_at_calc': 'DATETIME',
-        'event_json': 'TEXT'
+        'event_date': 'DATE',
+        'product_id': 'TEXT',
+        'store': 'TEXT',
+        'device': 'TEXT'
+    },
+    'mixpanel_event_payload': {
+        'event_uuid': 'TEXT',
+        'payload': 'BLOB'
+    },
+    'user_identity_map': {
+        'alias_id': 'TEXT',
+        'distinct_id': 'TEXT'
     },
     'user_product_metrics': {
         'user_product_id': 'INTEGER',
@@ -203,6 +227,12 @@ EXPECTED_TABLES = {
         'processing_timestamp': 'DATETIME',
         'status': 'TEXT'
     },
+    'dirty_user_products': {
+        'distinct_id': 'TEXT',
+        'product_id': 'TEXT',
+        'reason': 'TEXT',
+        'marked_at': 'DATETIME'
+    },
     'discovered_properties': {
         'property_id': 'INTEGER',
         'property_name': 'TEXT',
@@ -294,6 +324,14 @@ EXPECTED_TABLES = {
 }
 
 def main():
+    parser = argparse.ArgumentParser(description="Database schema setup & validation")
+    parser.add_argument(
+        '--migrate',
+        action='store_true',
+        help='Upgrade the existing database in place (keep Mixpanel data, backfill new columns)'
+    )
+    args = parser.parse_args()
+    
     try:
         logger.info("=== Module 2: Database Setup & Migration ===")
         logger.info("Ensuring database is properly configured...")
@@ -313,13 +351,19 @@ def main():
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
         existing_tables = cursor.fetchall()
         
-        if existing_tables:
+        if existing_tables and args.migrate:
+            logger.info("Database has existing tables - migrating in place, Mixpanel data is preserved")
+            migrate_mixpanel_event_columns(conn)
+        elif existing_tables:
             logger.info("Database has existing tables - refreshing Mixpanel data while preserving Meta data")
             drop_mixpanel_tables(conn)
         
         logger.info("Creating fresh Mixpanel tables from authoritative schema")
         initialize_database_from_schema(conn)
         
+        if existing_tables and args.migrate:
+            migrate_event_payloads(conn)
+        
         # Validate final schema
         validation_results = validate_database_schema(conn)
         if not validation_results['valid']:
@@ -551,8 +595,11 @@ def drop_mixpanel_tables(conn: sqlite3.Connection):
     mixpanel_tables = [
         'user_product_metrics',  # Drop dependent tables first
         'mixpanel_event',        # Drop dependent tables first  
+        'mixpanel_event_payload',
+        'user_identity_map',     # Rebuilt from user profiles at ingest
         'mixpanel_user',         # Drop parent table last
-        'processed_event_days'   # This tracks which event dates have been processed
+        'processed_event_days',  # This tracks which event dates have been processed
+        'dirty_user_products'    # Pre-processing ledger; a fresh load marks every pair again
     ]
     
     try:
@@ -580,6 +627,94 @@ def drop_mixpanel_tables(conn: sqlite3.Connection):
         logger.error(f"Failed to drop Mixpanel tables: {e}")
         raise
 
+def migrate_mixpanel_event_columns(conn: sqlite3.Connection):
+    """
+    Add materialized mixpanel_event columns missing from an existing database and backfill
+    them from event_time/event_json. Must run before the schema's indexes are created.
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='mixpanel_event'")
+    if not cursor.fetchone():
+        logger.info("No mixpanel_event table to migrate")
+        return
+    
+    cursor.execute("PRAGMA table_info(mixpanel_event)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+    missing = [(name, col_type, expr) for name, col_type, expr in MIXPANEL_EVENT_MIGRATIONS
+               if name not in existing_columns]
+    
+    if not missing:
+        logger.info("mixpanel_event already has all materialized columns")
+        return
+    
+    cursor.execute("SELECT MAX(rowid) FROM mixpanel_event")
+    max_rowid = cursor.fetchone()[0] or 0
+    
+    try:
+        cursor.execute("BEGIN TRANSACTION")
+        for name, col_type, _ in missing:
+            cursor.execute(f"ALTER TABLE mixpanel_event ADD COLUMN {name} {col_type}")
+            logger.info(f"Added column mixpanel_event.{name}")
+        
+        # Backfill in rowid ranges to keep each statement's working set bounded
+        assignments = ", ".join(f"{name} = {expr}" for name, _, expr in missing)
+        for start in range(0, max_rowid + 1, MIGRATION_BATCH_SIZE):
+            cursor.execute(
+                f"UPDATE mixpanel_event SET {assignments} WHERE rowid BETWEEN ? AND ? AND JSON_VALID(event_json) = 1",
+                (start, start + MIGRATION_BATCH_SIZE - 1)
+            )
+        
+        # Rows without valid JSON still get their event_date
+        if any(name == 'event_date' for name, _, _ in missing):
+            cursor.execute("UPDATE mixpanel_event SET event_date = DATE(event_time) WHERE event_date IS NULL")
+        
+        cursor.execute("COMMIT")
+        logger.info(f"Backfilled {len(missing)} mixpanel_event columns for rows up to rowid {max_rowid:,}")
+        
+    except Exception as e:
+        cursor.execute("ROLLBACK")
+        logger.error(f"Failed to migrate mixpanel_event columns: {e}")
+        raise
+
+def migrate_event_payloads(conn: sqlite3.Connection):
+    """
+    Move inline mixpanel_event.event_json payloads of an existing database into the compressed
+    mixpanel_event_payload table, then drop the column. Runs after the schema is applied.
+    """
+    cursor = conn.cursor()
+    
+    cursor.execute("PRAGMA table_info(mixpanel_event)")
+    if 'event_json' not in {row[1] for row in cursor.fetchall()}:
+        logger.info("mixpanel_event payloads already stored in mixpanel_event_payload")
+        return
+    
+    cursor.execute("SELECT MAX(rowid) FROM mixpanel_event")
+    max_rowid = cursor.fetchone()[0] or 0
+    moved = 0
+    
+    try:
+        cursor.execute("BEGIN TRANSACTION")
+        for start in range(0, max_rowid + 1, MIGRATION_BATCH_SIZE):
+            rows = cursor.execute(
+                "SELECT event_uuid, event_json FROM mixpanel_event WHERE rowid BETWEEN ? AND ? AND event_json IS NOT NULL",
+                (start, start + MIGRATION_BATCH_SIZE - 1)
+            ).fetchall()
+            cursor.executemany(
+                "INSERT OR REPLACE INTO mixpanel_event_payload (event_uuid, payload) VALUES (?, ?)",
+                [(event_uuid, compress_event_payload(event_json)) for event_uuid, event_json in rows]
+            )
+            moved += len(rows)
+        
+        cursor.execute("ALTER TABLE mixpanel_event DROP COLUMN event_json")
+        cursor.execute("COMMIT")
+        logger.info(f"Moved {moved:,} event payloads to mixpanel_event_payload (VACUUM reclaims the space)")
+        
+    except Exception as e:
+        cursor.execute("ROLLBACK")
+        logger.error(f"Failed to migrate event payloads: {e}")
+        raise
+
 def initialize_database_from_schema(conn: sqlite3.Connection):
     """Initialize database by executing the authoritative schema (CREATE IF NOT EXISTS for existing tables)"""
     logger.info("Initializing database from authoritative schema...")
@@ -781,6 +916,7 @@ def validate_indexes(cursor: sqlite3.Cursor, errors: List[str], warnings: List[s
         'idx_mixpanel_user_abi_ad_id',
         'idx_mixpanel_user_abi_campaign_id',
         'idx_mixpanel_user_abi_ad_set_id',
+        'idx_user_identity_map_distinct_id',
         
         # Event table indexes
         'idx_mixpanel_event_distinct_id',
@@ -791,6 +927,11 @@ def validate_indexes(cursor: sqlite3.Cursor, errors: List[str], warnings: List[s
         'idx_mixpanel_event_abi_ad_id',
         'idx_mixpanel_event_abi_campaign_id',
         'idx_mixpanel_event_abi_ad_set_id',
+        'idx_mixpanel_event_date',
+        'idx_mixpanel_event_name_date',
+        'idx_mixpanel_event_user_name_time',
+        'idx_mixpanel_event_user_product',
+        'idx_mixpanel_event_product_name',
         
         # User Product Metrics indexes
         'idx_upm_distinct_id',
@@ -5,6 +5,9 @@ Module 3: Data Ingestion - Production Ready
 This module ingests downloaded Mixpanel data into the database with:
 - Robust error handling and retry mechanisms
 - Memory-efficient streaming processing
+- Multi-core event parsing with a single batched writer
+- Bulk-load mode for backfills (deferred indexes, resumable bookkeeping)
+- Narrow event rows with the full payload compressed in mixpanel_event_payload
 - Comprehensive data validation and filtering
 - Production-grade optimizations and monitoring
 - Now reads from database tables instead of filesystem
@@ -19,6 +22,8 @@ import logging
 import time
 import datetime
 import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Any, Tuple
 from dataclasses import dataclass
@@ -42,7 +47,10 @@ except ImportError:
 # Add utils directory to path for database utilities
 utils_path = str(Path(__file__).resolve().parent.parent.parent / "utils")
 sys.path.append(utils_path)
-from database_utils import get_database_path
+from database_utils import (
+    get_database_path, get_pending_bulk_load, begin_bulk_load, record_bulk_load_progress, finish_bulk_load,
+    compress_event_payload, mark_dirty_pairs, mark_dirty_pairs_from_query
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -72,6 +80,20 @@ CONNECTION_TIMEOUT = 60.0
 MAX_RETRY_ATTEMPTS = 3
 RETRY_DELAY = 1.0
 
+# Parallel event parsing configuration (INGEST_WORKERS=1 disables the process pool)
+INGEST_WORKERS = max(1, int(os.environ.get('INGEST_WORKERS', os.cpu_count() or 1)))
+PARSE_CHUNK_SIZE = 5000  # Raw rows handed to a worker per task
+MAX_PENDING_CHUNKS_PER_WORKER = 2  # Bounds parsed-but-unwritten rows held in memory
+
+# Bulk-load mode for backfills: 'auto' (when mixpanel_event is empty or a bulk load was
+# interrupted), 'on', 'off' (restores indexes of an interrupted load), or 'rollback'
+INGEST_BULK_LOAD = os.environ.get('INGEST_BULK_LOAD', 'auto').lower()
+BULK_LOAD_PIPELINE_NAME = 'ingest_data_bulk_load'
+BULK_LOAD_TABLES = ['mixpanel_user', 'mixpanel_event']  # user_identity_map keeps its index for per-user alias refresh
+
+# Read-only identity mappings used by parse workers (inherited via fork or set by initializer)
+_worker_user_mappings: Optional[dict] = None
+
 def get_raw_data_connection():
     """Get connection to database for raw data (PostgreSQL if available, otherwise SQLite)"""
     if USE_POSTGRES:
@@ -142,8 +164,22 @@ def main():
             # Validate database schema before proceeding
             validate_database_schema(sqlite_conn)
             
+            if INGEST_BULK_LOAD == 'rollback':
+                rollback_bulk_load(sqlite_conn)
+                return 0
+            
             # Process all data with comprehensive error handling
-            process_all_data(raw_data_conn, raw_db_type, sqlite_conn, metrics)
+            bulk_load = should_use_bulk_load(sqlite_conn)
+            if bulk_load:
+                begin_bulk_load(sqlite_conn, BULK_LOAD_PIPELINE_NAME, BULK_LOAD_TABLES)
+            else:
+                # Restore indexes left behind by an interrupted bulk load that is not being resumed
+                finish_bulk_load(sqlite_conn, BULK_LOAD_PIPELINE_NAME)
+            
+            process_all_data(raw_data_conn, raw_db_type, sqlite_conn, metrics, bulk_load)
+            
+            if bulk_load:
+                finish_bulk_load(sqlite_conn, BULK_LOAD_PIPELINE_NAME)
             
             # Verify data integrity
             verify_ingestion(sqlite_conn, metrics)
@@ -211,6 +247,48 @@ def create_sqlite_connection():
     logger.info("SQLite database connection established with optimizations")
     return conn
 
+def should_use_bulk_load(sqlite_conn: sqlite3.Connection) -> bool:
+    """Decide whether this run ingests in bulk-load mode (see INGEST_BULK_LOAD)"""
+    if INGEST_BULK_LOAD in ('on', 'true', '1'):
+        return True
+    if INGEST_BULK_LOAD in ('off', 'false', '0'):
+        return False
+    
+    # auto: resume an interrupted bulk load, or bulk load into an empty event table (full backfill)
+    if get_pending_bulk_load(sqlite_conn, BULK_LOAD_PIPELINE_NAME):
+        return True
+    has_events = sqlite_conn.execute("SELECT 1 FROM mixpanel_event LIMIT 1").fetchone()
+    if not has_events:
+        logger.info("mixpanel_event is empty - using bulk-load mode for backfill")
+        return True
+    return False
+
+def rollback_bulk_load(sqlite_conn: sqlite3.Connection):
+    """
+    Roll back an interrupted bulk load: rebuild the deferred indexes, then remove the event
+    days it committed so the next run re-ingests them from raw data.
+    """
+    pending = get_pending_bulk_load(sqlite_conn, BULK_LOAD_PIPELINE_NAME)
+    if not pending:
+        logger.info("No interrupted bulk load to roll back")
+        return
+    
+    finish_bulk_load(sqlite_conn, BULK_LOAD_PIPELINE_NAME)
+    
+    loaded_dates = pending['loaded_records']
+    cursor = sqlite_conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        for date_str in loaded_dates:
+            delete_event_date(cursor, date_str)
+            cursor.execute("DELETE FROM processed_event_days WHERE date_day = ?", (date_str,))
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    
+    logger.info(f"Rolled back interrupted bulk load: removed {len(loaded_dates)} event days")
+
 def show_raw_data_summary(raw_data_conn, raw_db_type: str):
     """Show summary of raw data available for processing"""
     cursor = raw_data_conn.cursor()
@@ -310,7 +388,9 @@ def validate_database_schema(conn: sqlite3.Connection):
     # Check critical tables exist
     required_tables = [
         'mixpanel_user',
+        'user_identity_map',
         'mixpanel_event', 
+        'mixpanel_event_payload',
         'user_product_metrics',
         'ad_performance_daily',
         'processed_event_days'
@@ -341,7 +421,7 @@ def validate_database_schema(conn: sqlite3.Connection):
     
     logger.info("Database schema validation passed")
 
-def process_all_data(raw_data_conn, raw_db_type: str, sqlite_conn: sqlite3.Connection, metrics: IngestionMetrics):
+def process_all_data(raw_data_conn, raw_db_type: str, sqlite_conn: sqlite3.Connection, metrics: IngestionMetrics, bulk_load: bool = False):
     """Process all user and event data with comprehensive error handling"""
     
     # Step 1: Refresh all users
@@ -355,7 +435,7 @@ def process_all_data(raw_data_conn, raw_db_type: str, sqlite_conn: sqlite3.Conne
     
     # Step 3: Process events incrementally with pre-loaded mappings
     logger.info("=== Step 3: Processing Events Incrementally ===")
-    process_events_incrementally(raw_data_conn, raw_db_type, sqlite_conn, metrics, global_user_mappings)
+    process_events_incrementally(raw_data_conn, raw_db_type, sqlite_conn, metrics, global_user_mappings, bulk_load)
 
 def load_user_mappings_to_memory(sqlite_conn: sqlite3.Connection) -> dict:
     """
@@ -371,28 +451,13 @@ def load_user_mappings_to_memory(sqlite_conn: sqlite3.Connection) -> dict:
     
     cursor = sqlite_conn.cursor()
     
-    # Load all user distinct_ids and their profile JSON
-    cursor.execute("""
-        SELECT distinct_id, profile_json FROM mixpanel_user 
-        WHERE profile_json IS NOT NULL
-    """)
+    # Ingest always stores profile_json, so the primary key index alone covers this scan
+    cursor.execute("SELECT distinct_id FROM mixpanel_user")
+    distinct_ids = {row[0] for row in cursor}
     
-    distinct_ids = set()
-    user_id_to_distinct_id = {}
-    
-    for row in cursor.fetchall():
-        distinct_id, profile_json = row
-        distinct_ids.add(distinct_id)
-        
-        # Extract $user_id from profile_json for identity merging
-        try:
-            profile = json.loads(profile_json)
-            properties = profile.get('properties', {})
-            user_id = properties.get('$user_id')
-            if user_id:
-                user_id_to_distinct_id[user_id] = distinct_id
-        except (json.JSONDecodeError, KeyError):
-            continue
+    # $user_id aliases are materialized at user ingest (see process_user_batch)
+    cursor.execute("SELECT alias_id, distinct_id FROM user_identity_map")
+    user_id_to_distinct_id = dict(cursor.fetchall())
     
     return {
         'distinct_ids': distinct_ids,
@@ -551,7 +616,7 @@ def process_user_batch_from_raw_data(sqlite_conn: sqlite3.Connection, users_batc
         logger.error(f"Failed to process user batch from raw data: {e}")
         raise
 
-def process_events_incrementally(raw_data_conn, raw_db_type: str, sqlite_conn: sqlite3.Connection, metrics: IngestionMetrics, global_user_mappings: dict):
+def process_events_incrementally(raw_data_conn, raw_db_type: str, sqlite_conn: sqlite3.Connection, metrics: IngestionMetrics, global_user_mappings: dict, bulk_load: bool = False):
     """Process events incrementally by date from raw_event_data table"""
     
     # Get already processed dates from SQLite
@@ -636,7 +701,24 @@ def process_events_incrementally(raw_data_conn, raw_db_type: str, sqlite_conn: s
         logger.info("No new or refresh event dates to process")
         return
     
-    # Process each date
+    # Parse pool is shared by all dates so workers inherit the user mappings only once
+    parse_pool = create_event_parse_pool(global_user_mappings)
+    try:
+        process_event_dates(raw_cursor, raw_db_type, sqlite_conn, metrics, dates_to_process, refresh_dates_set, parse_pool, bulk_load)
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+    
+    # Log summary of event processing
+    if metrics.dates_processed > 0:
+        logger.info(f"Event processing completed: {metrics.dates_processed} dates, {metrics.events_processed} events ingested")
+        if len(refresh_dates_to_process) > 0:
+            logger.info(f"🔄 Successfully re-processed {len(refresh_dates_to_process)} refresh dates for data freshness")
+
+def process_event_dates(raw_cursor, raw_db_type: str, sqlite_conn: sqlite3.Connection, metrics: IngestionMetrics,
+                        dates_to_process: List, refresh_dates_set: Set[str], parse_pool: Optional[ProcessPoolExecutor],
+                        bulk_load: bool = False):
+    """Process each date in its own transaction, parsing raw events through the parse pool"""
     for date_obj in dates_to_process:
         date_str = date_obj.strftime('%Y-%m-%d')
         is_refresh_date = date_str in refresh_dates_set
@@ -645,7 +727,7 @@ def process_events_incrementally(raw_data_conn, raw_db_type: str, sqlite_conn: s
             logger.info(f"🔄 RE-PROCESSING refresh date: {date_str}")
             # Clear existing processed data for refresh dates
             sqlite_cursor = sqlite_conn.cursor()
-            sqlite_cursor.execute("DELETE FROM mixpanel_event WHERE DATE(event_time) = ?", (date_str,))
+            delete_event_date(sqlite_cursor, date_str)
             sqlite_cursor.execute("DELETE FROM processed_event_days WHERE date_day = ?", (date_str,))
             sqlite_conn.commit()
             logger.info(f"🗑️  Cleared existing processed data for refresh date: {date_str}")
@@ -674,57 +756,25 @@ def process_events_incrementally(raw_data_conn, raw_db_type: str, sqlite_conn: s
                 """, (date_str,))
             
             date_events = 0
-            event_batch = []
+            source_label = f"{raw_db_type}:{date_str}"
             
-            for (event_data_json,) in raw_cursor:
-                try:
-                    # Handle both JSON string and dict data types
-                    if isinstance(event_data_json, str):
-                        event_data = json.loads(event_data_json)
-                    elif isinstance(event_data_json, dict):
-                        event_data = event_data_json
-                    else:
-                        logger.warning(f"Unexpected event_data type: {type(event_data_json)}")
-                        metrics.events_skipped_invalid += 1
-                        continue
-                    
-                    # Handle both old and new event data formats
-                    event_name = event_data.get('event') or event_data.get('event_name')
-                    
-                    # Skip unimportant events
-                    if event_name not in IMPORTANT_EVENTS:
-                        metrics.events_skipped_unimportant += 1
-                        continue
-                    
-                    # Extract and validate event data
-                    event_record = prepare_event_record(event_data, f"{raw_db_type}:{date_str}", 0)
-                    if not event_record:
-                        metrics.events_skipped_invalid += 1
-                        continue
-                    
-                    event_batch.append(event_record)
-                    
-                    # Process in batches
-                    if len(event_batch) >= BATCH_SIZE:
-                        events_inserted = insert_event_batch(sqlite_cursor, event_batch, metrics, is_refresh_date, global_user_mappings)
-                        date_events += events_inserted
-                        event_batch.clear()
-                    
-                except json.JSONDecodeError:
-                    logger.warning(f"Invalid JSON in event data for {date_str}")
-                    metrics.events_skipped_invalid += 1
-                except Exception as e:
-                    logger.error(f"Error processing event for {date_str}: {e}")
-                    metrics.events_skipped_invalid += 1
-            
-            # Process remaining batch
-            if event_batch:
-                events_inserted = insert_event_batch(sqlite_cursor, event_batch, metrics, is_refresh_date, global_user_mappings)
-                date_events += events_inserted
+            # Parse raw rows in worker processes, write ready-to-insert tuples from this process
+            for event_records, chunk_counts in iter_parsed_event_chunks(raw_cursor, source_label, parse_pool):
+                metrics.events_skipped_unimportant += chunk_counts['skipped_unimportant']
+                metrics.events_skipped_invalid += chunk_counts['skipped_invalid']
+                metrics.events_skipped_missing_users += chunk_counts['skipped_missing_users']
+                
+                if event_records:
+                    write_event_batch(sqlite_cursor, event_records, is_refresh_date)
+                    date_events += len(event_records)
             
             # Mark date as processed
             mark_date_as_processed(sqlite_cursor, date_str, 1, date_events)
             
+            # Bulk-load bookkeeping commits atomically with the date's events
+            if bulk_load:
+                record_bulk_load_progress(sqlite_cursor, BULK_LOAD_PIPELINE_NAME, date_str)
+            
             sqlite_cursor.execute("COMMIT")
             
             metrics.dates_processed += 1
@@ -737,12 +787,129 @@ def process_events_incrementally(raw_data_conn, raw_db_type: str, sqlite_conn: s
             sqlite_cursor.execute("ROLLBACK")
             logger.error(f"Failed to process date {date_str}: {e}")
             raise
+
+def create_event_parse_pool(global_user_mappings: dict) -> Optional[ProcessPoolExecutor]:
+    """
+    Create the process pool used to parse raw events.
     
-    # Log summary of event processing
-    if metrics.dates_processed > 0:
-        logger.info(f"Event processing completed: {metrics.dates_processed} dates, {metrics.events_processed} events ingested")
-        if len(refresh_dates_to_process) > 0:
-            logger.info(f"🔄 Successfully re-processed {len(refresh_dates_to_process)} refresh dates for data freshness")
+    The user mappings are published as a module global before the pool starts so that
+    forked workers share them copy-on-write; the initializer covers spawn-based platforms.
+    Returns None when INGEST_WORKERS is 1, in which case chunks are parsed in-process.
+    """
+    global _worker_user_mappings
+    _worker_user_mappings = global_user_mappings
+    
+    if INGEST_WORKERS <= 1:
+        logger.info("Parsing events in-process (INGEST_WORKERS=1)")
+        return None
+    
+    start_methods = multiprocessing.get_all_start_methods()
+    mp_context = multiprocessing.get_context('fork') if 'fork' in start_methods else None
+    
+    logger.info(f"Starting event parse pool with {INGEST_WORKERS} workers")
+    return ProcessPoolExecutor(
+        max_workers=INGEST_WORKERS,
+        mp_context=mp_context,
+        initializer=_init_parse_worker,
+        initargs=(None if mp_context is not None else global_user_mappings,)
+    )
+
+def _init_parse_worker(global_user_mappings: Optional[dict]):
+    """Install the shared user mappings in a parse worker (no-op when inherited via fork)"""
+    global _worker_user_mappings
+    if global_user_mappings is not None:
+        _worker_user_mappings = global_user_mappings
+
+def iter_parsed_event_chunks(raw_cursor, source_label: str, parse_pool: Optional[ProcessPoolExecutor]):
+    """
+    Stream raw event rows from the cursor in chunks and yield parsed results in source order.
+    
+    Raw rows are always fetched on the calling thread (database cursors are not shared with
+    workers). At most INGEST_WORKERS * MAX_PENDING_CHUNKS_PER_WORKER chunks are in flight,
+    and results are yielded in submission order so INSERT OR IGNORE / INSERT OR REPLACE
+    resolve duplicates exactly as the sequential path does.
+    
+    Yields:
+        Tuple of (ready-to-insert event tuples, skip counters) per chunk
+    """
+    if parse_pool is None:
+        while True:
+            raw_rows = raw_cursor.fetchmany(PARSE_CHUNK_SIZE)
+            if not raw_rows:
+                return
+            yield parse_event_chunk(raw_rows, source_label)
+    
+    max_pending = INGEST_WORKERS * MAX_PENDING_CHUNKS_PER_WORKER
+    pending = []
+    
+    while True:
+        while len(pending) < max_pending:
+            raw_rows = raw_cursor.fetchmany(PARSE_CHUNK_SIZE)
+            if not raw_rows:
+                break
+            pending.append(parse_pool.submit(parse_event_chunk, raw_rows, source_label))
+        
+        if not pending:
+            return
+        
+        yield pending.pop(0).result()
+
+def parse_event_chunk(raw_rows: List[Tuple], source_label: str) -> Tuple[List[Tuple], Dict[str, int]]:
+    """
+    Parse a chunk of raw event rows into ready-to-insert event tuples (runs in parse workers).
+    
+    Performs JSON decoding, important-event filtering, record preparation and identity
+    resolution against the shared user mappings.
+    
+    Returns:
+        Tuple of (event tuples with resolved distinct_id, skip counters)
+    """
+    counts = {
+        'skipped_unimportant': 0,
+        'skipped_invalid': 0,
+        'skipped_missing_users': 0
+    }
+    event_records = []
+    
+    for (event_data_json,) in raw_rows:
+        try:
+            # Handle both JSON string and dict data types
+            if isinstance(event_data_json, str):
+                event_data = json.loads(event_data_json)
+            elif isinstance(event_data_json, dict):
+                event_data = event_data_json
+            else:
+                logger.warning(f"Unexpected event_data type: {type(event_data_json)}")
+                counts['skipped_invalid'] += 1
+                continue
+            
+            # Handle both old and new event data formats
+            event_name = event_data.get('event') or event_data.get('event_name')
+            
+            # Skip unimportant events
+            if event_name not in IMPORTANT_EVENTS:
+                counts['skipped_unimportant'] += 1
+                continue
+            
+            # Extract and validate event data
+            event_record = prepare_event_record(event_data, source_label, 0)
+            if not event_record:
+                counts['skipped_invalid'] += 1
+                continue
+            
+            event_records.append(event_record)
+            
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid JSON in event data for {source_label}")
+            counts['skipped_invalid'] += 1
+        except Exception as e:
+            logger.error(f"Error processing event for {source_label}: {e}")
+            counts['skipped_invalid'] += 1
+    
+    resolved_events, skipped_events = resolve_event_identities(event_records, _worker_user_mappings)
+    counts['skipped_missing_users'] = skipped_events
+    
+    return resolved_events, counts
 
 def should_filter_user(distinct_id: str, email: str) -> Dict[str, Any]:
     """Determine if user should be filtered and why"""
@@ -812,6 +979,7 @@ def prepare_user_record(user_data: Dict[str, Any], distinct_id: str) -> Dict[str
     
     return {
         'distinct_id': distinct_id,
+        'user_id': properties.get('$user_id'),  # Identity merge alias, see user_identity_map
         'abi_ad_id': abi_ad_id,
         'abi_campaign_id': abi_campaign_id,
         'abi_ad_set_id': abi_ad_set_id,
@@ -859,6 +1027,16 @@ def process_user_batch(cursor: sqlite3.Cursor, user_batch: List[Dict]):
         """,
         user_records
     )
+    
+    # Keep the identity map in step with the profiles just written
+    cursor.executemany(
+        "DELETE FROM user_identity_map WHERE distinct_id = ?",
+        [(user['distinct_id'],) for user in user_batch]
+    )
+    cursor.executemany(
+        "INSERT OR REPLACE INTO user_identity_map (alias_id, distinct_id) VALUES (?, ?)",
+        [(user['user_id'], user['distinct_id']) for user in user_batch if user['user_id']]
+    )
 
 def log_user_filtering_examples(file_name: str, atly_examples: List[Tuple], 
                                test_examples: List[Tuple], steps_examples: List[Tuple], file_metrics: Dict[str, int]):
@@ -884,6 +1062,16 @@ def log_user_filtering_examples(file_name: str, atly_examples: List[Tuple],
             for distinct_id, email in steps_examples:
                 logger.info(f"  - distinct_id: {distinct_id}, email: {email}")
 
+def extract_event_property(properties: Dict[str, Any], key: str) -> Any:
+    """
+    Extract a property for a materialized event column, matching what
+    JSON_EXTRACT(<event json>, '$.properties.<key>') returns for the raw event payload
+    """
+    value = properties.get(key)
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return json.dumps(value)
+
 def prepare_event_record(event_data: Dict[str, Any], file_path: str, line_num: int) -> Optional[Tuple]:
     """Prepare event record with validation and ALL required fields"""
     try:
@@ -970,17 +1158,24 @@ def prepare_event_record(event_data: Dict[str, Any], file_path: str, line_num: i
             refund_flag,
             is_late_event,
             trial_expiration_at_calc.isoformat() if trial_expiration_at_calc else None,
-            json.dumps(event_data) if isinstance(event_data, dict) else str(event_data)
+            compress_event_payload(json.dumps(event_data) if isinstance(event_data, dict) else str(event_data)),
+            event_time.date().isoformat(),  # event_date (UTC) for indexed date filtering
+            extract_event_property(properties, 'product_id'),
+            extract_event_property(properties, 'store'),
+            extract_event_property(properties, 'device')
         )
         
     except Exception as e:
         logger.error(f"Error preparing event record {file_path}:{line_num}: {e}")
         return None
 
-def insert_event_batch(cursor: sqlite3.Cursor, event_batch: List[Tuple], metrics: IngestionMetrics, is_refresh_date: bool, global_user_mappings: dict) -> int:
-    """Insert event batch with pre-loaded user mappings for optimal performance"""
+def resolve_event_identities(event_batch: List[Tuple], global_user_mappings: dict) -> Tuple[List[Tuple], int]:
+    """
+    Map event distinct_ids onto existing users using the pre-loaded mappings
     
-    # Filter events to only include those with existing users
+    Returns:
+        Tuple of (events with corrected distinct_id, number of events without a matching user)
+    """
     valid_events = []
     skipped_events = 0
     
@@ -1006,38 +1201,49 @@ def insert_event_batch(cursor: sqlite3.Cursor, event_batch: List[Tuple], metrics
         else:
             skipped_events += 1
     
-    # Track skipped events in metrics (no longer log per batch)
-    if skipped_events > 0:
-        metrics.events_skipped_missing_users += skipped_events
-    
-    # Insert only valid events
-    if valid_events:
-        # CRITICAL: Use INSERT OR REPLACE for refresh dates to ensure updates are applied
-        # Use INSERT OR IGNORE for new dates to avoid duplicates
-        if is_refresh_date:
-            insert_sql = """
-                INSERT OR REPLACE INTO mixpanel_event 
-                (event_uuid, event_name, abi_ad_id, abi_campaign_id, abi_ad_set_id, 
-                 distinct_id, event_time, country, region, revenue_usd, 
-                 raw_amount, currency, refund_flag, is_late_event, 
-                 trial_expiration_at_calc, event_json)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            logger.debug(f"Using INSERT OR REPLACE for {len(valid_events)} refresh events")
-        else:
-            insert_sql = """
-                INSERT OR IGNORE INTO mixpanel_event 
-                (event_uuid, event_name, abi_ad_id, abi_campaign_id, abi_ad_set_id, 
-                 distinct_id, event_time, country, region, revenue_usd, 
-                 raw_amount, currency, refund_flag, is_late_event, 
-                 trial_expiration_at_calc, event_json)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            logger.debug(f"Using INSERT OR IGNORE for {len(valid_events)} new events")
-        
-        cursor.executemany(insert_sql, valid_events)
+    return valid_events, skipped_events
+
+def write_event_batch(cursor: sqlite3.Cursor, valid_events: List[Tuple], is_refresh_date: bool):
+    """Write ready-to-insert event tuples (event row + compressed payload) in one executemany each"""
+    # CRITICAL: Use INSERT OR REPLACE for refresh dates to ensure updates are applied
+    # Use INSERT OR IGNORE for new dates to avoid duplicates
+    conflict_action = 'REPLACE' if is_refresh_date else 'IGNORE'
+    logger.debug(f"Using INSERT OR {conflict_action} for {len(valid_events)} {'refresh' if is_refresh_date else 'new'} events")
+    
+    # The compressed payload (index 15) goes to the side table, everything else to mixpanel_event
+    event_rows = [event[:15] + event[16:] for event in valid_events]
+    payload_rows = [(event[0], event[15]) for event in valid_events]
+    
+    cursor.executemany(f"""
+        INSERT OR {conflict_action} INTO mixpanel_event 
+        (event_uuid, event_name, abi_ad_id, abi_campaign_id, abi_ad_set_id, 
+         distinct_id, event_time, country, region, revenue_usd, 
+         raw_amount, currency, refund_flag, is_late_event, 
+         trial_expiration_at_calc, event_date, product_id, store, device)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, event_rows)
+    cursor.executemany(
+        f"INSERT OR {conflict_action} INTO mixpanel_event_payload (event_uuid, payload) VALUES (?, ?)",
+        payload_rows
+    )
     
-    return len(valid_events)
+    # Queue the written pairs for incremental pre-processing (distinct_id index 5, product_id index 16)
+    mark_dirty_pairs(cursor, ((row[5], row[16]) for row in event_rows), 'ingest')
+
+def delete_event_date(cursor: sqlite3.Cursor, date_str: str):
+    """Delete one day of events together with their payloads (caller commits)"""
+    # Pairs losing events need pre-processing even if the refreshed day no longer has them
+    mark_dirty_pairs_from_query(
+        cursor,
+        "SELECT DISTINCT distinct_id, product_id FROM mixpanel_event WHERE event_date = ?",
+        (date_str,),
+        'ingest_refresh'
+    )
+    cursor.execute("""
+        DELETE FROM mixpanel_event_payload
+        WHERE event_uuid IN (SELECT event_uuid FROM mixpanel_event WHERE event_date = ?)
+    """, (date_str,))
+    cursor.execute("DELETE FROM mixpanel_event WHERE event_date = ?", (date_str,))
 
 def get_processed_dates(conn: sqlite3.Connection) -> Set[str]:
     """Get set of already processed dates"""
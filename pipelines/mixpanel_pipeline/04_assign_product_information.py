@@ -14,8 +14,8 @@ Processes the entire user base to ensure comprehensive product relationship data
 for downstream analytics and reporting.
 """
 
+import os
 import sqlite3
-import json
 import logging
 import argparse
 import sys
@@ -40,6 +40,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Rows pulled from the discovery cursor per fetch
+DISCOVERY_FETCH_SIZE = int(os.environ.get('PRODUCT_DISCOVERY_FETCH_SIZE', 50000))
+
 def normalize_store_value(store_value: Any) -> Optional[str]:
     """
     Normalize store values to standard format
@@ -98,57 +101,16 @@ def prioritize_store(stores: Set[str]) -> str:
         # Return the first one alphabetically for consistency
         return sorted(stores)[0]
 
-def extract_metadata_from_event(event_json: str) -> Dict[str, Any]:
-    """
-    Extract metadata from a single event's JSON
-    
-    Args:
-        event_json: JSON string from event
-        
-    Returns:
-        Dictionary of extracted metadata
-    """
-    # Handle edge cases for malformed or empty JSON
-    if not event_json or not isinstance(event_json, str):
-        return {}
-    
-    # Handle whitespace-only strings
-    if not event_json.strip():
-        return {}
-    
-    try:
-        event_data = json.loads(event_json)
-        
-        # Handle case where event_data is not a dict
-        if not isinstance(event_data, dict):
-            return {}
-            
-        properties = event_data.get('properties', {})
-        
-        # Handle case where properties is not a dict
-        if not isinstance(properties, dict):
-            return {}
-        
-        # Extract key metadata
-        metadata = {
-            'store': normalize_store_value(properties.get('store')),
-            'device': properties.get('device'),
-            'revenue': properties.get('revenue'),
-            'currency': properties.get('currency'),
-        }
-        
-        # Clean up None values but keep the keys
-        return metadata
-        
-    except (json.JSONDecodeError, TypeError, AttributeError) as e:
-        logger.debug(f"Failed to parse event JSON: {e}")
-        return {}
-
 def discover_all_user_products_efficiently(cursor: sqlite3.Cursor) -> Dict[str, Dict[str, Dict[str, Any]]]:
     """
     EFFICIENTLY discover all user-product relationships by processing ALL events ONCE
     This is much faster than the old approach of querying each user individually.
     
+    Events are streamed in (distinct_id, product_id, event_time) order straight off
+    idx_mixpanel_event_user_product, so each user-product combination is finalized
+    as soon as its last event is read. Memory is bounded by the number of
+    relationships returned, not by the number of events scanned.
+    
     Args:
         cursor: Database cursor
         
@@ -162,101 +124,88 @@ def discover_all_user_products_efficiently(cursor: sqlite3.Cursor) -> Dict[str,
     cursor.execute("""
         SELECT 
             e.distinct_id,
+            e.product_id,
             e.event_time,
             e.country,
             e.region,
-            e.abi_ad_id,
-            e.abi_campaign_id,
-            e.abi_ad_set_id,
-            e.event_json
+            e.store,
+            e.device
         FROM mixpanel_event e
-        WHERE json_extract(e.event_json, '$.properties.product_id') IS NOT NULL
-        ORDER BY e.event_time ASC
+        WHERE e.product_id IS NOT NULL
+          AND e.product_id != ''
+        ORDER BY e.distinct_id, e.product_id, e.event_time ASC
     """)
     
-    # Build user-product mappings in memory
-    user_products = defaultdict(lambda: defaultdict(lambda: {
-        'stores_seen': set(),
-        'first_seen': None,
-        'country': None,
-        'region': None,
-        'device': None,
-        'store': None
-    }))
-    
+    user_products = {}
     events_processed = 0
-    users_discovered = set()
+    users_discovered = 0
+    total_relationships = 0
     
-    # Process ALL events in one pass
-    for row in cursor.fetchall():
-        distinct_id, event_time, country, region, abi_ad_id, abi_campaign_id, abi_ad_set_id, event_json = row
-        
-        # Track progress
-        events_processed += 1
-        users_discovered.add(distinct_id)
-        
-        if events_processed % 10000 == 0:
-            logger.info(f"📊 Processed {events_processed:,} events, discovered {len(users_discovered):,} users with products...")
+    current_user = None
+    current_key = None
+    # Compact accumulator for the combination being read:
+    # [first_seen, country, region, device, stores_seen]
+    acc = None
+    
+    def finalize(key, acc):
+        first_seen, country, region, device, stores_seen = acc
+        user_products.setdefault(key[0], {})[key[1]] = {
+            'stores_seen': list(stores_seen),
+            'first_seen': first_seen,
+            'country': country,
+            'region': region,
+            'device': device,
+            # Choose the best store from all stores seen (APP_STORE > PLAY_STORE > others)
+            'store': prioritize_store(stores_seen) if stores_seen else None
+        }
+    
+    # Process ALL events in one pass, a chunk at a time
+    while True:
+        rows = cursor.fetchmany(DISCOVERY_FETCH_SIZE)
+        if not rows:
+            break
         
-        try:
-            # Extract product_id from event JSON
-            event_data = json.loads(event_json)
-            product_id = event_data.get('properties', {}).get('product_id')
+        for distinct_id, product_id, event_time, country, region, store, device in rows:
+            events_processed += 1
             
-            if not product_id:
-                continue
-                
-            # Get/create metadata for this user-product combination
-            metadata = user_products[distinct_id][product_id]
+            key = (distinct_id, product_id)
+            if key != current_key:
+                if acc is not None:
+                    finalize(current_key, acc)
+                    total_relationships += 1
+                if distinct_id != current_user:
+                    users_discovered += 1
+                    current_user = distinct_id
+                current_key = key
+                # Events arrive in time order, so the first one sets first_seen
+                acc = [event_time, None, None, None, set()]
             
-            # Update first_seen timestamp (earliest event for this product)
-            if not metadata['first_seen'] or event_time < metadata['first_seen']:
-                metadata['first_seen'] = event_time
+            # Update location info (prefer earliest non-null values from events)
+            if country and not acc[1]:
+                acc[1] = country
+            if region and not acc[2]:
+                acc[2] = region
             
-            # Update location info (prefer non-null values from events)
-            if country and not metadata['country']:
-                metadata['country'] = country
-            if region and not metadata['region']:
-                metadata['region'] = region
-                
-
-                
-            # Extract and process store/device metadata from event
-            event_metadata = extract_metadata_from_event(event_json)
+            # Update device info (prefer non-null values)
+            if device and not acc[3]:
+                acc[3] = device
             
             # Track all stores seen for this product (for prioritization)
-            if event_metadata.get('store'):
-                metadata['stores_seen'].add(event_metadata['store'])
-                
-            # Update device info (prefer non-null values)
-            if event_metadata.get('device') and not metadata['device']:
-                metadata['device'] = event_metadata['device']
-                
-        except (json.JSONDecodeError, TypeError) as e:
-            logger.warning(f"⚠️  Skipping event with invalid JSON: {e}")
-            continue
-    
-    logger.info(f"✅ Processed {events_processed:,} events total")
-    logger.info(f"🎯 Discovered {len(users_discovered):,} users with products")
+            normalized_store = normalize_store_value(store)
+            if normalized_store:
+                acc[4].add(normalized_store)
+        
+        logger.info(f"📊 Processed {events_processed:,} events, discovered {users_discovered:,} users with products...")
     
-    # Finalize metadata for each user-product combination
-    total_relationships = 0
-    for user_id in user_products:
-        for product_id in user_products[user_id]:
-            total_relationships += 1
-            metadata = user_products[user_id][product_id]
-            
-            # Choose the best store from all stores seen (APP_STORE > PLAY_STORE > others)
-            if metadata['stores_seen']:
-                metadata['store'] = prioritize_store(metadata['stores_seen'])
-            
-            # Convert sets to lists for JSON serialization (if needed)
-            metadata['stores_seen'] = list(metadata['stores_seen'])
+    if acc is not None:
+        finalize(current_key, acc)
+        total_relationships += 1
     
+    logger.info(f"✅ Processed {events_processed:,} events total")
+    logger.info(f"🎯 Discovered {users_discovered:,} users with products")
     logger.info(f"📦 Total user-product relationships discovered: {total_relationships:,}")
     
-    # Convert to regular dict for return
-    return {user_id: dict(products) for user_id, products in user_products.items()}
+    return user_products
 
 # Keep the old function for backward compatibility (used by tests and demonstrations)
 def discover_user_products(cursor: sqlite3.Cursor, user_id: str) -> Dict[str, Dict[str, Any]]:
@@ -280,10 +229,12 @@ def discover_user_products(cursor: sqlite3.Cursor, user_id: str) -> Dict[str, Di
             abi_ad_id,
             abi_campaign_id,
             abi_ad_set_id,
-            event_json
+            product_id,
+            store,
+            device
         FROM mixpanel_event
         WHERE distinct_id = ?
-        AND json_extract(event_json, '$.properties.product_id') IS NOT NULL
+        AND product_id IS NOT NULL
         ORDER BY event_time ASC
     """, (user_id,))
     
@@ -301,44 +252,31 @@ def discover_user_products(cursor: sqlite3.Cursor, user_id: str) -> Dict[str, Di
         'store': None
     })
     
-    for event_time, country, region, abi_ad_id, abi_campaign_id, abi_ad_set_id, event_json in events:
-        try:
-            # Extract product_id
-            event_data = json.loads(event_json)
-            product_id = event_data.get('properties', {}).get('product_id')
-            
-            if not product_id:
-                continue
+    for event_time, country, region, abi_ad_id, abi_campaign_id, abi_ad_set_id, product_id, store, device in events:
+        if not product_id:
+            continue
+    
+        # Get existing metadata for this product
+        metadata = products[product_id]
         
-            # Get existing metadata for this product
-            metadata = products[product_id]
-            
-            # Update first_seen if this is earlier or first time
-            if not metadata['first_seen'] or event_time < metadata['first_seen']:
-                metadata['first_seen'] = event_time
-            
-            # Update location info (prefer non-null values)
-            if country and not metadata['country']:
-                metadata['country'] = country
-            if region and not metadata['region']:
-                metadata['region'] = region
-                
-
-                
-            # Extract and process event metadata
-            event_metadata = extract_metadata_from_event(event_json)
+        # Update first_seen if this is earlier or first time
+        if not metadata['first_seen'] or event_time < metadata['first_seen']:
+            metadata['first_seen'] = event_time
+        
+        # Update location info (prefer non-null values)
+        if country and not metadata['country']:
+            metadata['country'] = country
+        if region and not metadata['region']:
+            metadata['region'] = region
+        
+        # Track stores seen
+        normalized_store = normalize_store_value(store)
+        if normalized_store:
+            metadata['stores_seen'].add(normalized_store)
             
-            # Track stores seen
-            if event_metadata.get('store'):
-                metadata['stores_seen'].add(event_metadata['store'])
-                
-            # Update device info (prefer non-null values)  
-            if event_metadata.get('device') and not metadata['device']:
-                metadata['device'] = event_metadata['device']
-                
-        except (json.JSONDecodeError, TypeError) as e:
-            logger.warning(f"Skipping event with invalid JSON: {e}")
-            continue
+        # Update device info (prefer non-null values)  
+        if device and not metadata['device']:
+            metadata['device'] = device
     
     # Finalize metadata for each product
     for product_id in products:
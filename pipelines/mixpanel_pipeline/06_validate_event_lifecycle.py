@@ -58,6 +58,8 @@ import json
 import time
 from datetime import datetime, timedelta
 from collections import namedtuple, defaultdict
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Tuple, Set
 
@@ -68,11 +70,22 @@ from orchestrator.utils.timezone_utils import now_in_timezone
 # Add utils directory to path for database utilities
 utils_path = str(Path(__file__).resolve().parent.parent.parent / "utils")
 sys.path.append(utils_path)
-from database_utils import get_database_path
+from database_utils import get_database_path, mark_dirty_pairs
 
 # Configuration - Use centralized database path discovery
 DATABASE_PATH = get_database_path('mixpanel_data')
 
+# Rows fetched per round trip from the ordered event scan, and records per executemany
+LIFECYCLE_SCAN_BATCH_SIZE = int(os.environ.get('LIFECYCLE_SCAN_BATCH_SIZE', 10000))
+LIFECYCLE_WRITE_BATCH_SIZE = int(os.environ.get('LIFECYCLE_WRITE_BATCH_SIZE', 5000))
+
+# 'full' rebuilds every relationship; 'incremental' revalidates only users touched since the last run
+# (the pipeline.yaml steps select 'incremental')
+LIFECYCLE_VALIDATION_MODE = os.environ.get('LIFECYCLE_VALIDATION_MODE', 'full').lower()
+LIFECYCLE_JOB_NAME = '06_validate_event_lifecycle'
+# Trials started this many days before the last run may have crossed the 31-day window since
+TRIAL_WINDOW_LOOKBACK_DAYS = 33
+
 # Configure logging for detailed invalid lifecycle tracking
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -204,7 +217,7 @@ def deduplicate_user_lifecycles(conn):
             WHERE ump.distinct_id = ?
               AND ump.valid_lifecycle = 1
               AND e.event_name IN ('RC Trial started', 'RC Initial purchase')
-              AND JSON_EXTRACT(e.event_json, '$.properties.product_id') = ump.product_id
+              AND e.product_id = ump.product_id
             GROUP BY ump.product_id
             ORDER BY first_event_time DESC
             LIMIT 1
@@ -236,7 +249,7 @@ def main():
         conn = sqlite3.connect(str(DATABASE_PATH))
         
         # Setup user-product relationships and validate lifecycles
-        setup_and_validate_lifecycles(conn)
+        setup_and_validate_lifecycles(conn, LIFECYCLE_VALIDATION_MODE)
         
         conn.close()
         
@@ -247,8 +260,16 @@ def main():
         print(f"Module 6 failed: {e}", file=sys.stderr)
         return 1
 
-def setup_and_validate_lifecycles(conn):
-    """Setup user-product relationships and validate all lifecycles"""
+def setup_and_validate_lifecycles(conn, mode='full'):
+    """
+    Setup user-product relationships and validate lifecycles.
+    
+    mode='full' rebuilds every relationship from scratch. mode='incremental'
+    revalidates only users touched since the last successful run and upserts
+    their relationships, leaving every other row (and its credited_date,
+    price_bucket, rates and values) untouched. Incremental mode falls back to
+    a full rebuild when there is no previous successful run to compare against.
+    """
     cursor = conn.cursor()
     
     # Reset statistics
@@ -256,47 +277,62 @@ def setup_and_validate_lifecycles(conn):
     for key in INVALID_LIFECYCLE_STATS:
         INVALID_LIFECYCLE_STATS[key] = 0
     
-    # PRESERVE METADATA: Backup before clearing
-    cursor.execute("""
-        CREATE TEMP TABLE temp_attribution_backup_setup AS
-        SELECT 
-            distinct_id,
-            product_id,
-            country,
-            region,
-            device,
-            store
-        FROM user_product_metrics
-    """)
+    # Captured before reading events so anything ingested mid-run is picked up next time
+    cursor.execute("SELECT CURRENT_TIMESTAMP")
+    run_started_at = cursor.fetchone()[0]
+    run_start_time = time.time()
     
-    # Clear existing relationships and validation data
-    cursor.execute("DELETE FROM user_product_metrics WHERE 1=1")
-    conn.commit()
-    
-    # Get ALL valid users with subscription events and their products
-    cursor.execute("""
-        SELECT DISTINCT 
-            e.distinct_id,
-            JSON_EXTRACT(e.event_json, '$.properties.product_id') as product_id
-        FROM mixpanel_event e
-        JOIN mixpanel_user u ON e.distinct_id = u.distinct_id
-        WHERE u.valid_user = 1
-          AND e.event_name IN ('RC Trial started', 'RC Trial cancelled', 'RC Trial converted', 'RC Initial purchase', 'RC Cancellation', 'RC Renewal')
-          AND JSON_EXTRACT(e.event_json, '$.properties.product_id') IS NOT NULL
-          AND JSON_EXTRACT(e.event_json, '$.properties.product_id') != ''
-    """)
+    last_success = None
+    if mode == 'incremental':
+        last_success = get_last_successful_run(cursor)
+        if last_success is None:
+            print("ℹ️  No previous successful lifecycle validation recorded - running full rebuild")
     
-    user_product_pairs = cursor.fetchall()
+    if last_success is not None:
+        touched_users = collect_touched_users(cursor, last_success)
+        print(f"🔄 Incremental mode: revalidating {touched_users:,} users touched since {last_success}")
+        
+        # Relationships whose events are gone (or never qualified) would not survive a full rebuild
+        pruned_count = prune_ineligible_relationships(cursor)
+        if pruned_count > 0:
+            print(f"🧹 Removed {pruned_count:,} relationships without lifecycle events")
+        
+        # Existing rows keep their metadata through the upsert
+        attribution_by_pair = {}
+        user_scope_table = 'temp_lifecycle_users'
+    else:
+        # PRESERVE METADATA: Backup before clearing
+        cursor.execute("""
+            CREATE TEMP TABLE temp_attribution_backup_setup AS
+            SELECT 
+                distinct_id,
+                product_id,
+                country,
+                region,
+                device,
+                store
+            FROM user_product_metrics
+        """)
+        
+        # Clear existing relationships and validation data
+        cursor.execute("DELETE FROM user_product_metrics WHERE 1=1")
+        conn.commit()
+        
+        # Bulk hash join: load preserved metadata keyed by (distinct_id, product_id)
+        attribution_by_pair = load_attribution_backup(cursor)
+        cursor.execute("DROP TABLE temp_attribution_backup_setup")
+        user_scope_table = None
     
-    # Create relationships and validate lifecycles in one pass
+    # Create relationships and validate lifecycles in one ordered pass
     valid_count = 0
     total_count = 0
+    last_updated_ts = now_in_timezone()
+    pending_records = []
+    failed_pairs = []
+    write_cursor = conn.cursor()
     
-    for i, (distinct_id, product_id) in enumerate(user_product_pairs):
+    for distinct_id, product_id, events in stream_user_product_events(cursor, user_scope_table):
         try:
-            # Get events for this user-product combination
-            events = get_user_product_events(cursor, distinct_id, product_id)
-            
             # Validate lifecycle
             is_valid, reason = validate_lifecycle_pattern(events, distinct_id, product_id)
             
@@ -307,61 +343,44 @@ def setup_and_validate_lifecycles(conn):
                 valid_count += 1
             
             # Create the relationship record with attribution data if available
-            cursor.execute("""
-                SELECT country, region, device, store
-                FROM temp_attribution_backup_setup
-                WHERE distinct_id = ? AND product_id = ?
-            """, (distinct_id, product_id))
-            
-            metadata = cursor.fetchone()
-            
-            if metadata:
-                # Restore with metadata
-                country, region, device, store = metadata
-                cursor.execute("""
-                    INSERT INTO user_product_metrics 
-                    (distinct_id, product_id, credited_date, current_status, current_value, 
-                     value_status, last_updated_ts, valid_lifecycle, country, region, device, store)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    distinct_id, 
-                    product_id,
-                    'PLACEHOLDER_DATE',
-                    'PLACEHOLDER_STATUS',
-                    -999.99,
-                    'PLACEHOLDER_VALUE_STATUS',
-                    now_in_timezone(),
-                    1 if is_valid else 0,
-                    country,                # PRESERVED geographic data
-                    region,                 # PRESERVED geographic data
-                    device,                 # PRESERVED device data
-                    store                   # PRESERVED store data
-                ))
-            else:
-                # Create without metadata (new relationship)
-                cursor.execute("""
-                    INSERT INTO user_product_metrics 
-                    (distinct_id, product_id, credited_date, current_status, current_value, 
-                     value_status, last_updated_ts, valid_lifecycle)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    distinct_id, 
-                    product_id,
-                    'PLACEHOLDER_DATE',
-                    'PLACEHOLDER_STATUS',
-                    -999.99,
-                    'PLACEHOLDER_VALUE_STATUS',
-                    now_in_timezone(),
-                    1 if is_valid else 0
-                ))
+            country, region, device, store = attribution_by_pair.get(
+                (distinct_id, product_id), (None, None, None, None)
+            )
+            pending_records.append((
+                distinct_id,
+                product_id,
+                'PLACEHOLDER_DATE',
+                'PLACEHOLDER_STATUS',
+                -999.99,
+                'PLACEHOLDER_VALUE_STATUS',
+                last_updated_ts,
+                1 if is_valid else 0,
+                country,                # PRESERVED geographic data
+                region,                 # PRESERVED geographic data
+                device,                 # PRESERVED device data
+                store                   # PRESERVED store data
+            ))
             
             total_count += 1
                 
         except Exception as e:
             increment_invalid_stat('datetime_parse_error')
+            failed_pairs.append((distinct_id, product_id))
+        
+        if len(pending_records) >= LIFECYCLE_WRITE_BATCH_SIZE:
+            write_lifecycle_records(write_cursor, pending_records)
+            pending_records = []
     
-    # Clean up temporary table
-    cursor.execute("DROP TABLE temp_attribution_backup_setup")
+    write_lifecycle_records(write_cursor, pending_records)
+    
+    if user_scope_table:
+        # A full rebuild would not recreate pairs that failed validation
+        write_cursor.executemany("""
+            DELETE FROM user_product_metrics WHERE distinct_id = ? AND product_id = ?
+        """, failed_pairs)
+        cursor.execute(f"DROP TABLE {user_scope_table}")
+    
+    record_successful_run(cursor, run_started_at, int(time.time() - run_start_time))
     conn.commit()
     
     # DEDUPLICATION: Ensure each user has only one valid lifecycle
@@ -374,6 +393,8 @@ def setup_and_validate_lifecycles(conn):
     
     # Display concise results
     print(f"✅ Processed {total_count:,} user-product relationships")
+    if total_count == 0:
+        return
     print(f"✅ Valid lifecycles: {valid_count:,} ({valid_count/total_count*100:.1f}%)")
     if total_count - valid_count > 0:
         print(f"❌ Invalid lifecycles: {total_count-valid_count:,} ({(total_count-valid_count)/total_count*100:.1f}%)")
@@ -400,44 +421,183 @@ def classify_event_type(event_name):
     """Classify an event name into lifecycle event types"""
     return EVENT_CLASSIFICATION.get(event_name, 'other')
 
-def get_user_product_events(cursor, distinct_id, product_id):
-    """Get all events for a specific user-product combination, ordered by time"""
+def load_attribution_backup(cursor):
+    """Load the preserved attribution metadata into a dict keyed by (distinct_id, product_id)"""
+    cursor.execute("""
+        SELECT distinct_id, product_id, country, region, device, store
+        FROM temp_attribution_backup_setup
+    """)
+    return {
+        (distinct_id, product_id): (country, region, device, store)
+        for distinct_id, product_id, country, region, device, store in cursor.fetchall()
+    }
+
+def stream_user_product_events(cursor, user_scope_table=None):
+    """
+    Stream lifecycle events for all valid users in a single ordered scan.
     
-    # Get all important events for this user, ordered by time
+    Yields (distinct_id, product_id, events) once per user-product combination,
+    with events ordered by time, so no per-pair queries are needed. When
+    user_scope_table is given, only users listed in that table are scanned.
+    """
     event_name_list = ', '.join([f"'{name}'" for name in IMPORTANT_EVENTS])
+    scope_join = f"JOIN {user_scope_table} scope ON scope.distinct_id = e.distinct_id" if user_scope_table else ""
     
     cursor.execute(f"""
         SELECT 
-            event_time,
-            event_name,
-            COALESCE(revenue_usd, 0) as revenue_usd,
-            event_uuid,
-            event_json
-        FROM mixpanel_event
-        WHERE distinct_id = ?
-          AND event_name IN ({event_name_list})
-          AND JSON_EXTRACT(event_json, '$.properties.product_id') = ?
-        ORDER BY event_time ASC
-    """, (distinct_id, product_id))
-    
-    all_events = cursor.fetchall()
-    relevant_events = []
-    
-    for event_time, event_name, revenue_usd, event_uuid, event_json in all_events:
-        # Filter events by the specific product_id being validated
-        event_type = classify_event_type(event_name)
-        
-        relevant_events.append(LifecycleEvent(
-            event_time=event_time,
-            event_name=event_name,
-            event_type=event_type,
-            revenue_usd=revenue_usd,
-            event_uuid=event_uuid
-        ))
+            e.distinct_id,
+            e.product_id,
+            e.event_time,
+            e.event_name,
+            COALESCE(e.revenue_usd, 0) as revenue_usd,
+            e.event_uuid
+        FROM mixpanel_event e
+        JOIN mixpanel_user u ON e.distinct_id = u.distinct_id
+        {scope_join}
+        WHERE u.valid_user = 1
+          AND e.event_name IN ({event_name_list})
+          AND e.product_id IS NOT NULL
+          AND e.product_id != ''
+        ORDER BY e.distinct_id, e.product_id, e.event_time ASC
+    """)
     
-    return relevant_events
+    rows = iter(lambda: cursor.fetchmany(LIFECYCLE_SCAN_BATCH_SIZE), [])
+    all_rows = (row for batch in rows for row in batch)
+    
+    for (distinct_id, product_id), group in groupby(all_rows, key=itemgetter(0, 1)):
+        events = [
+            LifecycleEvent(
+                event_time=event_time,
+                event_name=event_name,
+                event_type=classify_event_type(event_name),
+                revenue_usd=revenue_usd,
+                event_uuid=event_uuid
+            )
+            for _, _, event_time, event_name, revenue_usd, event_uuid in group
+        ]
+        yield distinct_id, product_id, events
+
+def write_lifecycle_records(cursor, records):
+    """
+    Upsert a batch of validated user-product relationship records.
+    
+    Existing rows keep their country/region/device/store; everything computed
+    downstream is reset so pre-processing treats the pair as freshly validated,
+    and the pairs are queued in the dirty-set ledger for incremental pre-processing.
+    """
+    if not records:
+        return
+    cursor.executemany("""
+        INSERT INTO user_product_metrics 
+        (distinct_id, product_id, credited_date, current_status, current_value, 
+         value_status, last_updated_ts, valid_lifecycle, country, region, device, store)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(distinct_id, product_id) DO UPDATE SET
+            credited_date = excluded.credited_date,
+            current_status = excluded.current_status,
+            current_value = excluded.current_value,
+            value_status = excluded.value_status,
+            last_updated_ts = excluded.last_updated_ts,
+            valid_lifecycle = excluded.valid_lifecycle,
+            segment_id = NULL,
+            accuracy_score = NULL,
+            trial_conversion_rate = NULL,
+            trial_converted_to_refund_rate = NULL,
+            initial_purchase_to_refund_rate = NULL,
+            price_bucket = NULL,
+            assignment_type = NULL
+    """, records)
+    mark_dirty_pairs(cursor, ((record[0], record[1]) for record in records), 'lifecycle_validation')
+
+def get_last_successful_run(cursor):
+    """Return the start timestamp of the last successful validation run, or None"""
+    cursor.execute("""
+        SELECT last_success_timestamp FROM etl_job_control WHERE job_name = ?
+    """, (LIFECYCLE_JOB_NAME,))
+    row = cursor.fetchone()
+    return row[0] if row else None
 
-# Removed verbose validate_user_lifecycles function - functionality integrated into main validation
+def record_successful_run(cursor, run_started_at, duration_seconds):
+    """Record a successful validation run in etl_job_control (caller commits)"""
+    cursor.execute("""
+        INSERT INTO etl_job_control 
+        (job_name, last_run_timestamp, last_success_timestamp, status, error_message, run_duration_seconds)
+        VALUES (?, ?, ?, 'success', NULL, ?)
+        ON CONFLICT(job_name) DO UPDATE SET
+            last_run_timestamp = excluded.last_run_timestamp,
+            last_success_timestamp = excluded.last_success_timestamp,
+            status = excluded.status,
+            error_message = NULL,
+            run_duration_seconds = excluded.run_duration_seconds
+    """, (LIFECYCLE_JOB_NAME, run_started_at, run_started_at, duration_seconds))
+
+def collect_touched_users(cursor, since):
+    """
+    Collect users whose lifecycles may have changed since the given timestamp
+    into temp_lifecycle_users and return how many were found.
+    
+    A user is touched if they have events on a day (re)ingested since then, or
+    a trial start recent enough that the 31-day trial window may have closed
+    since the last run, or if they are valid and have lifecycle events but no
+    user_product_metrics rows (e.g. valid_user flipped from 0 to 1).
+    """
+    cursor.execute("DROP TABLE IF EXISTS temp_lifecycle_users")
+    cursor.execute("CREATE TEMP TABLE temp_lifecycle_users (distinct_id TEXT PRIMARY KEY)")
+    
+    cursor.execute("""
+        INSERT OR IGNORE INTO temp_lifecycle_users (distinct_id)
+        SELECT DISTINCT e.distinct_id
+        FROM mixpanel_event e
+        WHERE e.event_date IN (
+            SELECT date_day FROM processed_event_days WHERE processing_timestamp >= ?
+        )
+    """, (since,))
+    
+    cursor.execute(f"""
+        INSERT OR IGNORE INTO temp_lifecycle_users (distinct_id)
+        SELECT DISTINCT e.distinct_id
+        FROM mixpanel_event e
+        WHERE e.event_name = 'RC Trial started'
+          AND e.event_date >= date(?, '-{TRIAL_WINDOW_LOOKBACK_DAYS} days')
+    """, (since,))
+    
+    event_name_list = ', '.join([f"'{name}'" for name in IMPORTANT_EVENTS])
+    cursor.execute(f"""
+        INSERT OR IGNORE INTO temp_lifecycle_users (distinct_id)
+        SELECT u.distinct_id
+        FROM mixpanel_user u
+        WHERE u.valid_user = 1
+          AND NOT EXISTS (
+              SELECT 1 FROM user_product_metrics upm WHERE upm.distinct_id = u.distinct_id
+          )
+          AND EXISTS (
+              SELECT 1 FROM mixpanel_event e
+              WHERE e.distinct_id = u.distinct_id
+                AND e.event_name IN ({event_name_list})
+                AND e.product_id IS NOT NULL
+                AND e.product_id != ''
+          )
+    """)
+    
+    cursor.execute("SELECT COUNT(*) FROM temp_lifecycle_users")
+    return cursor.fetchone()[0]
+
+def prune_ineligible_relationships(cursor):
+    """Delete relationships that no longer have any lifecycle event for a valid user"""
+    event_name_list = ', '.join([f"'{name}'" for name in IMPORTANT_EVENTS])
+    cursor.execute(f"""
+        DELETE FROM user_product_metrics
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM mixpanel_event e
+            JOIN mixpanel_user u ON e.distinct_id = u.distinct_id
+            WHERE e.distinct_id = user_product_metrics.distinct_id
+              AND e.product_id = user_product_metrics.product_id
+              AND u.valid_user = 1
+              AND e.event_name IN ({event_name_list})
+        )
+    """)
+    return cursor.rowcount
 
 def validate_lifecycle_pattern(events, distinct_id, product_id):
     """
@@ -14,24 +14,39 @@ Key Features:
 - Calculates estimated revenue using current_value from user_product_metrics
 - Includes data quality scoring and validation
 - Optimized for dashboard performance and reliability
+- Incremental mode recomputes only the (entity, date) rows touched since the last run
+
+Incremental Mode:
+- daily_metrics_user_state keeps each attributed user's contribution from the last run
+  (attribution IDs, latest trial/purchase dates, summed current_value)
+- Users are touched by (re)ingested event days, attribution changes and value changes;
+  their old and new (entity, date) keys are the only rows recomputed and upserted
+- DAILY_METRICS_MODE=full rebuilds the whole table; DAILY_METRICS_VERIFY=1 recomputes
+  everything in memory afterwards and compares it with the stored rows
+
+Publishing:
+- A full rebuild fills a shadow copy of daily_mixpanel_metrics and swaps it in with one
+  rename transaction, so dashboard reads never see an empty or partial table
+- Both modes publish a new precomputed_data_version for daily_mixpanel_metrics
 
 Dependencies: Requires mixpanel_user, mixpanel_event, user_product_metrics tables
 Outputs: Populated daily_mixpanel_metrics table
 """
 
+import os
 import sqlite3
 import logging
 import json
 from typing import Dict, List, Any, Optional, Tuple, Set
 from pathlib import Path
 import sys
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 from collections import defaultdict
 
 # Add utils directory to path for database utilities
 utils_path = str(Path(__file__).resolve().parent.parent.parent / "utils")
 sys.path.append(utils_path)
-from database_utils import get_database_path
+from database_utils import get_database_path, create_shadow_table, swap_shadow_table, publish_data_version
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -40,12 +55,74 @@ logger = logging.getLogger(__name__)
 # Configuration - Use centralized database path discovery
 DATABASE_PATH = get_database_path('mixpanel_data')
 
+# 'incremental' recomputes only rows touched since the last successful run (falling back to a
+# full rebuild when there is none); 'full' rebuilds the whole table
+DAILY_METRICS_MODE = os.environ.get('DAILY_METRICS_MODE', 'incremental').lower()
+# Compare the stored rows with a full in-memory recomputation after the run
+DAILY_METRICS_VERIFY = os.environ.get('DAILY_METRICS_VERIFY', '').lower() in ('1', 'true', 'yes')
+DAILY_METRICS_JOB_NAME = '08_compute_daily_metrics'
+
+# Entity types and the mixpanel_user attribution column each is keyed by
+ENTITY_CONFIGS = [
+    ('campaign', 'abi_campaign_id'),
+    ('adset', 'abi_ad_set_id'),
+    ('ad', 'abi_ad_id')
+]
+
+# Per-user contribution to daily_mixpanel_metrics as of the last run; incremental runs diff against it
+USER_STATE_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS daily_metrics_user_state (
+        distinct_id TEXT PRIMARY KEY,
+        abi_campaign_id TEXT,
+        abi_ad_set_id TEXT,
+        abi_ad_id TEXT,
+        latest_trial_date DATE,
+        latest_purchase_date DATE,
+        estimated_revenue_usd REAL NOT NULL DEFAULT 0.0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_metrics_user_state_campaign ON daily_metrics_user_state(abi_campaign_id)",
+    "CREATE INDEX IF NOT EXISTS idx_metrics_user_state_adset ON daily_metrics_user_state(abi_ad_set_id)",
+    "CREATE INDEX IF NOT EXISTS idx_metrics_user_state_ad ON daily_metrics_user_state(abi_ad_id)"
+]
+
+# One row per attributed user with trial/purchase events: attribution at every level, latest
+# trial and purchase date, and estimated revenue (sum of current_value over the user's products).
+# Optionally limited to the users in a scope table. A user has one ID per attribution column, so
+# grouping by user gives the same latest dates as grouping by (entity, user) at each level.
+USER_CONTRIBUTION_QUERY = """
+SELECT 
+    u.distinct_id,
+    u.abi_campaign_id,
+    u.abi_ad_set_id,
+    u.abi_ad_id,
+    MAX(CASE WHEN e.event_name = 'RC Trial started' THEN e.event_date END) as latest_trial_date,
+    MAX(CASE WHEN e.event_name = 'RC Initial purchase' THEN e.event_date END) as latest_purchase_date,
+    COALESCE((
+        SELECT SUM(upm.current_value) FROM user_product_metrics upm
+        WHERE upm.distinct_id = u.distinct_id
+    ), 0.0) as estimated_revenue_usd
+FROM mixpanel_user u
+{scope_join}
+JOIN mixpanel_event e ON u.distinct_id = e.distinct_id
+WHERE e.event_name IN ('RC Trial started', 'RC Initial purchase')
+  AND e.event_date BETWEEN ? AND ?
+  AND u.has_abi_attribution = TRUE
+  AND (u.abi_campaign_id IS NOT NULL OR u.abi_ad_set_id IS NOT NULL OR u.abi_ad_id IS NOT NULL)
+GROUP BY u.distinct_id
+ORDER BY u.distinct_id
+"""
+
 class DailyMetricsProcessor:
     """Processes and computes daily Mixpanel metrics for all entities"""
     
     def __init__(self, conn: sqlite3.Connection):
         self.conn = conn
         self.cursor = conn.cursor()
+        self.date_range: Optional[Tuple[date, date]] = None
+        # Table insert_daily_metrics writes to (the shadow copy during a full rebuild)
+        self.metrics_table = 'daily_mixpanel_metrics'
         self.stats = {
             'date_range_start': None,
             'date_range_end': None,
@@ -71,8 +148,8 @@ class DailyMetricsProcessor:
         
         self.cursor.execute("""
         SELECT 
-            MIN(DATE(event_time)) as min_date,
-            MAX(DATE(event_time)) as max_date
+            MIN(event_date) as min_date,
+            MAX(event_date) as max_date
         FROM mixpanel_event
         WHERE event_name IN ('RC Trial started', 'RC Initial purchase')
         """)
@@ -87,9 +164,19 @@ class DailyMetricsProcessor:
         logger.info(f"Data range: {start_date} to {end_date}")
         return start_date, end_date
     
-    def compute_daily_metrics_for_entity_type(self, entity_type: str, attribution_column: str) -> int:
+    @staticmethod
+    def new_metrics() -> Dict[str, Any]:
+        return {
+            'trial_users_count': 0,
+            'trial_users_list': [],
+            'purchase_users_count': 0,
+            'purchase_users_list': [],
+            'estimated_revenue_usd': 0.0
+        }
+    
+    def scan_user_contributions(self, scope_table: Optional[str] = None) -> List[Tuple]:
         """
-        Compute daily metrics for a specific entity type with user deduplication
+        Scan trial/purchase events once for all attributed users (or those in scope_table)
         
         CRITICAL DEDUPLICATION LOGIC:
         - If a user has multiple trial/purchase events across different days, 
@@ -97,152 +184,80 @@ class DailyMetricsProcessor:
         - Remove them from earlier days to prevent double-counting
         - This ensures accurate user counts and proper funnel analysis
         
-        Args:
-            entity_type: 'campaign', 'adset', or 'ad'
-            attribution_column: Database column name (e.g., 'abi_campaign_id')
-            
         Returns:
-            Number of metrics records created
+            (distinct_id, campaign_id, adset_id, ad_id, latest_trial_date, latest_purchase_date,
+             estimated_revenue_usd) rows in distinct_id order, attribution in ENTITY_CONFIGS order
         """
-        logger.info(f"Computing daily metrics for {entity_type} entities with user deduplication...")
-        
-        start_date, end_date = self.get_data_date_range()
-        
-        # Step 1: Get ALL trial events across the entire date range with latest event date per user
-        logger.info(f"Analyzing trial events with deduplication logic...")
-        trial_dedup_query = f"""
-        SELECT 
-            u.{attribution_column} as entity_id,
-            u.distinct_id,
-            MAX(DATE(e.event_time)) as latest_trial_date
-        FROM mixpanel_user u
-        JOIN mixpanel_event e ON u.distinct_id = e.distinct_id
-        WHERE e.event_name = 'RC Trial started'
-          AND DATE(e.event_time) BETWEEN ? AND ?
-          AND u.{attribution_column} IS NOT NULL
-          AND u.has_abi_attribution = TRUE
-        GROUP BY u.{attribution_column}, u.distinct_id
+        logger.info("Scanning trial and purchase events with deduplication logic...")
+        start_date, end_date = self.date_range
+        scope_join = f"JOIN {scope_table} t ON t.distinct_id = u.distinct_id" if scope_table else ""
+        self.cursor.execute(
+            USER_CONTRIBUTION_QUERY.format(scope_join=scope_join),
+            (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        )
+        return self.cursor.fetchall()
+    
+    def fan_out_daily_metrics(self, user_rows: List[Tuple]) -> Dict[str, Dict[str, Dict[str, Dict]]]:
         """
+        Build every entity type's daily metrics from one set of per-user rows
         
-        self.cursor.execute(trial_dedup_query, (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-        trial_dedup_results = self.cursor.fetchall()
-        
-        # Step 2: Get ALL purchase events with deduplication
-        logger.info(f"Analyzing purchase events with deduplication logic...")
-        purchase_dedup_query = f"""
-        SELECT 
-            u.{attribution_column} as entity_id,
-            u.distinct_id,
-            MAX(DATE(e.event_time)) as latest_purchase_date
-        FROM mixpanel_user u
-        JOIN mixpanel_event e ON u.distinct_id = e.distinct_id
-        WHERE e.event_name = 'RC Initial purchase'
-          AND DATE(e.event_time) BETWEEN ? AND ?
-          AND u.{attribution_column} IS NOT NULL
-          AND u.has_abi_attribution = TRUE
-        GROUP BY u.{attribution_column}, u.distinct_id
+        Returns:
+            Dictionary of entity_type -> date -> entity_id -> metrics
         """
-        
-        self.cursor.execute(purchase_dedup_query, (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-        purchase_dedup_results = self.cursor.fetchall()
-        
-        # Step 3: Build deduplicated daily metrics structure
-        logger.info(f"Building deduplicated daily metrics structure...")
-        
-        # Group by entity_id and date for trials
-        trial_by_entity_date = defaultdict(lambda: defaultdict(list))
-        for entity_id, distinct_id, latest_date in trial_dedup_results:
-            trial_by_entity_date[entity_id][latest_date].append(distinct_id)
-        
-        # Group by entity_id and date for purchases  
-        purchase_by_entity_date = defaultdict(lambda: defaultdict(list))
-        for entity_id, distinct_id, latest_date in purchase_dedup_results:
-            purchase_by_entity_date[entity_id][latest_date].append(distinct_id)
-        
-        # Step 4: Process each date and create metrics
-        metrics_created = 0
-        current_date = start_date
-        
-        while current_date <= end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
-            logger.debug(f"Processing deduplicated {entity_type} metrics for {date_str}")
-            
-            # Combine results by entity_id for this specific date
-            entity_metrics = defaultdict(lambda: {
-                'trial_users_count': 0,
-                'trial_users_list': [],
-                'purchase_users_count': 0,
-                'purchase_users_list': [],
-                'estimated_revenue_usd': 0.0
-            })
-            
-            # Process trial data for this date
-            for entity_id, date_users in trial_by_entity_date.items():
-                if date_str in date_users:
-                    users_for_date = date_users[date_str]
-                    entity_metrics[entity_id]['trial_users_count'] = len(users_for_date)
-                    entity_metrics[entity_id]['trial_users_list'] = users_for_date
-            
-            # Process purchase data for this date
-            for entity_id, date_users in purchase_by_entity_date.items():
-                if date_str in date_users:
-                    users_for_date = date_users[date_str]
-                    entity_metrics[entity_id]['purchase_users_count'] = len(users_for_date)
-                    entity_metrics[entity_id]['purchase_users_list'] = users_for_date
-            
-            # Calculate estimated revenue for entities with trial users
-            for entity_id, metrics in entity_metrics.items():
-                if metrics['trial_users_list']:
-                    revenue = self.calculate_estimated_revenue(metrics['trial_users_list'])
-                    metrics['estimated_revenue_usd'] = revenue
-            
-            # Insert metrics into database (only if there's data for this date)
-            if entity_metrics:
-                self.insert_daily_metrics(entity_type, current_date, entity_metrics)
-                metrics_created += len(entity_metrics)
-            
-            current_date += timedelta(days=1)
-        
-        logger.info(f"✅ Created {metrics_created} deduplicated {entity_type} daily metrics")
-        return metrics_created
+        logger.info("Building deduplicated daily metrics structure for all entity levels...")
+        daily_metrics_by_type = {}
+        for index, (entity_type, _) in enumerate(ENTITY_CONFIGS):
+            level_rows = sorted(
+                (row for row in user_rows if row[1 + index] is not None),
+                key=lambda row: row[1 + index]
+            )
+            daily_metrics_by_type[entity_type] = self.group_daily_metrics(
+                [(row[1 + index], row[0], row[4], row[6]) for row in level_rows if row[4] is not None],
+                [(row[1 + index], row[0], row[5]) for row in level_rows if row[5] is not None]
+            )
+        return daily_metrics_by_type
     
-    def calculate_estimated_revenue(self, user_list: List[str]) -> float:
+    def group_daily_metrics(self, trial_rows, purchase_rows) -> Dict[str, Dict[str, Dict]]:
         """
-        Calculate estimated revenue for a list of users
+        Bucket deduplicated users by (date, entity_id)
         
         Args:
-            user_list: List of distinct_ids
+            trial_rows: (entity_id, distinct_id, latest_trial_date, user_revenue) rows
+            purchase_rows: (entity_id, distinct_id, latest_purchase_date) rows
             
         Returns:
-            Total estimated revenue (sum of current_value)
+            Dictionary of date -> entity_id -> metrics, in date order
         """
-        if not user_list:
-            return 0.0
+        daily_metrics = defaultdict(lambda: defaultdict(self.new_metrics))
         
-        # Create placeholders for IN clause
-        placeholders = ','.join(['?' for _ in user_list])
+        for entity_id, distinct_id, latest_date, user_revenue in trial_rows:
+            metrics = daily_metrics[latest_date][entity_id]
+            metrics['trial_users_list'].append(distinct_id)
+            metrics['estimated_revenue_usd'] += user_revenue
         
-        query = f"""
-        SELECT COALESCE(SUM(current_value), 0.0) as total_revenue
-        FROM user_product_metrics
-        WHERE distinct_id IN ({placeholders})
-        """
+        for entity_id, distinct_id, latest_date in purchase_rows:
+            daily_metrics[latest_date][entity_id]['purchase_users_list'].append(distinct_id)
         
-        self.cursor.execute(query, user_list)
-        result = self.cursor.fetchone()
-        return float(result[0]) if result and result[0] else 0.0
+        for entity_metrics in daily_metrics.values():
+            for metrics in entity_metrics.values():
+                metrics['trial_users_count'] = len(metrics['trial_users_list'])
+                metrics['purchase_users_count'] = len(metrics['purchase_users_list'])
+        
+        return {date_str: dict(daily_metrics[date_str]) for date_str in sorted(daily_metrics)}
     
-    def insert_daily_metrics(self, entity_type: str, date_obj: date, entity_metrics: Dict[str, Dict]):
+    def insert_daily_metrics(self, entity_type: str, daily_metrics: Dict[str, Dict[str, Dict]]) -> int:
         """
-        Insert daily metrics for all entities of a given type and date
+        Insert daily metrics for all entities and dates of a given type in one executemany
         
         Args:
             entity_type: 'campaign', 'adset', or 'ad'
-            date_obj: Date object
-            entity_metrics: Dictionary of entity_id -> metrics
+            daily_metrics: Dictionary of date -> entity_id -> metrics
+            
+        Returns:
+            Number of rows written
         """
-        insert_query = """
-        INSERT OR REPLACE INTO daily_mixpanel_metrics 
+        insert_query = f"""
+        INSERT OR REPLACE INTO {self.metrics_table} 
         (date, entity_type, entity_id, trial_users_count, trial_users_list, 
          purchase_users_count, purchase_users_list, estimated_revenue_usd, 
          computed_at, data_quality_score)
@@ -250,28 +265,24 @@ class DailyMetricsProcessor:
         """
         
         current_time = datetime.now()
-        date_str = date_obj.strftime('%Y-%m-%d')
-        
-        for entity_id, metrics in entity_metrics.items():
-            # Convert user lists to JSON
-            trial_users_json = json.dumps(metrics['trial_users_list'])
-            purchase_users_json = json.dumps(metrics['purchase_users_list'])
-            
-            # Calculate data quality score (simple heuristic)
-            data_quality = self.calculate_data_quality_score(metrics)
-            
-            self.cursor.execute(insert_query, (
+        rows = [
+            (
                 date_str,
                 entity_type,
                 entity_id,
                 metrics['trial_users_count'],
-                trial_users_json,
+                json.dumps(metrics['trial_users_list']),
                 metrics['purchase_users_count'],
-                purchase_users_json,
+                json.dumps(metrics['purchase_users_list']),
                 metrics['estimated_revenue_usd'],
                 current_time,
-                data_quality
-            ))
+                self.calculate_data_quality_score(metrics)
+            )
+            for date_str, entity_metrics in daily_metrics.items()
+            for entity_id, metrics in entity_metrics.items()
+        ]
+        self.cursor.executemany(insert_query, rows)
+        return len(rows)
     
     def calculate_data_quality_score(self, metrics: Dict[str, Any]) -> float:
         """
@@ -299,45 +310,42 @@ class DailyMetricsProcessor:
         
         return max(0.0, score)
     
-    def compute_all_daily_metrics(self):
-        """Compute daily metrics for all entity types"""
-        logger.info("Computing daily metrics for all entity types...")
-        
-        # Clear existing metrics (fresh computation)
-        self.cursor.execute("DELETE FROM daily_mixpanel_metrics")
-        self.conn.commit()
-        
-        # Entity type configurations
-        entity_configs = [
-            ('campaign', 'abi_campaign_id'),
-            ('adset', 'abi_ad_set_id'),
-            ('ad', 'abi_ad_id')
-        ]
-        
-        total_metrics = 0
+    def compute_all_daily_metrics(self, mode: str = 'full'):
+        """
+        Compute daily metrics for all entity types
         
-        for entity_type, attribution_column in entity_configs:
-            try:
-                metrics_count = self.compute_daily_metrics_for_entity_type(entity_type, attribution_column)
-                total_metrics += metrics_count
-                
-                # Update stats
-                if entity_type == 'campaign':
-                    self.stats['campaign_metrics_created'] = metrics_count
-                elif entity_type == 'adset':
-                    self.stats['adset_metrics_created'] = metrics_count
-                elif entity_type == 'ad':
-                    self.stats['ad_metrics_created'] = metrics_count
-                
-            except Exception as e:
-                logger.error(f"Failed to compute {entity_type} metrics: {e}")
-                self.conn.rollback()
-                raise
-        
-        self.conn.commit()
+        mode='full' rebuilds the whole table. mode='incremental' recomputes only the
+        (entity, date) rows touched since the last successful run and upserts them,
+        falling back to a full rebuild when there is no previous run to diff against.
+        """
+        logger.info("Computing daily metrics for all entity types...")
+        self.ensure_user_state_table()
+        self.date_range = self.get_data_date_range()
+        
+        # Captured before reading events so anything ingested mid-run is picked up next time
+        self.cursor.execute("SELECT CURRENT_TIMESTAMP")
+        run_started_at = self.cursor.fetchone()[0]
+        
+        last_success = None
+        if mode == 'incremental':
+            last_success = self.get_last_successful_run()
+            if last_success is None:
+                logger.info("No previous successful daily metrics run recorded - running full rebuild")
+        
+        try:
+            if last_success is not None:
+                total_metrics = self.compute_incremental_daily_metrics(last_success)
+            else:
+                total_metrics = self.compute_full_daily_metrics()
+            self.record_successful_run(run_started_at)
+            self.conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to compute daily metrics: {e}")
+            self.conn.rollback()
+            raise
         
         # Update global stats
-        start_date, end_date = self.get_data_date_range()
+        start_date, end_date = self.date_range
         self.stats['date_range_start'] = start_date
         self.stats['date_range_end'] = end_date
         self.stats['total_dates_processed'] = (end_date - start_date).days + 1
@@ -347,6 +355,281 @@ class DailyMetricsProcessor:
         
         logger.info(f"✅ Successfully computed {total_metrics} daily metrics records")
     
+    def compute_full_daily_metrics(self) -> int:
+        """
+        Rebuild every daily metrics row into a shadow table, then swap it in together with
+        the rebuilt per-user state (caller commits the swap)
+        """
+        user_rows = self.scan_user_contributions()
+        
+        # Fresh computation into a shadow copy; readers keep the current table until the swap
+        self.metrics_table = create_shadow_table(self.conn, 'daily_mixpanel_metrics')
+        try:
+            total_metrics = 0
+            for entity_type, daily_metrics in self.fan_out_daily_metrics(user_rows).items():
+                metrics_count = self.insert_daily_metrics(entity_type, daily_metrics)
+                total_metrics += metrics_count
+                self.stats[f'{entity_type}_metrics_created'] = metrics_count
+                logger.info(f"✅ Created {metrics_count} deduplicated {entity_type} daily metrics")
+            self.conn.commit()
+        finally:
+            self.metrics_table = 'daily_mixpanel_metrics'
+        
+        self.cursor.execute("DELETE FROM daily_metrics_user_state")
+        self.write_user_state(user_rows)
+        version = swap_shadow_table(self.conn, 'daily_mixpanel_metrics')
+        logger.info(f"Swapped in rebuilt daily_mixpanel_metrics (data version {version})")
+        return total_metrics
+    
+    def compute_incremental_daily_metrics(self, since: str) -> int:
+        """
+        Recompute only the rows whose users changed since the given timestamp (caller commits)
+        
+        Each touched user's old keys (from daily_metrics_user_state) and new keys are
+        recomputed from the refreshed state: rows that still have users are upserted,
+        rows left without users are deleted.
+        """
+        touched_users = self.collect_touched_users(since)
+        logger.info(f"🔄 Incremental mode: {touched_users:,} users touched since {since}")
+        if touched_users == 0:
+            return 0
+        
+        old_state = self.load_user_state('temp_metrics_users')
+        user_rows = self.scan_user_contributions('temp_metrics_users')
+        self.cursor.execute("""
+        DELETE FROM daily_metrics_user_state
+        WHERE distinct_id IN (SELECT distinct_id FROM temp_metrics_users)
+        """)
+        self.write_user_state(user_rows)
+        new_state = {row[0]: row[1:6] for row in user_rows}
+        
+        total_metrics = 0
+        for index, (entity_type, attribution_column) in enumerate(ENTITY_CONFIGS):
+            affected_keys = set()
+            for state in (old_state, new_state):
+                for user_state in state.values():
+                    entity_id = user_state[index]
+                    if entity_id is None:
+                        continue
+                    for latest_date in (user_state[3], user_state[4]):
+                        if latest_date is not None:
+                            affected_keys.add((entity_id, latest_date))
+            
+            metrics_count = self.recompute_entity_date_rows(entity_type, attribution_column, affected_keys)
+            total_metrics += metrics_count
+            self.stats[f'{entity_type}_metrics_created'] = metrics_count
+            logger.info(f"✅ Recomputed {len(affected_keys)} {entity_type} rows ({metrics_count} upserted)")
+        
+        self.cursor.execute("DROP TABLE temp_metrics_users")
+        version = publish_data_version(self.cursor, 'daily_mixpanel_metrics')
+        logger.info(f"Published daily_mixpanel_metrics data version {version}")
+        return total_metrics
+    
+    def recompute_entity_date_rows(self, entity_type: str, attribution_column: str, keys: Set[Tuple[str, str]]) -> int:
+        """
+        Rebuild the given (entity_id, date) rows of one entity type from daily_metrics_user_state
+        
+        Returns:
+            Number of rows upserted (the rest had no users left and were deleted)
+        """
+        if not keys:
+            return 0
+        
+        self.cursor.execute("DROP TABLE IF EXISTS temp_metrics_keys")
+        self.cursor.execute("CREATE TEMP TABLE temp_metrics_keys (entity_id TEXT, date TEXT, PRIMARY KEY (entity_id, date))")
+        self.cursor.executemany("INSERT INTO temp_metrics_keys (entity_id, date) VALUES (?, ?)", sorted(keys))
+        
+        self.cursor.execute(f"""
+        SELECT 
+            k.entity_id,
+            s.distinct_id,
+            k.date,
+            s.latest_trial_date = k.date as is_trial,
+            s.latest_purchase_date = k.date as is_purchase,
+            s.estimated_revenue_usd
+        FROM temp_metrics_keys k
+        JOIN daily_metrics_user_state s ON s.{attribution_column} = k.entity_id
+        WHERE s.latest_trial_date = k.date OR s.latest_purchase_date = k.date
+        ORDER BY k.entity_id, s.distinct_id
+        """)
+        rows = self.cursor.fetchall()
+        self.cursor.execute("DROP TABLE temp_metrics_keys")
+        
+        metrics_by_date = self.group_daily_metrics(
+            [(entity_id, distinct_id, date_str, revenue) for entity_id, distinct_id, date_str, is_trial, _, revenue in rows if is_trial],
+            [(entity_id, distinct_id, date_str) for entity_id, distinct_id, date_str, _, is_purchase, _ in rows if is_purchase]
+        )
+        upserted = self.insert_daily_metrics(entity_type, metrics_by_date)
+        
+        emptied = [
+            (entity_type, entity_id, date_str) for entity_id, date_str in keys
+            if entity_id not in metrics_by_date.get(date_str, {})
+        ]
+        self.cursor.executemany("""
+        DELETE FROM daily_mixpanel_metrics WHERE entity_type = ? AND entity_id = ? AND date = ?
+        """, emptied)
+        return upserted
+    
+    def ensure_user_state_table(self):
+        """Create the per-user state table on databases set up before it existed"""
+        for statement in USER_STATE_DDL:
+            self.cursor.execute(statement)
+    
+    def write_user_state(self, user_rows: List[Tuple]):
+        """Insert state rows produced by scan_user_contributions"""
+        self.cursor.executemany("""
+        INSERT INTO daily_metrics_user_state 
+        (distinct_id, abi_campaign_id, abi_ad_set_id, abi_ad_id, latest_trial_date, latest_purchase_date, estimated_revenue_usd)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, user_rows)
+    
+    def load_user_state(self, scope_table: str) -> Dict[str, Tuple]:
+        """
+        Stored state of the users in scope_table
+        
+        Returns:
+            Dict of distinct_id -> (campaign_id, adset_id, ad_id, latest_trial_date, latest_purchase_date),
+            attribution in ENTITY_CONFIGS order
+        """
+        self.cursor.execute(f"""
+        SELECT s.distinct_id, s.abi_campaign_id, s.abi_ad_set_id, s.abi_ad_id, s.latest_trial_date, s.latest_purchase_date
+        FROM {scope_table} t
+        JOIN daily_metrics_user_state s ON s.distinct_id = t.distinct_id
+        """)
+        return {row[0]: row[1:] for row in self.cursor.fetchall()}
+    
+    def collect_touched_users(self, since: str) -> int:
+        """
+        Collect users whose contribution may have changed since the given timestamp
+        into temp_metrics_users
+        
+        A user is touched if they have trial/purchase events on a day (re)ingested since
+        then, their stored latest date falls on such a day (its events may be gone), their
+        attribution changed, their summed current_value changed, or they are newly
+        attributed with trial/purchase events.
+        
+        Returns:
+            Number of touched users
+        """
+        self.cursor.execute("DROP TABLE IF EXISTS temp_metrics_users")
+        self.cursor.execute("CREATE TEMP TABLE temp_metrics_users (distinct_id TEXT PRIMARY KEY)")
+        
+        refreshed_days = "SELECT date_day FROM processed_event_days WHERE processing_timestamp >= ?"
+        self.cursor.execute(f"""
+        INSERT OR IGNORE INTO temp_metrics_users (distinct_id)
+        SELECT DISTINCT e.distinct_id
+        FROM mixpanel_event e
+        WHERE e.event_date IN ({refreshed_days})
+          AND e.event_name IN ('RC Trial started', 'RC Initial purchase')
+        """, (since,))
+        
+        self.cursor.execute(f"""
+        INSERT OR IGNORE INTO temp_metrics_users (distinct_id)
+        SELECT s.distinct_id
+        FROM daily_metrics_user_state s
+        WHERE s.latest_trial_date IN ({refreshed_days})
+           OR s.latest_purchase_date IN ({refreshed_days})
+        """, (since, since))
+        
+        self.cursor.execute("""
+        INSERT OR IGNORE INTO temp_metrics_users (distinct_id)
+        SELECT s.distinct_id
+        FROM daily_metrics_user_state s
+        LEFT JOIN mixpanel_user u ON u.distinct_id = s.distinct_id
+        WHERE u.distinct_id IS NULL
+           OR u.has_abi_attribution IS NOT TRUE
+           OR u.abi_campaign_id IS NOT s.abi_campaign_id
+           OR u.abi_ad_set_id IS NOT s.abi_ad_set_id
+           OR u.abi_ad_id IS NOT s.abi_ad_id
+           OR s.estimated_revenue_usd != COALESCE((
+                SELECT SUM(upm.current_value) FROM user_product_metrics upm
+                WHERE upm.distinct_id = s.distinct_id
+              ), 0.0)
+        """)
+        
+        self.cursor.execute("""
+        INSERT OR IGNORE INTO temp_metrics_users (distinct_id)
+        SELECT u.distinct_id
+        FROM mixpanel_user u
+        WHERE u.has_abi_attribution = TRUE
+          AND (u.abi_campaign_id IS NOT NULL OR u.abi_ad_set_id IS NOT NULL OR u.abi_ad_id IS NOT NULL)
+          AND NOT EXISTS (SELECT 1 FROM daily_metrics_user_state s WHERE s.distinct_id = u.distinct_id)
+          AND EXISTS (
+              SELECT 1 FROM mixpanel_event e
+              WHERE e.distinct_id = u.distinct_id
+                AND e.event_name IN ('RC Trial started', 'RC Initial purchase')
+          )
+        """)
+        
+        self.cursor.execute("SELECT COUNT(*) FROM temp_metrics_users")
+        return self.cursor.fetchone()[0]
+    
+    def get_last_successful_run(self) -> Optional[str]:
+        """Return the start timestamp of the last successful run, or None"""
+        self.cursor.execute("""
+        SELECT last_success_timestamp FROM etl_job_control WHERE job_name = ?
+        """, (DAILY_METRICS_JOB_NAME,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+    
+    def record_successful_run(self, run_started_at: str):
+        """Record a successful run in etl_job_control (caller commits)"""
+        self.cursor.execute("""
+        INSERT INTO etl_job_control 
+        (job_name, last_run_timestamp, last_success_timestamp, status, error_message)
+        VALUES (?, ?, ?, 'success', NULL)
+        ON CONFLICT(job_name) DO UPDATE SET
+            last_run_timestamp = excluded.last_run_timestamp,
+            last_success_timestamp = excluded.last_success_timestamp,
+            status = excluded.status,
+            error_message = NULL
+        """, (DAILY_METRICS_JOB_NAME, run_started_at, run_started_at))
+    
+    def verify_consistency(self) -> bool:
+        """
+        Recompute every row in memory the way a full rebuild would and compare with the table
+        
+        User lists are compared as sets and revenue to the cent, so row order and float
+        summation order don't count as differences.
+        
+        Returns:
+            True if the stored rows match a full rebuild
+        """
+        logger.info("Verifying stored daily metrics against a full recomputation...")
+        
+        expected = {}
+        for entity_type, daily_metrics in self.fan_out_daily_metrics(self.scan_user_contributions()).items():
+            for date_str, entity_metrics in daily_metrics.items():
+                for entity_id, metrics in entity_metrics.items():
+                    expected[(date_str, entity_type, entity_id)] = (
+                        frozenset(metrics['trial_users_list']),
+                        frozenset(metrics['purchase_users_list']),
+                        round(metrics['estimated_revenue_usd'], 2)
+                    )
+        
+        self.cursor.execute("""
+        SELECT date, entity_type, entity_id, trial_users_list, purchase_users_list, estimated_revenue_usd
+        FROM daily_mixpanel_metrics
+        """)
+        stored = {
+            (date_str, entity_type, entity_id): (
+                frozenset(json.loads(trial_users or '[]')),
+                frozenset(json.loads(purchase_users or '[]')),
+                round(float(revenue or 0.0), 2)
+            )
+            for date_str, entity_type, entity_id, trial_users, purchase_users, revenue in self.cursor.fetchall()
+        }
+        
+        mismatched = sorted(key for key in expected.keys() | stored.keys() if expected.get(key) != stored.get(key))
+        if mismatched:
+            logger.error(f"❌ {len(mismatched)} of {len(expected)} daily metrics rows differ from a full rebuild")
+            for key in mismatched[:10]:
+                logger.error(f"  {key}: stored={stored.get(key)} expected={expected.get(key)}")
+            return False
+        
+        logger.info(f"✅ All {len(expected)} daily metrics rows match a full rebuild")
+        return True
+    
     def calculate_summary_stats(self):
         """Calculate summary statistics with robust JSON handling"""
         # Total unique trial users - use safer approach
@@ -465,7 +748,10 @@ def main():
         
         # Process daily metrics
         processor = DailyMetricsProcessor(conn)
-        processor.compute_all_daily_metrics()
+        processor.compute_all_daily_metrics(DAILY_METRICS_MODE)
+        
+        if DAILY_METRICS_VERIFY and not processor.verify_consistency():
+            raise RuntimeError("Daily metrics differ from a full rebuild")
         
         # Validate results
         if not processor.validate_metrics():
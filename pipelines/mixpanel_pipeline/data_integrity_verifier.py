@@ -207,10 +207,10 @@ class DataIntegrityVerifier:
             # Local event counts by date
             local_cursor = local_conn.cursor()
             local_cursor.execute("""
-                SELECT DATE(event_time) as event_date, COUNT(*) as event_count
+                SELECT event_date, COUNT(*) as event_count
                 FROM mixpanel_event 
-                WHERE DATE(event_time) BETWEEN ? AND ?
-                GROUP BY DATE(event_time)
+                WHERE event_date BETWEEN ? AND ?
+                GROUP BY event_date
                 ORDER BY event_date
             """, (start_date, end_date))
             local_events = {row[0]: row[1] for row in local_cursor.fetchall()}
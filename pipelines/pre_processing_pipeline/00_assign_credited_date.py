@@ -47,16 +47,17 @@ import os
 import sys
 import sqlite3
 import logging
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+from typing import List, Optional
 from collections import defaultdict
 from pathlib import Path
 
 # Add utils directory to path for database utilities
 utils_path = str(Path(__file__).resolve().parent.parent.parent / "utils")
 sys.path.append(utils_path)
-from database_utils import get_database_path
+from database_utils import get_database_path, begin_pre_processing_run
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -71,6 +72,11 @@ STARTER_EVENTS = ['RC Trial started', 'RC Initial purchase']
 # Batch processing size
 BATCH_SIZE = 1000
 
+# 'full' recomputes every user-product pair; 'incremental' only the pairs in the dirty_user_products
+# ledger. This step opens the pre-processing run, and steps 01-03 follow the mode it settles on.
+# The pipeline.yaml steps set it to 'incremental'; running a script by hand defaults to 'full'.
+PRE_PROCESSING_MODE = os.environ.get('PRE_PROCESSING_MODE', 'full').lower()
+
 
 def main():
     """
@@ -85,9 +91,17 @@ def main():
             logger.error(f"❌ Database not found at {DB_PATH}")
             return False
         
+        # Step 0: Open the pre-processing run (marks value-window pairs in incremental mode)
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            mode = begin_pre_processing_run(conn, PRE_PROCESSING_MODE)
+        finally:
+            conn.close()
+        dirty_only = mode == 'incremental'
+        
         # Step 1: Get all starter events and group by user-product
         logger.info("📊 Extracting starter events...")
-        starter_events = get_all_starter_events()
+        starter_events = get_all_starter_events(dirty_only)
         
         if starter_events.empty:
             logger.warning("⚠️  No starter events found. Nothing to process.")
@@ -99,15 +113,15 @@ def main():
         
         # Step 2b: Handle edge cases - users with conversions but no start events
         logger.info("🔄 Handling edge cases (conversions without start events)...")
-        conversion_fallbacks = handle_conversion_fallbacks()
+        conversion_fallbacks = handle_conversion_fallbacks(dirty_only)
         
         # Merge the results (real start events take priority)
         # Only add fallbacks for user-product pairs that don't have real start events
-        for key, fallback_date in conversion_fallbacks.items():
-            if key not in credited_dates:
-                credited_dates[key] = fallback_date
+        if not conversion_fallbacks.empty:
+            credited_dates = pd.concat([credited_dates, conversion_fallbacks], ignore_index=True)
+            credited_dates = credited_dates.drop_duplicates(['distinct_id', 'product_id'], keep='first')
         
-        if not credited_dates:
+        if credited_dates.empty:
             logger.warning("⚠️  No credited dates calculated. Nothing to update.")
             return True
         
@@ -129,34 +143,31 @@ def main():
         return False
 
 
-def get_all_starter_events() -> pd.DataFrame:
+def get_all_starter_events(dirty_only: bool = False) -> pd.DataFrame:
     """
     Get all starter events (RC Trial started, RC Initial purchase) with user and product data.
     
+    Args:
+        dirty_only: Only return events of pairs in the dirty_user_products ledger
+    
     Returns:
         DataFrame with columns: distinct_id, product_id, event_time, event_name, event_date
     """
     logger.info("📊 Extracting starter events from mixpanel_event table...")
     
-    # Query to get all starter events with product_id
-    # Use CASE statement to handle malformed JSON gracefully
-    query = """
+    # Query to get all starter events with product_id (materialized at ingest)
+    query = f"""
     SELECT 
         me.distinct_id,
-        CASE 
-            WHEN JSON_VALID(me.event_json) = 1 
-            THEN JSON_EXTRACT(me.event_json, '$.properties.product_id')
-            ELSE NULL
-        END as product_id,
+        me.product_id,
         me.event_time,
         me.event_name,
-        DATE(me.event_time) as event_date
-    FROM mixpanel_event me 
+        me.event_date
+    FROM {dirty_pair_events_source() if dirty_only else 'mixpanel_event me'}
     WHERE me.event_name IN ('RC Trial started', 'RC Initial purchase')
-    AND JSON_VALID(me.event_json) = 1
-    AND JSON_EXTRACT(me.event_json, '$.properties.product_id') IS NOT NULL
-    AND JSON_EXTRACT(me.event_json, '$.properties.product_id') != ''
-    ORDER BY me.distinct_id, product_id, me.event_time
+    AND me.product_id IS NOT NULL
+    AND me.product_id != ''
+    ORDER BY me.distinct_id, me.product_id, me.event_time
     """
     
     try:
@@ -181,7 +192,13 @@ def get_all_starter_events() -> pd.DataFrame:
         raise
 
 
-def calculate_credited_dates(starter_events_df: pd.DataFrame) -> Dict[Tuple[str, str], str]:
+def dirty_pair_events_source() -> str:
+    """FROM clause (aliased me) limiting mixpanel_event to the pairs in the dirty-set ledger"""
+    return """dirty_user_products d
+    JOIN mixpanel_event me ON me.distinct_id = d.distinct_id AND me.product_id = d.product_id"""
+
+
+def calculate_credited_dates(starter_events_df: pd.DataFrame) -> pd.DataFrame:
     """
     Calculate credited_date for each user-product combination by finding the earliest starter event.
     
@@ -189,65 +206,69 @@ def calculate_credited_dates(starter_events_df: pd.DataFrame) -> Dict[Tuple[str,
         starter_events_df: DataFrame containing all starter events
         
     Returns:
-        Dictionary mapping (distinct_id, product_id) tuples to credited_date strings
+        DataFrame with columns distinct_id, product_id, credited_date (one row per combination)
     """
     logger.info("🔄 Calculating credited dates for user-product combinations...")
     
-    credited_dates = {}
+    # One stable sort by time (numpy on fixed-width strings is much faster than sorting
+    # object columns), then the first row kept per user-product combination is its earliest event
+    time_order = np.argsort(starter_events_df['event_time'].to_numpy(dtype=str), kind='stable')
+    earliest_events = (
+        starter_events_df
+        .iloc[time_order]
+        .drop_duplicates(['distinct_id', 'product_id'], keep='first')
+    )
+    
+    # Log details for first few combinations (for debugging)
+    for row in earliest_events.head(5).itertuples(index=False):
+        logger.info(f"   {row.distinct_id[:8]}... + {row.product_id} → {row.event_date} (from {row.event_name})")
     
-    # Group by user-product combination and find earliest event
-    for (distinct_id, product_id), group in starter_events_df.groupby(['distinct_id', 'product_id']):
-        # Sort by event_time to get earliest event
-        earliest_event = group.sort_values('event_time').iloc[0]
-        credited_date = earliest_event['event_date']
-        
-        # Store the result
-        credited_dates[(distinct_id, product_id)] = credited_date
-        
-        # Log details for first few combinations (for debugging)
-        if len(credited_dates) <= 5:
-            logger.info(f"   {distinct_id[:8]}... + {product_id} → {credited_date} (from {earliest_event['event_name']})")
+    credited_dates = (
+        earliest_events[['distinct_id', 'product_id', 'event_date']]
+        .rename(columns={'event_date': 'credited_date'})
+        .reset_index(drop=True)
+    )
     
     logger.info(f"✅ Calculated credited dates for {len(credited_dates):,} user-product combinations")
     return credited_dates
 
 
-def handle_conversion_fallbacks() -> Dict[Tuple[str, str], str]:
+def handle_conversion_fallbacks(dirty_only: bool = False) -> pd.DataFrame:
     """
     Handle edge cases where users have RC Trial converted events but no start events.
     For these cases, set credited_date to 8 days before the conversion event.
     
+    Args:
+        dirty_only: Only consider pairs in the dirty_user_products ledger
+    
     Returns:
-        Dictionary mapping (distinct_id, product_id) tuples to credited_date strings for fallback cases
+        DataFrame with columns distinct_id, product_id, credited_date for fallback cases
     """
     logger.info("🔄 Looking for conversions without start events...")
     
+    empty_result = pd.DataFrame(columns=['distinct_id', 'product_id', 'credited_date'])
+    
     # Query to find conversions that don't have corresponding start events
-    query = """
+    event_source = dirty_pair_events_source() if dirty_only else 'mixpanel_event me'
+    query = f"""
     WITH conversion_events AS (
         SELECT 
             me.distinct_id,
-            CASE 
-                WHEN JSON_VALID(me.event_json) = 1 
-                THEN JSON_EXTRACT(me.event_json, '$.properties.product_id')
-                ELSE NULL
-            END as product_id,
+            me.product_id,
             me.event_time,
-            DATE(me.event_time, '-8 days') as calculated_credited_date
-        FROM mixpanel_event me 
+            DATE(me.event_date, '-8 days') as calculated_credited_date
+        FROM {event_source}
         WHERE me.event_name = 'RC Trial converted'
-        AND JSON_VALID(me.event_json) = 1
-        AND JSON_EXTRACT(me.event_json, '$.properties.product_id') IS NOT NULL
-        AND JSON_EXTRACT(me.event_json, '$.properties.product_id') != ''
+        AND me.product_id IS NOT NULL
+        AND me.product_id != ''
     ),
     start_events AS (
         SELECT DISTINCT
             me.distinct_id,
-            JSON_EXTRACT(me.event_json, '$.properties.product_id') as product_id
-        FROM mixpanel_event me 
+            me.product_id
+        FROM {event_source}
         WHERE me.event_name IN ('RC Trial started', 'RC Initial purchase')
-        AND JSON_VALID(me.event_json) = 1
-        AND JSON_EXTRACT(me.event_json, '$.properties.product_id') IS NOT NULL
+        AND me.product_id IS NOT NULL
     )
     SELECT 
         ce.distinct_id,
@@ -266,35 +287,37 @@ def handle_conversion_fallbacks() -> Dict[Tuple[str, str], str]:
         
         if df.empty:
             logger.info("   No conversion fallbacks needed")
-            return {}
+            return empty_result
         
-        fallback_dates = {}
+        # Take earliest conversion per user-product (already ordered by event_time)
+        fallback_dates = (
+            df.drop_duplicates(['distinct_id', 'product_id'], keep='first')
+            .rename(columns={'calculated_credited_date': 'credited_date'})
+            .reset_index(drop=True)
+        )
         
-        # Group by user-product and take earliest conversion (in case of multiple)
-        for (distinct_id, product_id), group in df.groupby(['distinct_id', 'product_id']):
-            earliest_fallback = group.iloc[0]  # Already ordered by event_time
-            credited_date = earliest_fallback['calculated_credited_date']
-            
-            fallback_dates[(distinct_id, product_id)] = credited_date
-            
-            # Log first few for debugging
-            if len(fallback_dates) <= 3:
-                logger.info(f"   FALLBACK: {distinct_id[:8]}... + {product_id} → {credited_date} (8 days before conversion)")
+        # Log first few for debugging
+        for row in fallback_dates.head(3).itertuples(index=False):
+            logger.info(f"   FALLBACK: {row.distinct_id[:8]}... + {row.product_id} → {row.credited_date} (8 days before conversion)")
         
         logger.info(f"✅ Found {len(fallback_dates):,} conversion fallback cases")
         return fallback_dates
         
     except Exception as e:
         logger.error(f"❌ Error retrieving conversion fallbacks: {str(e)}")
-        return {}
+        return empty_result
 
 
-def update_credited_dates_in_db(credited_dates: Dict[Tuple[str, str], str]) -> bool:
+def update_credited_dates_in_db(credited_dates: pd.DataFrame, db_path: Optional[str] = None) -> bool:
     """
     Update the credited_date field in user_product_metrics table.
     
+    The dates are bulk-loaded into a temp table and applied with a single
+    UPDATE ... FROM join instead of one UPDATE per user-product combination.
+    
     Args:
-        credited_dates: Dictionary mapping (distinct_id, product_id) to credited_date
+        credited_dates: DataFrame with distinct_id, product_id, credited_date columns
+        db_path: Optional database path override (defaults to DB_PATH)
         
     Returns:
         True if successful, False otherwise
@@ -302,7 +325,7 @@ def update_credited_dates_in_db(credited_dates: Dict[Tuple[str, str], str]) -> b
     logger.info("💾 Updating credited_date field in user_product_metrics table...")
     
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = sqlite3.connect(db_path or DB_PATH)
         cursor = conn.cursor()
         
         # Check if any user_product_metrics records exist
@@ -315,44 +338,39 @@ def update_credited_dates_in_db(credited_dates: Dict[Tuple[str, str], str]) -> b
             conn.close()
             return True
         
-        # Prepare batch updates
-        updates = []
-        found_matches = 0
-        
-        for (distinct_id, product_id), credited_date in credited_dates.items():
-            # Check if this user-product combination exists in user_product_metrics
-            cursor.execute("""
-                SELECT user_product_id FROM user_product_metrics 
-                WHERE distinct_id = ? AND product_id = ?
-            """, (distinct_id, product_id))
-            
-            result = cursor.fetchone()
-            if result:
-                updates.append((credited_date, distinct_id, product_id))
-                found_matches += 1
-        
-        logger.info(f"   Found {found_matches:,} matching user_product_metrics records to update")
-        
-        if not updates:
-            logger.warning("⚠️  No matching user_product_metrics records found for starter events")
-            conn.close()
-            return True
+        # Stage the calculated dates in a keyed temp table
+        cursor.execute("""
+            CREATE TEMP TABLE temp_credited_dates (
+                distinct_id TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                credited_date DATE,
+                PRIMARY KEY (distinct_id, product_id)
+            )
+        """)
+        # Key order keeps both the temp table build and the join walking the indexes sequentially
+        rows = sorted(
+            credited_dates[['distinct_id', 'product_id', 'credited_date']].itertuples(index=False, name=None),
+            key=lambda row: (row[0], row[1])
+        )
+        for i in range(0, len(rows), BATCH_SIZE):
+            cursor.executemany("INSERT INTO temp_credited_dates VALUES (?, ?, ?)", rows[i:i + BATCH_SIZE])
+        
+        # Apply every date with one join update
+        cursor.execute("""
+            UPDATE user_product_metrics
+            SET credited_date = t.credited_date
+            FROM temp_credited_dates t
+            WHERE user_product_metrics.distinct_id = t.distinct_id
+              AND user_product_metrics.product_id = t.product_id
+        """)
+        update_count = cursor.rowcount
         
-        # Perform batch update in chunks
-        update_count = 0
-        for i in range(0, len(updates), BATCH_SIZE):
-            batch = updates[i:i + BATCH_SIZE]
-            
-            cursor.executemany("""
-                UPDATE user_product_metrics 
-                SET credited_date = ?
-                WHERE distinct_id = ? AND product_id = ?
-            """, batch)
-            
-            update_count += len(batch)
-            
-            if i // BATCH_SIZE % 10 == 0:  # Log every 10 batches
-                logger.info(f"   Updated {update_count:,}/{len(updates):,} records...")
+        logger.info(f"   Found {update_count:,} matching user_product_metrics records to update")
+        
+        cursor.execute("DROP TABLE temp_credited_dates")
+        
+        if update_count == 0:
+            logger.warning("⚠️  No matching user_product_metrics records found for starter events")
         
         # Commit changes
         conn.commit()
@@ -15,8 +15,10 @@ Key improvements in v3:
 import os
 import sys
 import sqlite3
+import numpy as np
 import pandas as pd
 import logging
+from bisect import bisect_left, bisect_right
 from typing import Dict, List, Tuple, Optional, Any
 from datetime import datetime
 from collections import defaultdict
@@ -25,13 +27,14 @@ from pathlib import Path
 # Add utils directory to path for database utilities
 utils_path = str(Path(__file__).resolve().parent.parent.parent / "utils")
 sys.path.append(utils_path)
-from database_utils import get_database_path
+from database_utils import get_database_path, get_pre_processing_run_mode
 
 # --- Configuration ---
 # Configuration - use centralized database path discovery
 DB_PATH = get_database_path('mixpanel_data')
 BUCKET_PERCENT_THRESHOLD = 0.175
 BUCKET_DOLLAR_THRESHOLD = 5.0
+PRE_PROCESSING_MODE = os.environ.get('PRE_PROCESSING_MODE', 'full').lower()
 
 # --- Logging Configuration ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -46,6 +49,12 @@ def main() -> bool:
         return False
     try:
         conversions_df, users_df, trial_starts_df = get_all_batch_data()
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            if get_pre_processing_run_mode(conn, PRE_PROCESSING_MODE) == 'incremental':
+                users_df = select_incremental_users(conn, users_df, conversions_df)
+        finally:
+            conn.close()
         conversion_buckets = create_conversion_buckets_iterative(conversions_df)
         assign_price_buckets_to_users(conversion_buckets, conversions_df, users_df, trial_starts_df)
         return True
@@ -59,10 +68,10 @@ def get_all_batch_data() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     conn = sqlite3.connect(DB_PATH)
     conversions_query = """
     SELECT me.distinct_id, me.event_time, COALESCE(mu.country, 'Unknown') as country,
-           me.revenue_usd, JSON_EXTRACT(me.event_json, '$.properties.product_id') as product_id, me.event_name
+           me.revenue_usd, me.product_id, me.event_name
     FROM mixpanel_event me LEFT JOIN mixpanel_user mu ON me.distinct_id = mu.distinct_id
     WHERE me.revenue_usd > 0 AND me.event_name IN ('RC Initial purchase', 'RC Trial converted')
-      AND JSON_EXTRACT(me.event_json, '$.properties.product_id') IS NOT NULL
+      AND me.product_id IS NOT NULL
     """
     users_query = """
     SELECT DISTINCT upm.distinct_id, upm.product_id, COALESCE(mu.country, 'Unknown') as country
@@ -70,9 +79,9 @@ def get_all_batch_data() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     -- WHERE upm.valid_lifecycle = 1  -- Commented out to process ALL users in user_product_metrics table
     """
     trial_starts_query = """
-    SELECT me.distinct_id, me.event_time, JSON_EXTRACT(me.event_json, '$.properties.product_id') as product_id
+    SELECT me.distinct_id, me.event_time, me.product_id
     FROM mixpanel_event me WHERE me.event_name = 'RC Trial started'
-      AND JSON_EXTRACT(me.event_json, '$.properties.product_id') IS NOT NULL
+      AND me.product_id IS NOT NULL
     """
     conversions_df = pd.read_sql_query(conversions_query, conn)
     users_df = pd.read_sql_query(users_query, conn)
@@ -81,6 +90,36 @@ def get_all_batch_data() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     logger.info(f"   Loaded {len(conversions_df):,} conversions, {len(users_df):,} users, {len(trial_starts_df):,} trial starts")
     return conversions_df, users_df, trial_starts_df
 
+# Incremental mode: buckets are built from every conversion of a (country, product), so a dirty pair
+# that gains or loses a conversion re-buckets its whole group; other dirty pairs only need themselves.
+def select_incremental_users(conn: sqlite3.Connection, users_df: pd.DataFrame, conversions_df: pd.DataFrame) -> pd.DataFrame:
+    dirty_df = pd.read_sql_query("""
+        SELECT d.distinct_id, d.product_id, upm.assignment_type
+        FROM dirty_user_products d
+        JOIN user_product_metrics upm ON upm.distinct_id = d.distinct_id AND upm.product_id = d.product_id
+    """, conn)
+    dirty_keys = set(zip(dirty_df['distinct_id'], dirty_df['product_id']))
+    converted_keys = set(zip(conversions_df['distinct_id'], conversions_df['product_id']))
+    previously_converted = dirty_df['assignment_type'].fillna('').str.startswith('conversion')
+    bucket_changing_keys = {
+        key for key, was_conversion in zip(zip(dirty_df['distinct_id'], dirty_df['product_id']), previously_converted)
+        if was_conversion or key in converted_keys
+    }
+
+    user_keys = list(zip(users_df['distinct_id'], users_df['product_id']))
+    affected_groups = {
+        (country, product_id) for (distinct_id, product_id), country in zip(user_keys, users_df['country'])
+        if (distinct_id, product_id) in bucket_changing_keys
+    }
+    selected = [
+        key in dirty_keys or (country, key[1]) in affected_groups
+        for key, country in zip(user_keys, users_df['country'])
+    ]
+    selected_df = users_df[selected]
+    logger.info(f"   Incremental mode: {len(dirty_keys):,} dirty pairs, {len(affected_groups):,} re-bucketed "
+                f"country/product groups -> {len(selected_df):,} users to assign")
+    return selected_df
+
 # The new, superior iterative bucketing algorithm.
 def create_price_buckets_iterative(prices: List[float]) -> List[Dict[str, Any]]:
     if not prices: return []
@@ -137,27 +176,75 @@ def create_conversion_buckets_iterative(conversions_df: pd.DataFrame) -> Dict:
     return dict(buckets)
 
 # Helper function to find a bucket for a given price.
-def find_bucket_for_price(price: float, buckets: List[Dict[str, Any]]) -> Optional[float]:
+# Buckets come out of the iterative merge sorted by price and non-overlapping, so this is an
+# interval search; pass precomputed bucket_mins when looking up against the same buckets repeatedly.
+def find_bucket_for_price(price: float, buckets: List[Dict[str, Any]], bucket_mins: Optional[List[float]] = None) -> Optional[float]:
     if not buckets: return None
-    for bucket in buckets:
+    if bucket_mins is None:
+        bucket_mins = [bucket['min_price'] for bucket in buckets]
+    candidate = bisect_right(bucket_mins, price + 1e-9)
+    for bucket in buckets[max(candidate - 2, 0):candidate]:
         if bucket['min_price'] - 1e-9 <= price <= bucket['max_price'] + 1e-9:
             return bucket['avg_price']
     return None
 
+# Precomputed bucket lower bounds for every (country, product_id, event_name) bucket list.
+def build_bucket_mins(conversion_buckets: Dict) -> Dict[Tuple[str, str, str], List[float]]:
+    return {
+        (country, product_id, event_name): [bucket['min_price'] for bucket in buckets]
+        for country, products in conversion_buckets.items()
+        for product_id, events in products.items()
+        for event_name, buckets in events.items()
+    }
+
+# Per-(country, product_id) timelines of conversions, pre-sorted for bisect lookups.
+#   prior:   'RC Trial converted' events by event_time string (ties: earliest row first when
+#            searching backwards), as (times, revenues) for find_previous_trial_bucket.
+#   closest: every conversion by parsed timestamp, one entry per distinct timestamp holding the
+#            first row at that instant, as (timestamps_ns, rows) for find_closest_conversion_bucket.
+def build_conversion_index(conversions_df: pd.DataFrame) -> Dict[str, Dict[Tuple[str, str], Tuple[List, List]]]:
+    indexed = conversions_df.assign(
+        _row=np.arange(len(conversions_df)),
+        _ts=pd.to_datetime(conversions_df['event_time'], utc=True).values.astype('int64')
+    )
+
+    prior = {}
+    converted = indexed[indexed['event_name'] == 'RC Trial converted']
+    converted = converted.sort_values(['event_time', '_row'], ascending=[True, False], kind='mergesort')
+    for key, group in converted.groupby(['country', 'product_id'], sort=False):
+        prior[key] = (group['event_time'].tolist(), group['revenue_usd'].tolist())
+
+    closest = {}
+    first_at_instant = indexed.groupby(['country', 'product_id', '_ts'])['_row'].min().reset_index()
+    for key, group in first_at_instant.groupby(['country', 'product_id'], sort=False):
+        closest[key] = (group['_ts'].tolist(), group['_row'].tolist())
+
+    return {'prior': prior, 'closest': closest}
+
 # The main assignment logic, now strictly following the two-pass system.
 def assign_price_buckets_to_users(conversion_buckets: Dict, conversions_df: pd.DataFrame, users_df: pd.DataFrame, trial_starts_df: pd.DataFrame) -> None:
     logger.info("🚀 Starting batch price bucket assignment (Two-Pass Method)...")
 
-    conversion_lookup = conversions_df.groupby(['distinct_id', 'product_id']).apply(lambda x: x.to_dict('records')).to_dict()
-    trial_lookup = trial_starts_df.sort_values('event_time').groupby(['distinct_id', 'product_id']).first().to_dict('index')
+    first_conversions = conversions_df.drop_duplicates(['distinct_id', 'product_id'], keep='first')
+    conversion_lookup = {
+        (row['distinct_id'], row['product_id']): row
+        for row in first_conversions.to_dict('records')
+    }
+    trial_order = np.argsort(trial_starts_df['event_time'].to_numpy(dtype=str), kind='stable')
+    first_trials = trial_starts_df.iloc[trial_order].drop_duplicates(['distinct_id', 'product_id'], keep='first')
+    trial_lookup = {
+        (distinct_id, product_id): event_time
+        for distinct_id, product_id, event_time in first_trials[['distinct_id', 'product_id', 'event_time']].itertuples(index=False, name=None)
+    }
+    conversion_index = build_conversion_index(conversions_df)
+    bucket_mins = build_bucket_mins(conversion_buckets)
 
     assignments = []
     stats = defaultdict(int)
     
     # --- PASS 1: Direct Conversions & Strict Backward Inheritance ---
     logger.info("   PASS 1: Assigning direct conversions and prior trial inheritance...")
-    for _, user_row in users_df.iterrows():
-        distinct_id, product_id, country = user_row['distinct_id'], user_row['product_id'], user_row['country']
+    for distinct_id, product_id, country in users_df[['distinct_id', 'product_id', 'country']].itertuples(index=False, name=None):
         user_key = (distinct_id, product_id)
         
         bucket_value = 0
@@ -165,14 +252,14 @@ def assign_price_buckets_to_users(conversion_buckets: Dict, conversions_df: pd.D
         inherited_event_type = None
 
         if user_key in conversion_lookup:
-            conv = conversion_lookup[user_key][0]
+            conv = conversion_lookup[user_key]
             buckets = conversion_buckets.get(conv['country'], {}).get(product_id, {}).get(conv['event_name'], [])
-            bucket_value = find_bucket_for_price(conv['revenue_usd'], buckets) or 0
+            bucket_value = find_bucket_for_price(conv['revenue_usd'], buckets, bucket_mins.get((conv['country'], product_id, conv['event_name']))) or 0
             assignment_type = 'conversion' if bucket_value > 0 else 'conversion_no_bucket'
             inherited_event_type = conv['event_name'] if bucket_value > 0 else None  # Track the event type for conversions too
         elif user_key in trial_lookup:
-            trial_time = trial_lookup[user_key]['event_time']
-            bucket_result = find_previous_trial_bucket(country, product_id, trial_time, conversions_df, conversion_buckets)
+            trial_time = trial_lookup[user_key]
+            bucket_result = find_previous_trial_bucket(country, product_id, trial_time, conversion_index, conversion_buckets, bucket_mins)
             if bucket_result:
                 bucket_value, inherited_event_type = bucket_result
                 assignment_type = 'inherited_prior'
@@ -193,11 +280,12 @@ def assign_price_buckets_to_users(conversion_buckets: Dict, conversions_df: pd.D
     pass_2_assignments = [a for a in assignments if a['assignment_type'] == 'needs_pass_2']
     if pass_2_assignments:
         logger.info(f"      Found {len(pass_2_assignments):,} users for Pass 2 processing.")
-        for assignment in pass_2_assignments:
-            user_key = (assignment['distinct_id'], assignment['product_id'])
-            trial_time = trial_lookup[user_key]['event_time']
-            
-            bucket_result = find_closest_conversion_bucket(assignment['country'], assignment['product_id'], trial_time, conversions_df, conversion_buckets)
+        # Parse all Pass 2 trial times in one go
+        trial_times_ns = pd.to_datetime(
+            [trial_lookup[(a['distinct_id'], a['product_id'])] for a in pass_2_assignments], utc=True
+        ).values.astype('int64')
+        for assignment, trial_time_ns in zip(pass_2_assignments, trial_times_ns):
+            bucket_result = find_closest_conversion_bucket(assignment['country'], assignment['product_id'], int(trial_time_ns), conversions_df, conversion_index, conversion_buckets, bucket_mins)
             
             if bucket_result:
                 bucket_value, inherited_event_type = bucket_result
@@ -241,31 +329,39 @@ def assign_price_buckets_to_users(conversion_buckets: Dict, conversions_df: pd.D
     log_final_summary(assignments, stats)
 
 # Inheritance function: Looks ONLY for prior 'RC Trial converted' events.
-def find_previous_trial_bucket(country: str, product_id: str, trial_time: str, conversions_df: pd.DataFrame, conversion_buckets: Dict) -> Optional[Tuple[float, str]]:
-    prev_conversions = conversions_df[
-        (conversions_df['country'] == country) &
-        (conversions_df['product_id'] == product_id) &
-        (conversions_df['event_name'] == 'RC Trial converted') &
-        (conversions_df['event_time'] < trial_time)
-    ]
-    if prev_conversions.empty: return None
-    last_conversion = prev_conversions.sort_values('event_time', ascending=False).iloc[0]
+def find_previous_trial_bucket(country: str, product_id: str, trial_time: str, conversion_index: Dict, conversion_buckets: Dict, bucket_mins: Dict) -> Optional[Tuple[float, str]]:
+    timeline = conversion_index['prior'].get((country, product_id))
+    if not timeline: return None
+    times, revenues = timeline
+    position = bisect_left(times, trial_time)
+    if position == 0: return None
+    # Latest conversion strictly before the trial start
+    last_revenue = revenues[position - 1]
     buckets = conversion_buckets.get(country, {}).get(product_id, {}).get('RC Trial converted', [])
-    bucket_value = find_bucket_for_price(last_conversion['revenue_usd'], buckets)
+    bucket_value = find_bucket_for_price(last_revenue, buckets, bucket_mins.get((country, product_id, 'RC Trial converted')))
     if bucket_value:
         return (bucket_value, 'RC Trial converted')
     return None
 
 # Inheritance function: Finds closest conversion of ANY type.
-def find_closest_conversion_bucket(country: str, product_id: str, trial_time: str, conversions_df: pd.DataFrame, conversion_buckets: Dict) -> Optional[Tuple[float, str]]:
-    relevant_conversions = conversions_df[(conversions_df['country'] == country) & (conversions_df['product_id'] == product_id)].copy()
-    if relevant_conversions.empty: return None
+def find_closest_conversion_bucket(country: str, product_id: str, trial_time_ns: int, conversions_df: pd.DataFrame, conversion_index: Dict, conversion_buckets: Dict, bucket_mins: Dict) -> Optional[Tuple[float, str]]:
+    timeline = conversion_index['closest'].get((country, product_id))
+    if not timeline: return None
+    timestamps, rows = timeline
+    position = bisect_left(timestamps, trial_time_ns)
     
-    relevant_conversions['time_diff'] = (pd.to_datetime(relevant_conversions['event_time']) - pd.to_datetime(trial_time)).abs()
-    closest_conversion = relevant_conversions.loc[relevant_conversions['time_diff'].idxmin()]
+    # The nearest conversion is on one side of the insertion point; on an exact tie in
+    # distance the earlier row in conversions_df wins, as with idxmin.
+    candidates = []
+    if position > 0:
+        candidates.append((trial_time_ns - timestamps[position - 1], rows[position - 1]))
+    if position < len(timestamps):
+        candidates.append((timestamps[position] - trial_time_ns, rows[position]))
+    _, closest_row = min(candidates)
+    closest_conversion = conversions_df.iloc[closest_row]
     
     buckets = conversion_buckets.get(country, {}).get(product_id, {}).get(closest_conversion['event_name'], [])
-    bucket_value = find_bucket_for_price(closest_conversion['revenue_usd'], buckets)
+    bucket_value = find_bucket_for_price(closest_conversion['revenue_usd'], buckets, bucket_mins.get((country, product_id, closest_conversion['event_name'])))
     if bucket_value:
         return (bucket_value, closest_conversion['event_name'])
     return None
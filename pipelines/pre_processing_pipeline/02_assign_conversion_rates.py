@@ -28,11 +28,12 @@ Core Business Logic:
 import os
 import sys
 import sqlite3
-import json
 import logging
 import signal
 import time
-from typing import Dict, Any, List, Optional, Tuple, Set
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 from collections import defaultdict
 from pathlib import Path
@@ -40,7 +41,7 @@ from pathlib import Path
 # Add utils directory to path for database utilities
 utils_path = str(Path(__file__).resolve().parent.parent.parent / "utils")
 sys.path.append(utils_path)
-from database_utils import get_database_path
+from database_utils import get_database_path, get_pre_processing_run_mode, mark_dirty_pairs
 
 # Import timezone utilities for consistent timezone handling
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
@@ -54,6 +55,10 @@ logger = logging.getLogger(__name__)
 
 # Performance and business logic constants
 BATCH_SIZE = 5000
+EVENT_FETCH_SIZE = 20000  # Rows per fetch when streaming events into memory
+# Parallel rate assignment sharded by product_id (CONVERSION_RATE_WORKERS=1 runs sequentially)
+CONVERSION_RATE_WORKERS = max(1, int(os.environ.get('CONVERSION_RATE_WORKERS', 1)))
+PRE_PROCESSING_MODE = os.environ.get('PRE_PROCESSING_MODE', 'full').lower()
 MIN_COHORT_SIZE = 12
 DEFAULT_RATES = {
     'trial_conversion_rate': 0.25,
@@ -145,6 +150,10 @@ class ConversionRateProcessor:
         self.conn = sqlite3.connect(self.db_path)
         self.conn.row_factory = sqlite3.Row
 
+        # Incremental runs still re-rate every pair (the cohort window moves daily) but only write
+        # rates that changed, marking those pairs dirty so 03_estimate_values re-values them
+        self.incremental = get_pre_processing_run_mode(self.conn, PRE_PROCESSING_MODE) == 'incremental'
+
         # Define separate cohort date windows for trials and purchases
         # Trial cohort window: 53 days ago to 8 days ago
         self.trial_cohort_start_date = (now_in_timezone() - timedelta(days=53)).strftime('%Y-%m-%d')
@@ -161,6 +170,30 @@ class ConversionRateProcessor:
         logger.info(f"Trial Refund Cutoff (trial conversions must be before this time): {self.trial_refund_cutoff}")
         logger.info(f"Purchase Refund Cutoff (purchases must be before this time): {self.purchase_refund_cutoff}")
 
+        self._init_in_memory_model()
+
+    # Cohort window settings a product shard needs to reproduce the parent's calculations
+    WINDOW_ATTRIBUTES = (
+        'trial_cohort_start_date', 'trial_cohort_end_date', 'trial_refund_cutoff',
+        'purchase_cohort_start_date', 'purchase_cohort_end_date', 'purchase_refund_cutoff'
+    )
+
+    @classmethod
+    def from_shard(cls, shard: Dict[str, Any]) -> 'ConversionRateProcessor':
+        """Builds a database-less processor over one product shard's slice of the in-memory model."""
+        processor = cls.__new__(cls)
+        processor.db_path = None
+        processor.conn = None
+        for attribute in cls.WINDOW_ATTRIBUTES:
+            setattr(processor, attribute, shard['windows'][attribute])
+        processor._init_in_memory_model()
+        processor.users_data = shard['users_data']
+        processor.user_product_lookup = shard['user_product_lookup']
+        processor.cohort_index = shard['cohort_index']
+        return processor
+
+    def _init_in_memory_model(self):
+        """Creates the empty in-memory data model and summary statistics."""
         # --- NEW In-Memory Data Model ---
         # A single, unified data structure to hold all necessary data, replacing the previous brittle caches.
         
@@ -176,7 +209,11 @@ class ConversionRateProcessor:
         # This will store users grouped by their properties for fast cohort matching
         self.cohort_index: Dict[str, List[str]] = defaultdict(list)
 
-        # 4. Summary statistics for final reporting
+        # 4. Memoized cohort event counters, keyed by (cohort index key, product_id).
+        # Every target pair that falls into the same cohort shares one event walk.
+        self.cohort_counter_cache: Dict[Tuple[str, str], Dict[str, int]] = {}
+
+        # 5. Summary statistics for final reporting
         self.summary_stats = {
             'total_processed': 0,
             'zero_rate_issues': [],
@@ -202,19 +239,22 @@ class ConversionRateProcessor:
                 logger.warning("No user-product pairs found to process. Exiting.")
                 return True
 
-            # Stage 3: Process in batches.
-            all_updates = []
-            for i in range(0, total_pairs, BATCH_SIZE):
-                batch_start_time = time.time()
-                batch = target_pairs[i:i + BATCH_SIZE]
-                batch_num = (i // BATCH_SIZE) + 1
-                logger.info(f"Processing Batch {batch_num}: pairs {i+1}-{min(i+BATCH_SIZE, total_pairs)} of {total_pairs}")
+            # Stage 3: Process in batches (or across product shards in parallel).
+            if CONVERSION_RATE_WORKERS > 1:
+                all_updates = self._process_pairs_in_parallel(target_pairs)
+            else:
+                all_updates = []
+                for i in range(0, total_pairs, BATCH_SIZE):
+                    batch_start_time = time.time()
+                    batch = target_pairs[i:i + BATCH_SIZE]
+                    batch_num = (i // BATCH_SIZE) + 1
+                    logger.info(f"Processing Batch {batch_num}: pairs {i+1}-{min(i+BATCH_SIZE, total_pairs)} of {total_pairs}")
                 
-                updates = self._process_batch(batch)
-                all_updates.extend(updates)
+                    updates = self._process_batch(batch)
+                    all_updates.extend(updates)
 
-                batch_time = time.time() - batch_start_time
-                logger.info(f"Batch {batch_num} completed in {batch_time:.2f}s. Progress: {min(i+BATCH_SIZE, total_pairs)}/{total_pairs} ({(min(i+BATCH_SIZE, total_pairs)/total_pairs*100):.1f}%)")
+                    batch_time = time.time() - batch_start_time
+                    logger.info(f"Batch {batch_num} completed in {batch_time:.2f}s. Progress: {min(i+BATCH_SIZE, total_pairs)}/{total_pairs} ({(min(i+BATCH_SIZE, total_pairs)/total_pairs*100):.1f}%)")
 
             # Stage 4: Perform a single bulk update to the database.
             if all_updates:
@@ -247,7 +287,9 @@ class ConversionRateProcessor:
         cursor.execute("""
             SELECT
                 upm.user_product_id, upm.distinct_id, upm.product_id, upm.credited_date, upm.price_bucket, upm.store,
-                u.economic_tier, u.country, u.region
+                u.economic_tier, u.country, u.region,
+                upm.trial_conversion_rate, upm.trial_converted_to_refund_rate,
+                upm.initial_purchase_to_refund_rate, upm.accuracy_score
             FROM user_product_metrics upm
             JOIN mixpanel_user u ON upm.distinct_id = u.distinct_id
             WHERE upm.valid_lifecycle = TRUE AND u.valid_user = TRUE
@@ -266,22 +308,7 @@ class ConversionRateProcessor:
         if not all_relevant_user_ids:
             return # No users to process
 
-        # Step 3: Fetch the COMPLETE event history for all relevant users. NO 60-DAY LIMIT.
-        # Using parameter substitution to handle a large number of IDs safely.
-        placeholders = ','.join('?' for _ in all_relevant_user_ids)
-        query = f"""
-            SELECT distinct_id, event_name, event_time, event_json, revenue_usd
-            FROM mixpanel_event
-            WHERE event_name IN ({','.join('?' for _ in RELEVANT_EVENTS)})
-            AND distinct_id IN ({placeholders})
-        """
-        params = RELEVANT_EVENTS + list(all_relevant_user_ids)
-        cursor.execute(query, params)
-        all_events = cursor.fetchall()
-        logger.info(f"Fetched {len(all_events)} relevant events for all users.")
-
-        # Step 4: Structure the data into the self.users_data dictionary.
-        # First, populate user properties from the already-fetched user_product_data.
+        # Step 3: Populate user properties from the already-fetched user_product_data.
         # We only need to store properties for each user once.
         processed_users = set()
         for row in all_user_product_data:
@@ -294,26 +321,52 @@ class ConversionRateProcessor:
                 }
                 processed_users.add(user_id)
 
-        # Then, append all events to the corresponding user.
-        for event_row in all_events:
-            user_id = event_row['distinct_id']
-            try:
-                event_data = json.loads(event_row['event_json']) if event_row['event_json'] else {}
-                properties = event_data.get('properties', {})
-                product_id = properties.get('product_id')
+        # In incremental mode only cohort members' events are read: target pairs are rated from
+        # their cohort's events, never their own, and the cohorts are drawn from the trial window.
+        if self.incremental:
+            all_relevant_user_ids = {
+                distinct_id for (distinct_id, _), props in self.user_product_lookup.items()
+                if self._in_trial_cohort_window(props['credited_date'])
+            }
+            logger.info(f"Incremental mode: loading events for {len(all_relevant_user_ids)} cohort-window users.")
+
+        # Step 4: Stream the COMPLETE event history for all relevant users. NO 60-DAY LIMIT.
+        # Relevant users go into an indexed temp table that is joined, rather than bound as
+        # one variable each in an IN list, and events arrive already in (distinct_id, event_time)
+        # order so they can be appended straight into each user's time-sorted event list.
+        cursor.execute("DROP TABLE IF EXISTS temp_rate_users")
+        cursor.execute("CREATE TEMP TABLE temp_rate_users (distinct_id TEXT PRIMARY KEY)")
+        cursor.executemany(
+            "INSERT INTO temp_rate_users (distinct_id) VALUES (?)",
+            ((user_id,) for user_id in all_relevant_user_ids)
+        )
+
+        cursor.execute(f"""
+            SELECT e.distinct_id, e.event_name, e.event_time, e.product_id, e.revenue_usd
+            FROM temp_rate_users t
+            JOIN mixpanel_event e ON e.distinct_id = t.distinct_id
+            WHERE e.event_name IN ({','.join('?' for _ in RELEVANT_EVENTS)})
+            ORDER BY e.distinct_id, e.event_time, e.rowid
+        """, RELEVANT_EVENTS)
+
+        events_loaded = 0
+        while True:
+            event_rows = cursor.fetchmany(EVENT_FETCH_SIZE)
+            if not event_rows:
+                break
+            for event_row in event_rows:
+                product_id = event_row['product_id']  # Materialized from event_json at ingest
                 if product_id:  # Only process events with a product_id
-                    self.users_data[user_id]['events'].append({
+                    self.users_data[event_row['distinct_id']]['events'].append({
                         'event_name': event_row['event_name'],
                         'event_time': event_row['event_time'],
                         'product_id': product_id,
                         'revenue_usd': event_row['revenue_usd'] or 0
                     })
-            except (json.JSONDecodeError, AttributeError):
-                continue # Skip malformed event JSON
+            events_loaded += len(event_rows)
 
-        # Finally, sort events for each user by time. This is CRITICAL for correct calculations.
-        for user_id in self.users_data:
-            self.users_data[user_id]['events'].sort(key=lambda x: x['event_time'])
+        cursor.execute("DROP TABLE temp_rate_users")
+        logger.info(f"Fetched {events_loaded} relevant events for all users.")
 
         # Build cohort index for fast matching
         self._build_cohort_index()
@@ -327,8 +380,7 @@ class ConversionRateProcessor:
         # For each user-product combination, create index keys for different property combinations
         for (distinct_id, product_id), props in self.user_product_lookup.items():
             # Check if this user-product is in the trial cohort window (used for cohort matching)
-            credited_date = props['credited_date']
-            if not (self.trial_cohort_start_date <= credited_date <= self.trial_cohort_end_date):
+            if not self._in_trial_cohort_window(props['credited_date']):
                 continue
                 
             # Create keys for different property levels
@@ -353,6 +405,9 @@ class ConversionRateProcessor:
         
         logger.info(f"Cohort index built with {len(self.cohort_index)} property combinations.")
 
+    def _in_trial_cohort_window(self, credited_date: str) -> bool:
+        return self.trial_cohort_start_date <= credited_date <= self.trial_cohort_end_date
+
     def _get_target_user_product_pairs(self) -> List[Dict]:
         """Gets the list of user-product pairs that need rate assignments."""
         # We can just return the data we already loaded into the lookup.
@@ -369,44 +424,128 @@ class ConversionRateProcessor:
         """Processes a single batch of user-product pairs and returns database update tuples."""
         updates = []
         for pair in batch:
-            distinct_id = pair['distinct_id']
-            product_id = pair['product_id']
-            
-            # Get the properties for the target user-product pair from our lookup.
-            target_props = self.user_product_lookup.get((distinct_id, product_id))
-            if not target_props:
+            result = self._assign_rates_for_pair(pair)
+            if result is None:
                 continue # Should not happen if data is loaded correctly, but a safe check.
+            update, final_accuracy, rates = result
+            self._record_pair_stats(final_accuracy, rates)
+            updates.append(update)
+        return updates
 
-            # Step 1: Find the best possible cohort using the progressive fallback logic.
-            cohort_user_ids, accuracy = self._find_matching_cohort(target_props)
-            
-            # Step 2: Calculate rates or use defaults.
-            if len(cohort_user_ids) >= MIN_COHORT_SIZE:
-                rates = self._calculate_rates_from_cohort(cohort_user_ids, product_id)
-                final_accuracy = accuracy
-            else:
-                rates = DEFAULT_RATES
-                final_accuracy = 'default'
-            
-            # Track statistics for summary
-            self.summary_stats['total_processed'] += 1
-            self.summary_stats['accuracy_distribution'][final_accuracy] += 1
-            for rate_name, rate_value in rates.items():
-                self.summary_stats['rate_distributions'][rate_name].append(rate_value)
-            
-            # Step 3: Prepare the update tuple.
-            updates.append((
-                rates['trial_conversion_rate'],
-                rates['trial_converted_to_refund_rate'],
-                rates['initial_purchase_to_refund_rate'],
-                final_accuracy,
-                pair['user_product_id']
-            ))
+    def _assign_rates_for_pair(self, pair: Dict) -> Optional[Tuple[Tuple, str, Dict[str, float]]]:
+        """Finds the cohort for one user-product pair and returns (update tuple, accuracy, rates)."""
+        distinct_id = pair['distinct_id']
+        product_id = pair['product_id']
+        
+        # Get the properties for the target user-product pair from our lookup.
+        target_props = self.user_product_lookup.get((distinct_id, product_id))
+        if not target_props:
+            return None
+
+        # Step 1: Find the best possible cohort using the progressive fallback logic.
+        cohort_user_ids, accuracy, cohort_key = self._find_matching_cohort(target_props)
+        
+        # Step 2: Calculate rates or use defaults.
+        if len(cohort_user_ids) >= MIN_COHORT_SIZE:
+            rates = self._calculate_rates_from_cohort(cohort_user_ids, product_id, cohort_key)
+            final_accuracy = accuracy
+        else:
+            rates = DEFAULT_RATES
+            final_accuracy = 'default'
+        
+        # Step 3: Prepare the update tuple.
+        update = (
+            rates['trial_conversion_rate'],
+            rates['trial_converted_to_refund_rate'],
+            rates['initial_purchase_to_refund_rate'],
+            final_accuracy,
+            pair['user_product_id']
+        )
+        return update, final_accuracy, rates
+
+    def _record_pair_stats(self, final_accuracy: str, rates: Dict[str, float]) -> None:
+        """Track statistics for summary"""
+        self.summary_stats['total_processed'] += 1
+        self.summary_stats['accuracy_distribution'][final_accuracy] += 1
+        for rate_name, rate_value in rates.items():
+            self.summary_stats['rate_distributions'][rate_name].append(rate_value)
+
+    def _build_product_shards(self, target_pairs: List[Dict]) -> List[Dict[str, Any]]:
+        """
+        Partitions target pairs by product_id, each with its own slice of the in-memory model.
+        Cohorts never cross product_id, so a shard only needs that product's lookup entries,
+        cohort index keys and the product's events for the users in those cohorts.
+        """
+        windows = {attribute: getattr(self, attribute) for attribute in self.WINDOW_ATTRIBUTES}
+        pairs_by_product = defaultdict(list)
+        for index, pair in enumerate(target_pairs):
+            pairs_by_product[pair['product_id']].append((index, pair))
+
+        cohort_keys_by_product = defaultdict(list)
+        for cohort_key in self.cohort_index:
+            # Keys look like "level_N:<product_id>|<price_bucket>|<store>..."
+            product_part = cohort_key.split(':', 1)[1]
+            for product_id in pairs_by_product:
+                if product_part.startswith(f"{product_id}|"):
+                    cohort_keys_by_product[product_id].append(cohort_key)
+
+        shards = []
+        for product_id, indexed_pairs in pairs_by_product.items():
+            cohort_index = {key: self.cohort_index[key] for key in cohort_keys_by_product[product_id]}
+            cohort_users = {user_id for user_ids in cohort_index.values() for user_id in user_ids}
+            shards.append({
+                'product_id': product_id,
+                'pairs': indexed_pairs,
+                'windows': windows,
+                'user_product_lookup': {
+                    key: props for key, props in self.user_product_lookup.items() if key[1] == product_id
+                },
+                'cohort_index': cohort_index,
+                'users_data': {
+                    user_id: {
+                        'properties': self.users_data[user_id]['properties'],
+                        'events': [e for e in self.users_data[user_id]['events'] if e['product_id'] == product_id]
+                    }
+                    for user_id in cohort_users
+                }
+            })
+        # Largest shards first so they don't finish last
+        shards.sort(key=lambda shard: len(shard['pairs']), reverse=True)
+        return shards
+
+    def _process_pairs_in_parallel(self, target_pairs: List[Dict]) -> List[Tuple]:
+        """
+        Processes all target pairs across a process pool, one task per product shard.
+        Results are merged back in the original pair order so the updates and summary
+        statistics match a sequential run exactly.
+        """
+        shards = self._build_product_shards(target_pairs)
+        logger.info(f"Processing {len(target_pairs)} pairs in {len(shards)} product shards with {CONVERSION_RATE_WORKERS} workers")
+
+        start_methods = multiprocessing.get_all_start_methods()
+        mp_context = multiprocessing.get_context('fork') if 'fork' in start_methods else None
+
+        shard_results = []
+        with ProcessPoolExecutor(max_workers=CONVERSION_RATE_WORKERS, mp_context=mp_context) as pool:
+            for shard, results in zip(shards, pool.map(_run_rate_shard, shards)):
+                shard_results.extend(results)
+                logger.info(f"Product shard {shard['product_id']} completed ({len(results)} pairs)")
+
+        updates = []
+        shard_results.sort(key=lambda item: item[0])
+        for _, result, zero_rate_issues in shard_results:
+            self.summary_stats['zero_rate_issues'].extend(zero_rate_issues)
+            if result is None:
+                continue
+            update, final_accuracy, rates = result
+            self._record_pair_stats(final_accuracy, rates)
+            updates.append(update)
         return updates
 
-    def _find_matching_cohort(self, target_props: Dict) -> Tuple[List[str], str]:
+    def _find_matching_cohort(self, target_props: Dict) -> Tuple[List[str], str, Optional[str]]:
         """
         Finds the best cohort for a target user using the pre-built index for fast lookup.
+        Returns the cohort's user IDs, its accuracy level and the cohort index key it came from.
         """
         # Create the property keys for lookup
         product_id = target_props['product_id']
@@ -418,33 +557,71 @@ class ConversionRateProcessor:
         
         # Level 1: All 6 properties (very_high)
         key_6 = '|'.join(str(p) for p in all_props)
-        cohort = self.cohort_index.get(f"level_6:{key_6}", [])
+        cohort_key = f"level_6:{key_6}"
+        cohort = self.cohort_index.get(cohort_key, [])
         if len(cohort) >= MIN_COHORT_SIZE:
-            return cohort, accuracy_levels[0]
+            return cohort, accuracy_levels[0], cohort_key
         
         # Level 2: 5 properties (high) - remove region
         key_5 = '|'.join(str(p) for p in all_props[:-1])
-        cohort = self.cohort_index.get(f"level_5:{key_5}", [])
+        cohort_key = f"level_5:{key_5}"
+        cohort = self.cohort_index.get(cohort_key, [])
         if len(cohort) >= MIN_COHORT_SIZE:
-            return cohort, accuracy_levels[1]
+            return cohort, accuracy_levels[1], cohort_key
         
         # Level 3: 4 properties (medium) - remove region and country
         key_4 = '|'.join(str(p) for p in all_props[:-2])
-        cohort = self.cohort_index.get(f"level_4:{key_4}", [])
+        cohort_key = f"level_4:{key_4}"
+        cohort = self.cohort_index.get(cohort_key, [])
         if len(cohort) >= MIN_COHORT_SIZE:
-            return cohort, accuracy_levels[2]
+            return cohort, accuracy_levels[2], cohort_key
         
         # Level 4: 3 properties (low) - core properties only
         key_3 = '|'.join(str(p) for p in base_props)
-        cohort = self.cohort_index.get(f"level_3:{key_3}", [])
+        cohort_key = f"level_3:{key_3}"
+        cohort = self.cohort_index.get(cohort_key, [])
         if len(cohort) >= MIN_COHORT_SIZE:
-            return cohort, accuracy_levels[3]
+            return cohort, accuracy_levels[3], cohort_key
                 
-        return [], 'default'
+        return [], 'default', None
 
-    def _calculate_rates_from_cohort(self, cohort_user_ids: List[str], product_id: str) -> Dict[str, float]:
+    def _calculate_rates_from_cohort(self, cohort_user_ids: List[str], product_id: str, cohort_key: Optional[str] = None) -> Dict[str, float]:
         """
         Calculates conversion and refund rates from a given cohort of users.
+        When cohort_key is given, the cohort's event counters are computed once and reused.
+        """
+        if cohort_key is None:
+            counters = self._count_cohort_events(cohort_user_ids, product_id)
+        else:
+            cache_key = (cohort_key, product_id)
+            counters = self.cohort_counter_cache.get(cache_key)
+            if counters is None:
+                counters = self._count_cohort_events(cohort_user_ids, product_id)
+                self.cohort_counter_cache[cache_key] = counters
+
+        trials_in_window = counters['trials_in_window']
+        matched_conversions = counters['matched_conversions']
+        purchases_eligible_for_refund = counters['purchases_eligible_for_refund']
+        purchase_refunds = counters['purchase_refunds']
+        conversions_eligible_for_refund = counters['conversions_eligible_for_refund']
+        conversion_refunds = counters['conversion_refunds']
+
+        # Calculate final rates, avoiding division by zero
+        rates = {
+            'trial_conversion_rate': matched_conversions / trials_in_window if trials_in_window > 0 else 0,
+            'trial_converted_to_refund_rate': conversion_refunds / conversions_eligible_for_refund if conversions_eligible_for_refund > 0 else 0,
+            'initial_purchase_to_refund_rate': purchase_refunds / purchases_eligible_for_refund if purchases_eligible_for_refund > 0 else 0
+        }
+
+        # Check for zero rates and collect summary info instead of verbose logging
+        if all(rate == 0 for rate in rates.values()) and len(cohort_user_ids) >= MIN_COHORT_SIZE:
+            self._collect_zero_rate_summary(product_id, len(cohort_user_ids), counters)
+
+        return rates
+
+    def _count_cohort_events(self, cohort_user_ids: List[str], product_id: str) -> Dict[str, int]:
+        """
+        Walks the cohort's events and counts trial starts, conversions, eligible events and refunds.
         This uses the complete, time-sorted event lists for precise, unambiguous calculations.
         """
         # Counters for rate calculations
@@ -508,26 +685,15 @@ class ConversionRateProcessor:
                                 purchase_refunds += 1
                                 break
 
-        # Calculate final rates, avoiding division by zero
-        rates = {
-            'trial_conversion_rate': matched_conversions / trials_in_window if trials_in_window > 0 else 0,
-            'trial_converted_to_refund_rate': conversion_refunds / conversions_eligible_for_refund if conversions_eligible_for_refund > 0 else 0,
-            'initial_purchase_to_refund_rate': purchase_refunds / purchases_eligible_for_refund if purchases_eligible_for_refund > 0 else 0
+        return {
+            'trials_in_window': trials_in_window,
+            'matched_conversions': matched_conversions,
+            'purchases_eligible_for_refund': purchases_eligible_for_refund,
+            'purchase_refunds': purchase_refunds,
+            'conversions_eligible_for_refund': conversions_eligible_for_refund,
+            'conversion_refunds': conversion_refunds
         }
 
-        # Check for zero rates and collect summary info instead of verbose logging
-        if all(rate == 0 for rate in rates.values()) and len(cohort_user_ids) >= MIN_COHORT_SIZE:
-            self._collect_zero_rate_summary(product_id, len(cohort_user_ids), {
-                'trials_in_window': trials_in_window,
-                'matched_conversions': matched_conversions,
-                'purchases_eligible_for_refund': purchases_eligible_for_refund,
-                'purchase_refunds': purchase_refunds,
-                'conversions_eligible_for_refund': conversions_eligible_for_refund,
-                'conversion_refunds': conversion_refunds
-            })
-
-        return rates
-
     def _collect_zero_rate_summary(self, product_id: str, cohort_size: int, counters: Dict) -> None:
         """
         Collect summary information about zero rate issues for final reporting.
@@ -612,10 +778,32 @@ class ConversionRateProcessor:
         
         logger.info("="*60)
 
+    def _changed_updates(self, updates: List[Tuple]) -> List[Tuple]:
+        """Updates whose rates or accuracy differ from what the pair already has stored."""
+        stored = {
+            props['user_product_id']: (
+                props['trial_conversion_rate'], props['trial_converted_to_refund_rate'],
+                props['initial_purchase_to_refund_rate'], props['accuracy_score']
+            )
+            for props in self.user_product_lookup.values()
+        }
+        return [update for update in updates if stored.get(update[4]) != tuple(update[:4])]
+
     def _batch_update_metrics(self, updates: List[Tuple]) -> None:
         """Performs a single, efficient bulk update to the database."""
-        logger.info(f"Performing bulk update of {len(updates)} records in the database...")
         cursor = self.conn.cursor()
+        if self.incremental:
+            rated_count = len(updates)
+            updates = self._changed_updates(updates)
+            logger.info(f"Incremental mode: {len(updates)} of {rated_count} pairs changed rates.")
+            if not updates:
+                return
+            changed_ids = {update[4] for update in updates}
+            mark_dirty_pairs(cursor, [
+                key for key, props in self.user_product_lookup.items()
+                if props['user_product_id'] in changed_ids
+            ], 'rate_changed', refresh=False)
+        logger.info(f"Performing bulk update of {len(updates)} records in the database...")
         try:
             cursor.executemany("""
                 UPDATE user_product_metrics 
@@ -694,6 +882,8 @@ class ConversionRateProcessor:
                     accuracy_score,
                     user['user_product_id']
                 ))
+            if self.incremental:
+                mark_dirty_pairs(cursor, [(user['distinct_id'], user['product_id']) for user in missed_users], 'rate_changed', refresh=False)
             
             # Execute batch update
             cursor.executemany("""
@@ -729,6 +919,20 @@ class ConversionRateProcessor:
             self.conn.rollback()
 
 
+def _run_rate_shard(shard: Dict[str, Any]) -> List[Tuple[int, Optional[Tuple], List[Dict]]]:
+    """
+    Process-pool entry point: assigns rates for one product shard.
+    Returns (pair index, result, zero-rate issues raised by that pair) for every pair.
+    """
+    processor = ConversionRateProcessor.from_shard(shard)
+    zero_rate_issues = processor.summary_stats['zero_rate_issues']
+    results = []
+    for index, pair in shard['pairs']:
+        issues_before = len(zero_rate_issues)
+        result = processor._assign_rates_for_pair(pair)
+        results.append((index, result, zero_rate_issues[issues_before:]))
+    return results
+
 if __name__ == "__main__":
     success = main()
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -50,6 +50,9 @@ from orchestrator.utils.timezone_utils import now_in_timezone
 
 import os
 import sys
+import zlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, Any, List, Optional, Tuple
 import logging
 import pandas as pd
@@ -63,12 +66,20 @@ from pathlib import Path
 # Add utils directory to path for database utilities
 utils_path = str(Path(__file__).resolve().parent.parent.parent / "utils")
 sys.path.append(utils_path)
-from database_utils import get_database_path
+from database_utils import get_database_path, get_pre_processing_run_mode, complete_pre_processing_run
+from pricing_rule_engine import get_pricing_rule_engine
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Users processed per batch (each batch is loaded with one events query and one attributes query)
+VALUE_ESTIMATION_BATCH_SIZE = int(os.environ.get('VALUE_ESTIMATION_BATCH_SIZE', 5000))
+# Parallel value estimation over user shards (VALUE_ESTIMATION_WORKERS=1 runs sequentially)
+VALUE_ESTIMATION_WORKERS = max(1, int(os.environ.get('VALUE_ESTIMATION_WORKERS', 1)))
+# 'incremental' re-values only the pairs in the dirty_user_products ledger (see 00_assign_credited_date.py)
+PRE_PROCESSING_MODE = os.environ.get('PRE_PROCESSING_MODE', 'full').lower()
+
 
 def main():
     """
@@ -114,10 +125,27 @@ class ValueEstimator:
         if db_path is None:
             db_path = get_database_path('mixpanel_data')
         self.db_path = db_path
-        self.pricing_rules = None
+        self.pricing_engine = None
+        
+        # Single long-lived connection, opened lazily and closed by close()
+        self.conn = None
+        
+        # user_product_metrics attributes for the current batch, keyed by (distinct_id, product_id)
+        self.pair_attributes = {}
+        
+        # Set per run from the pre-processing run mode
+        self.incremental = False
         
         # Error counters for summary reporting
-        self.error_counts = {
+        self.error_counts = self._new_error_counts()
+        
+        self._load_pricing_rules()
+        logger.info("ValueEstimator initialized")
+
+    @staticmethod
+    def _new_error_counts() -> Dict[str, int]:
+        """Zeroed error counters for summary reporting"""
+        return {
             'no_subscription_start_event': 0,
             'no_price_bucket_in_database': 0,
             'no_conversion_rates_found': 0,
@@ -127,24 +155,39 @@ class ValueEstimator:
             'failed_price_lookup': 0,
             'failed_value_calculation': 0
         }
-        
-        self._load_pricing_rules()
-        logger.info("ValueEstimator initialized")
+
+    @classmethod
+    def from_shard(cls, shard: Dict[str, Any]) -> 'ValueEstimator':
+        """Builds a database-less estimator over one user shard's pre-fetched attributes"""
+        estimator = cls.__new__(cls)
+        estimator.db_path = None
+        estimator.conn = None
+        estimator.pricing_engine = shard['pricing_engine']
+        estimator.pair_attributes = shard['pair_attributes']
+        estimator.error_counts = cls._new_error_counts()
+        return estimator
     
     def _load_pricing_rules(self) -> None:
-        """Load pricing rules from data/pricing_rules/pricing_rules.json"""
+        """Load the compiled pricing rules shared with the /api/pricing endpoints"""
         try:
-            pricing_rules_path = 'data/pricing_rules/pricing_rules.json'
-            if os.path.exists(pricing_rules_path):
-                with open(pricing_rules_path, 'r') as f:
-                    self.pricing_rules = json.load(f)
-                logger.info(f"Loaded pricing rules for {len(self.pricing_rules.get('products', {}))} products")
-            else:
-                logger.warning(f"Pricing rules file not found at {pricing_rules_path}")
-                self.pricing_rules = {'products': {}}
+            self.pricing_engine = get_pricing_rule_engine()
+            logger.info(f"Loaded pricing rules for {self.pricing_engine.product_count()} products "
+                        f"(version {self.pricing_engine.version})")
         except Exception as e:
             logger.error(f"Failed to load pricing rules: {e}")
-            self.pricing_rules = {'products': {}}
+            self.pricing_engine = None
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return the estimator's connection, opening it on first use"""
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_path)
+        return self.conn
+
+    def close(self) -> None:
+        """Close the estimator's connection if it is open"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
 
     def _get_active_price_for_date(self, product_id: str, country: str, trial_date: str) -> Optional[float]:
         """
@@ -152,29 +195,9 @@ class ValueEstimator:
         Rules with later start_date override earlier ones, even if end_date is null.
         """
         try:
-            if not self.pricing_rules:
-                return None
-                
-            product_rules = self.pricing_rules['products'].get(product_id)
-            if not product_rules:
+            if not self.pricing_engine:
                 return None
-            
-            # Try country-specific rules first, then 'ALL'
-            for country_key in [country, 'ALL']:
-                if country_key not in product_rules:
-                    continue
-                    
-                rules = product_rules[country_key]['rules']
-                
-                # Sort by start_date (newest first)
-                sorted_rules = sorted(rules, key=lambda x: x['start_date'], reverse=True)
-                
-                # Find first rule where start_date <= trial_date
-                for rule in sorted_rules:
-                    if rule['start_date'] <= trial_date:
-                        return rule['price_usd']
-            
-            return None
+            return self.pricing_engine.get_active_price(product_id, country, trial_date)
             
         except Exception as e:
             self.error_counts['failed_price_lookup'] += 1
@@ -189,6 +212,9 @@ class ValueEstimator:
         """
         try:
             start_time = now_in_timezone()
+            self.incremental = get_pre_processing_run_mode(self._get_connection(), PRE_PROCESSING_MODE) == 'incremental'
+            if self.incremental:
+                logger.info("Incremental mode: re-valuing only pairs in the dirty_user_products ledger")
             
             # CRITICAL: Only clear the three specific value fields, preserve all other data
             logger.info("Clearing only current_status, current_value, and value_status fields...")
@@ -197,6 +223,7 @@ class ValueEstimator:
             # Get users with attribution
             attributed_users = self._get_attributed_users()
             if not attributed_users:
+                complete_pre_processing_run(self._get_connection())
                 return {
                     'success': True,
                     'users_processed': 0,
@@ -212,25 +239,41 @@ class ValueEstimator:
             total_failed = 0
             
             # Use larger batch size for memory efficiency (10k-50k user-product pairs)
-            batch_size = 5000  # Start with 5k users, which can generate 10k-50k user-product pairs
-            for i in range(0, len(attributed_users), batch_size):
-                batch = attributed_users[i:i + batch_size]
-                batch_num = (i // batch_size) + 1
-                total_batches = (len(attributed_users) + batch_size - 1) // batch_size
-                
-                logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} users)")
-                
-                batch_result = self._process_user_batch(batch)
-                total_processed += batch_result['users_processed']
-                total_user_product_pairs += batch_result['user_product_pairs']
-                total_successful += batch_result['successful_calculations']
-                total_failed += batch_result['failed_calculations']
+            batch_size = VALUE_ESTIMATION_BATCH_SIZE  # 5k users can generate 10k-50k user-product pairs
+            
+            pool = None
+            if VALUE_ESTIMATION_WORKERS > 1:
+                logger.info(f"Estimating values with {VALUE_ESTIMATION_WORKERS} workers")
+                start_methods = multiprocessing.get_all_start_methods()
+                mp_context = multiprocessing.get_context('fork') if 'fork' in start_methods else None
+                pool = ProcessPoolExecutor(max_workers=VALUE_ESTIMATION_WORKERS, mp_context=mp_context)
+            
+            try:
+                for i in range(0, len(attributed_users), batch_size):
+                    batch = attributed_users[i:i + batch_size]
+                    batch_num = (i // batch_size) + 1
+                    total_batches = (len(attributed_users) + batch_size - 1) // batch_size
+                    
+                    logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} users)")
+                    
+                    batch_result = self._process_user_batch(batch, pool)
+                    total_processed += batch_result['users_processed']
+                    total_user_product_pairs += batch_result['user_product_pairs']
+                    total_successful += batch_result['successful_calculations']
+                    total_failed += batch_result['failed_calculations']
+            finally:
+                if pool is not None:
+                    pool.shutdown()
             
             processing_time = (now_in_timezone() - start_time).total_seconds()
             
             # Display error summary
             self._display_error_summary()
             
+            # Every step has consumed the dirty-set ledger; close out the pre-processing run
+            pairs_cleared = complete_pre_processing_run(self._get_connection())
+            logger.info(f"Pre-processing run complete, cleared {pairs_cleared} dirty pairs from the ledger")
+            
             return {
                 'success': True,
                 'users_processed': total_processed,
@@ -248,6 +291,8 @@ class ValueEstimator:
                 'success': False,
                 'error': str(e)
             }
+        finally:
+            self.close()
 
     def _display_error_summary(self):
         """Display summary of all errors encountered during processing"""
@@ -266,23 +311,28 @@ class ValueEstimator:
     def _clear_value_fields_only(self) -> None:
         """Clear ONLY the three value estimation fields that this script is allowed to modify"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_connection()
             cursor = conn.cursor()
             
             # CRITICAL: Only clear the three fields this script is authorized to modify
             # Preserve ALL other data including conversion rates, accuracy scores, etc.
-            cursor.execute("""
+            # Incremental runs clear only the dirty pairs they are about to re-value.
+            scope = """
+                FROM dirty_user_products d
+                WHERE d.distinct_id = user_product_metrics.distinct_id
+                AND d.product_id = user_product_metrics.product_id
+            """ if self.incremental else "WHERE 1=1"
+            cursor.execute(f"""
                 UPDATE user_product_metrics 
                 SET current_status = 'PLACEHOLDER_STATUS',
                     current_value = 0.00,
                     value_status = 'PLACEHOLDER_VALUE_STATUS',
                     last_updated_ts = datetime('now')
-                WHERE 1=1
+                {scope}
             """)
             conn.commit()
             
             rows_cleared = cursor.rowcount
-            conn.close()
             
             logger.info(f"Cleared ONLY current_status, current_value, and value_status for {rows_cleared} records")
             
@@ -293,8 +343,7 @@ class ValueEstimator:
     def _get_attributed_users(self) -> List[Dict[str, Any]]:
         """Get ALL users from user_product_metrics table (TEMPORARILY REMOVING FILTERS FOR TESTING)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self._get_connection().cursor()
             
             # TEMPORARILY REMOVED FILTERING - Processing ALL users for testing
             # Original filtering was: u.has_abi_attribution = 1 AND u.valid_user = 1 AND upm.valid_lifecycle = 1
@@ -309,10 +358,11 @@ class ValueEstimator:
             # - No valid starter events found due to product_id mismatches
             # - No conversion events for fallback logic (also product_id mismatches)
             # - Missing credited_date assignments from Module 00 (prerequisite failure)
-            query = """
+            query = f"""
                 SELECT DISTINCT u.distinct_id, u.profile_json
                 FROM mixpanel_user u
                 JOIN user_product_metrics upm ON u.distinct_id = upm.distinct_id
+                {self._dirty_pair_join('upm')}
             """
             
             cursor.execute(query)
@@ -331,15 +381,38 @@ class ValueEstimator:
                     self.error_counts['failed_profile_json_parse'] += 1
                     continue
             
-            conn.close()
             return attributed_users
             
         except Exception as e:
             logger.error(f"Failed to get attributed users: {e}")
             return []
 
-    def _process_user_batch(self, users_batch: List[Dict[str, Any]]) -> Dict[str, int]:
+    def _process_user_batch(self, users_batch: List[Dict[str, Any]], pool: Optional[ProcessPoolExecutor] = None) -> Dict[str, int]:
         """Process a single batch of users with optimized memory usage"""
+        # Pre-fetch all user events and pair attributes in one query each for the entire batch
+        user_ids = [user['distinct_id'] for user in users_batch]
+        self._load_batch_users(user_ids)
+        all_user_events = self._get_batch_user_events()
+        self.pair_attributes = self._get_batch_pair_attributes()
+        
+        if pool is not None:
+            updates, batch_stats = self._estimate_users_in_parallel(users_batch, all_user_events, pool)
+        else:
+            updates, batch_stats = self._estimate_users(users_batch, all_user_events)
+        
+        # Store all records for this batch in a single transaction
+        if updates:
+            stored_count = self._store_user_product_records(updates)
+        
+        return batch_stats
+
+    def _estimate_users(self, users_batch: List[Dict[str, Any]], all_user_events: Dict[str, Dict[str, List[Dict]]]) -> Tuple[List[Tuple], Dict[str, int]]:
+        """
+        Estimate values for a list of users from pre-fetched events and self.pair_attributes.
+        
+        Returns:
+            (update tuples for _store_user_product_records, batch statistics)
+        """
         batch_stats = {
             'users_processed': 0,
             'user_product_pairs': 0,
@@ -347,11 +420,7 @@ class ValueEstimator:
             'failed_calculations': 0
         }
         
-        # Pre-fetch all user events in a single query for the entire batch
-        user_ids = [user['distinct_id'] for user in users_batch]
-        all_user_events = self._get_batch_user_events(user_ids)
-        
-        user_product_records = []
+        updates = []
         
         for user_data in users_batch:
             distinct_id = user_data['distinct_id']
@@ -372,7 +441,13 @@ class ValueEstimator:
                     record = self._process_user_product_pair(distinct_id, product_id, profile, events)
                     
                     if record:
-                        user_product_records.append(record)
+                        updates.append((
+                            record['current_status'],
+                            record['current_value'],
+                            record['value_status'],
+                            record['distinct_id'],
+                            record['product_id']
+                        ))
                         batch_stats['successful_calculations'] += 1
                     else:
                         batch_stats['failed_calculations'] += 1
@@ -384,137 +459,141 @@ class ValueEstimator:
                 batch_stats['failed_calculations'] += 1
                 continue
         
-        # Store all records for this batch in a single transaction
-        if user_product_records:
-            stored_count = self._store_user_product_records(user_product_records)
+        return updates, batch_stats
+
+    def _build_user_shards(self, users_batch: List[Dict[str, Any]], all_user_events: Dict[str, Dict[str, List[Dict]]]) -> List[Dict[str, Any]]:
+        """Hashes the batch's users into VALUE_ESTIMATION_WORKERS shards, each carrying its own inputs"""
+        shards = [
+            {'users': [], 'user_events': {}, 'pair_attributes': {}, 'pricing_engine': self.pricing_engine}
+            for _ in range(VALUE_ESTIMATION_WORKERS)
+        ]
+        for user_data in users_batch:
+            distinct_id = user_data['distinct_id']
+            shard = shards[zlib.crc32(distinct_id.encode('utf-8')) % VALUE_ESTIMATION_WORKERS]
+            shard['users'].append(user_data)
+            user_events = all_user_events.get(distinct_id)
+            if user_events:
+                shard['user_events'][distinct_id] = user_events
+                for product_id in user_events:
+                    attributes = self.pair_attributes.get((distinct_id, product_id))
+                    if attributes is not None:
+                        shard['pair_attributes'][(distinct_id, product_id)] = attributes
+        return [shard for shard in shards if shard['users']]
+
+    def _estimate_users_in_parallel(self, users_batch: List[Dict[str, Any]], all_user_events: Dict[str, Dict[str, List[Dict]]],
+                                    pool: ProcessPoolExecutor) -> Tuple[List[Tuple], Dict[str, int]]:
+        """Estimates the batch across the process pool and merges updates, statistics and error counts"""
+        updates = []
+        batch_stats = {
+            'users_processed': 0,
+            'user_product_pairs': 0,
+            'successful_calculations': 0,
+            'failed_calculations': 0
+        }
         
-        return batch_stats
+        for shard_updates, shard_stats, shard_errors in pool.map(_run_value_shard, self._build_user_shards(users_batch, all_user_events)):
+            updates.extend(shard_updates)
+            for key, count in shard_stats.items():
+                batch_stats[key] += count
+            for key, count in shard_errors.items():
+                self.error_counts[key] += count
+        
+        return updates, batch_stats
 
-    def _get_batch_user_events(self, user_ids: List[str]) -> Dict[str, Dict[str, List[Dict]]]:
-        """Get subscription events for a batch of users, for ALL user-product pairs (TEMPORARILY REMOVING FILTERS)"""
+    def _dirty_pair_join(self, metrics_alias: str) -> str:
+        """JOIN restricting a user_product_metrics alias to dirty pairs in incremental mode (empty otherwise)"""
+        if not self.incremental:
+            return ''
+        return (f"JOIN dirty_user_products d ON d.distinct_id = {metrics_alias}.distinct_id "
+                f"AND d.product_id = {metrics_alias}.product_id")
+
+    def _load_batch_users(self, user_ids: List[str]) -> None:
+        """Stage the batch's user IDs in a temp table that the batch queries join against"""
+        cursor = self._get_connection().cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS temp_value_users (
+                distinct_id TEXT PRIMARY KEY
+            )
+        """)
+        cursor.execute("DELETE FROM temp_value_users")
+        cursor.executemany(
+            "INSERT OR IGNORE INTO temp_value_users (distinct_id) VALUES (?)",
+            ((user_id,) for user_id in user_ids)
+        )
+
+    def _get_batch_user_events(self) -> Dict[str, Dict[str, List[Dict]]]:
+        """Get subscription events for the staged batch of users, for ALL user-product pairs (TEMPORARILY REMOVING FILTERS)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Create placeholder for user IDs
-            user_placeholders = ','.join(['?' for _ in user_ids])
+            cursor = self._get_connection().cursor()
             
             # Get all relevant events for ALL user-product pairs (filtering temporarily removed)
-            query = f"""
-                WITH all_user_products AS (
-                    SELECT DISTINCT 
-                        upm.distinct_id,
-                        upm.product_id
-                    FROM user_product_metrics upm
-                    WHERE upm.distinct_id IN ({user_placeholders})
-                )
+            cursor.execute(f"""
                 SELECT 
                     e.distinct_id,
-                    JSON_EXTRACT(e.event_json, '$.properties.product_id') as product_id,
+                    e.product_id,
                     e.event_name,
                     e.event_time,
                     e.revenue_usd,
                     e.refund_flag,
-                    e.event_json
-                FROM mixpanel_event e
-                INNER JOIN all_user_products aup ON e.distinct_id = aup.distinct_id 
-                    AND JSON_EXTRACT(e.event_json, '$.properties.product_id') = aup.product_id
+                    e.store
+                FROM temp_value_users tu
+                JOIN user_product_metrics upm ON upm.distinct_id = tu.distinct_id
+                {self._dirty_pair_join('upm')}
+                JOIN mixpanel_event e ON e.distinct_id = upm.distinct_id 
+                    AND e.product_id = upm.product_id
                 WHERE e.event_name IN ('RC Trial started', 'RC Trial cancelled', 'RC Trial converted', 'RC Initial purchase', 'RC Cancellation')
-                ORDER BY e.distinct_id, aup.product_id, e.event_time
-            """
-            
-            cursor.execute(query, user_ids)
-            rows = cursor.fetchall()
+                ORDER BY e.distinct_id, e.product_id, e.event_time
+            """)
             
             # Group by user_id -> product_id -> events
             batch_user_events = {}
-            for row in rows:
-                distinct_id, product_id, event_name, event_time, revenue_usd, refund_flag, event_json = row
-                
-                if distinct_id not in batch_user_events:
-                    batch_user_events[distinct_id] = {}
+            for row in cursor:
+                distinct_id, product_id, event_name, event_time, revenue_usd, refund_flag, store = row
                 
-                if product_id not in batch_user_events[distinct_id]:
-                    batch_user_events[distinct_id][product_id] = []
-                
-                batch_user_events[distinct_id][product_id].append({
+                batch_user_events.setdefault(distinct_id, {}).setdefault(product_id, []).append({
                     'event_name': event_name,
                     'event_time': event_time,
                     'revenue_usd': revenue_usd or 0.0,
                     'refund_flag': refund_flag or 0,
-                    'event_json': event_json
+                    'product_id': product_id,
+                    'store': store
                 })
             
-            conn.close()
             return batch_user_events
             
         except Exception as e:
-            logger.error(f"Failed to get batch events for {len(user_ids)} users: {e}")
+            logger.error(f"Failed to get batch events: {e}")
             return {}
 
-    def _get_user_product_pairs(self, distinct_id: str) -> Dict[str, List[Dict]]:
-        """Get subscription events for a user, grouped by product_id, only for products with start events"""
+    def _get_batch_pair_attributes(self) -> Dict[Tuple[str, str], Tuple]:
+        """
+        Load the user_product_metrics attributes the value math needs for the staged batch.
+        
+        Returns:
+            Dict keyed by (distinct_id, product_id) with tuples of
+            (credited_date, price_bucket, trial_conversion_rate,
+             trial_converted_to_refund_rate, initial_purchase_to_refund_rate, store)
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # First, find products that have start events for this user
-            start_events_query = """
-                SELECT DISTINCT JSON_EXTRACT(event_json, '$.properties.product_id') as product_id
-                FROM mixpanel_event 
-                WHERE distinct_id = ?
-                  AND event_name IN ('RC Trial started', 'RC Initial purchase')
-                  AND JSON_EXTRACT(event_json, '$.properties.product_id') IS NOT NULL
-            """
-            
-            cursor.execute(start_events_query, (distinct_id,))
-            products_with_start_events = set(row[0] for row in cursor.fetchall())
-            
-            if not products_with_start_events:
-                conn.close()
-                return {}
-            
-            # Now get all events for products that have start events
-            products_placeholder = ','.join(['?' for _ in products_with_start_events])
-            query = f"""
+            cursor = self._get_connection().cursor()
+            cursor.execute(f"""
                 SELECT 
-                    JSON_EXTRACT(event_json, '$.properties.product_id') as product_id,
-                    event_name,
-                    event_time,
-                    revenue_usd,
-                    refund_flag,
-                    event_json
-                FROM mixpanel_event 
-                WHERE distinct_id = ?
-                  AND event_name IN ('RC Trial started', 'RC Trial cancelled', 'RC Trial converted', 'RC Initial purchase', 'RC Cancellation')
-                  AND JSON_EXTRACT(event_json, '$.properties.product_id') IN ({products_placeholder})
-                ORDER BY event_time
-            """
-            
-            cursor.execute(query, [distinct_id] + list(products_with_start_events))
-            rows = cursor.fetchall()
-            
-            # Group by product_id
-            product_pairs = {}
-            for row in rows:
-                product_id, event_name, event_time, revenue_usd, refund_flag, event_json = row
-                
-                if product_id not in product_pairs:
-                    product_pairs[product_id] = []
-                
-                product_pairs[product_id].append({
-                    'event_name': event_name,
-                    'event_time': event_time,
-                    'revenue_usd': revenue_usd or 0.0,
-                    'refund_flag': refund_flag or 0,
-                    'event_json': event_json
-                })
-            
-            conn.close()
-            return product_pairs
+                    upm.distinct_id,
+                    upm.product_id,
+                    upm.credited_date,
+                    upm.price_bucket,
+                    upm.trial_conversion_rate,
+                    upm.trial_converted_to_refund_rate,
+                    upm.initial_purchase_to_refund_rate,
+                    upm.store
+                FROM temp_value_users tu
+                JOIN user_product_metrics upm ON upm.distinct_id = tu.distinct_id
+                {self._dirty_pair_join('upm')}
+            """)
+            return {(row[0], row[1]): row[2:] for row in cursor}
             
         except Exception as e:
-            logger.error(f"Failed to get events for user {distinct_id}: {e}")
+            logger.error(f"Failed to get batch pair attributes: {e}")
             return {}
 
     def _process_user_product_pair(self, distinct_id: str, product_id: str, profile: Dict, events: List[Dict]) -> Optional[Dict]:
@@ -543,7 +622,8 @@ class ValueEstimator:
                         'event_name': 'RC Trial started',  # Treat fallback as trial start
                         'event_time': credited_date + 'T00:00:00Z',  # Use credited date as start time
                         'revenue_usd': 0,
-                        'event_json': json.dumps({'properties': {'product_id': product_id}})
+                        'product_id': product_id,
+                        'store': None
                     }
                     logger.debug(f"Created synthetic start event for {distinct_id} based on credited_date {credited_date}")
             
@@ -746,11 +826,7 @@ class ValueEstimator:
                     # Phase 2: Post-trial phase (8-37 days) - Check if user converted
                     if current_status in ['trial_converted', 'trial_converted_cancelled']:
                         # User converted - calculate post-conversion value
-                        try:
-                            start_event_json = json.loads(start_event['event_json'])
-                            target_product_id = start_event_json.get('properties', {}).get('product_id', '')
-                        except (json.JSONDecodeError, KeyError):
-                            target_product_id = ''
+                        target_product_id = self._get_product_id_from_event(start_event)
                         
                         # Check if user actually converted (has RC Trial converted event for this product)
                         has_converted = any(
@@ -813,14 +889,10 @@ class ValueEstimator:
     def _extract_user_properties(self, distinct_id: str, product_id: str, profile: Dict, start_event: Dict) -> Optional[Dict]:
         """Extract user properties needed for value calculation"""
         try:
-            # Parse start event JSON
-            event_json = json.loads(start_event['event_json'])
-            event_props = event_json.get('properties', {})
-            
-            # Extract properties
+            # Extract properties (store is materialized from the event at ingest)
             user_properties = {
                 'product_id': product_id,
-                'app_store': event_props.get('store', ''),
+                'app_store': start_event.get('store') or '',
                 'country': profile.get('mp_country_code', ''),
                 'region': profile.get('mp_region', ''),
             }
@@ -833,7 +905,7 @@ class ValueEstimator:
                 user_properties['price_bucket'] = f"${price:.2f}"
             else:
                 # Fallback: try to get from event revenue
-                revenue = event_props.get('revenue', start_event.get('revenue_usd', 0))
+                revenue = start_event.get('revenue_usd', 0)
                 if revenue and revenue > 0:
                     user_properties['price_bucket'] = f"${abs(float(revenue)):.2f}"
                 else:
@@ -868,53 +940,24 @@ class ValueEstimator:
 
     def _get_product_id_from_event(self, event: Dict) -> str:
         """Extract product_id from an event"""
-        try:
-            event_json = json.loads(event['event_json'])
-            return event_json.get('properties', {}).get('product_id', '')
-        except (json.JSONDecodeError, KeyError):
-            return ''
+        return event.get('product_id') or ''
 
     def _get_credited_date_from_db(self, distinct_id: str, product_id: str) -> Optional[str]:
-        """Get credited_date from database for a specific user-product pair"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT credited_date
-                FROM user_product_metrics 
-                WHERE distinct_id = ? AND product_id = ?
-            """, (distinct_id, product_id))
-            
-            row = cursor.fetchone()
-            conn.close()
-            
-            return row[0] if row and row[0] else None
-                
-        except Exception as e:
-            logger.error(f"Error getting credited date for {distinct_id}: {e}")
-            return None
+        """Get credited_date for a specific user-product pair from the batch attributes"""
+        row = self.pair_attributes.get((distinct_id, product_id))
+        return row[0] if row and row[0] else None
 
     def _get_price_bucket_from_database(self, distinct_id: str, product_id: str) -> float:
         """
-        Get price bucket from database where Module 01 stored it.
+        Get price bucket where Module 01 stored it, from the batch attributes.
         Only fallback to calculation if not found in database.
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT price_bucket
-                FROM user_product_metrics 
-                WHERE distinct_id = ? AND product_id = ?
-            """, (distinct_id, product_id))
-            
-            row = cursor.fetchone()
-            conn.close()
+            row = self.pair_attributes.get((distinct_id, product_id))
+            price_bucket = row[1] if row else None
             
-            if row and row[0] is not None and row[0] > 0:
-                return float(row[0])
+            if price_bucket is not None and price_bucket > 0:
+                return float(price_bucket)
             else:
                 # Fallback: calculate if not in database (for the 7,563 missing records)
                 self.error_counts['no_price_bucket_in_database'] += 1
@@ -926,27 +969,18 @@ class ValueEstimator:
 
     def _get_conversion_metrics(self, distinct_id: str, product_id: str) -> Dict[str, float]:
         """
-        Get real conversion metrics from the database for a specific user-product pair.
+        Get real conversion metrics for a specific user-product pair from the batch attributes.
         These should have been calculated by the assign_conversion_rates module.
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT trial_conversion_rate, trial_converted_to_refund_rate, initial_purchase_to_refund_rate, accuracy_score
-                FROM user_product_metrics 
-                WHERE distinct_id = ? AND product_id = ?
-            """, (distinct_id, product_id))
-            
-            row = cursor.fetchone()
-            conn.close()
+            row = self.pair_attributes.get((distinct_id, product_id))
+            rates = row[2:5] if row else None
             
-            if row and row[0] is not None:
+            if rates and rates[0] is not None:
                 return {
-                    'trial_conversion_rate': float(row[0]),
-                    'trial_converted_to_refund_rate': float(row[1]) if row[1] is not None else 0.0,
-                    'initial_purchase_to_refund_rate': float(row[2]) if row[2] is not None else 0.0
+                    'trial_conversion_rate': float(rates[0]),
+                    'trial_converted_to_refund_rate': float(rates[1]) if rates[1] is not None else 0.0,
+                    'initial_purchase_to_refund_rate': float(rates[2]) if rates[2] is not None else 0.0
                 }
             else:
                 # Fallback to default rates if not found
@@ -965,10 +999,15 @@ class ValueEstimator:
                 'initial_purchase_to_refund_rate': 0.40
             }
 
-    def _store_user_product_records(self, records: List[Dict]) -> int:
-        """Update ONLY the value estimation fields: current_status, current_value, value_status"""
+    def _store_user_product_records(self, updates: List[Tuple]) -> int:
+        """
+        Update ONLY the value estimation fields: current_status, current_value, value_status
+        
+        Args:
+            updates: (current_status, current_value, value_status, distinct_id, product_id) tuples
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._get_connection()
             cursor = conn.cursor()
             
             # CRITICAL: Only update the three value estimation fields, preserve all other data
@@ -981,22 +1020,10 @@ class ValueEstimator:
                 WHERE distinct_id = ? AND product_id = ?
             """
             
-            # Prepare data for update - ONLY the three fields we're allowed to modify
-            update_data = []
-            for record in records:
-                update_data.append((
-                    record['current_status'],
-                    record['current_value'],
-                    record['value_status'],
-                    record['distinct_id'],
-                    record['product_id']
-                ))
-            
-            cursor.executemany(update_sql, update_data)
+            cursor.executemany(update_sql, updates)
             conn.commit()
             
             rows_affected = cursor.rowcount
-            conn.close()
             
             return rows_affected
             
@@ -1006,7 +1033,7 @@ class ValueEstimator:
 
     def _get_store_from_database(self, distinct_id: str, product_id: str) -> str:
         """
-        Get store information from user_product_metrics table for platform fee calculation.
+        Get store information for platform fee calculation from the batch attributes.
         
         Args:
             distinct_id: User identifier
@@ -1015,24 +1042,8 @@ class ValueEstimator:
         Returns:
             Store name (APP_STORE, PLAY_STORE, STRIPE, PROMOTIONAL, or empty string if not found)
         """
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT store
-                FROM user_product_metrics 
-                WHERE distinct_id = ? AND product_id = ?
-            """, (distinct_id, product_id))
-            
-            row = cursor.fetchone()
-            conn.close()
-            
-            return row[0] if row and row[0] else ''
-                
-        except Exception as e:
-            logger.error(f"Error getting store for {distinct_id}: {e}")
-            return ''
+        row = self.pair_attributes.get((distinct_id, product_id))
+        return row[5] if row and row[5] else ''
 
     def _apply_platform_fee(self, current_value: float, store: str) -> float:
         """
@@ -1059,6 +1070,16 @@ class ValueEstimator:
             return current_value
 
 
+def _run_value_shard(shard: Dict[str, Any]) -> Tuple[List[Tuple], Dict[str, int], Dict[str, int]]:
+    """
+    Process-pool entry point: estimates values for one user shard.
+    Returns (update tuples, batch statistics, error counts) for the shard.
+    """
+    estimator = ValueEstimator.from_shard(shard)
+    updates, batch_stats = estimator._estimate_users(shard['users'], shard['user_events'])
+    return updates, batch_stats, estimator.error_counts
+
+
 # Additional utility functions for compatibility with the existing codebase
 
 def calculate_credited_date(start_event: Dict) -> Optional[str]:
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Credited Date Benchmark Script
+
+Benchmarks the vectorized credited-date assignment in
+pipelines/pre_processing_pipeline/00_assign_credited_date.py against the
+previous per-group loop, on synthetic user-product pairs (1M by default).
+
+Usage:
+    python scripts/benchmark_credited_dates.py [--pairs 1000000] [--legacy-sample 50000]
+
+The legacy loop is timed on a sample and extrapolated, since running it on
+a million groups takes several minutes on its own.
+"""
+
+import argparse
+import importlib.util
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+MODULE_PATH = PROJECT_ROOT / "pipelines" / "pre_processing_pipeline" / "00_assign_credited_date.py"
+
+PRODUCTS = [
+    'gluten.free.eats.2.monthly',
+    'gluten.free.eats.2.yearly',
+    'gluten.free.eats.3.monthly',
+    'gluten.free.eats.3.yearly',
+]
+
+
+def load_module():
+    """Import the pipeline module (its file name is not a valid identifier)"""
+    spec = importlib.util.spec_from_file_location("assign_credited_date", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.logger.disabled = True
+    return module
+
+
+def make_starter_events(pair_count, seed=42):
+    """Build a starter-event frame with 1-3 events for each of pair_count user-product pairs"""
+    rng = np.random.default_rng(seed)
+    events_per_pair = rng.integers(1, 4, size=pair_count)
+    pair_index = np.repeat(np.arange(pair_count), events_per_pair)
+
+    base = np.datetime64('2025-01-01T00:00:00')
+    offsets = rng.integers(0, 180 * 24 * 3600, size=len(pair_index)).astype('timedelta64[s]')
+    event_times = pd.to_datetime(base + offsets)
+
+    return pd.DataFrame({
+        'distinct_id': pd.Series(pair_index).map(lambda i: f"user_{i // len(PRODUCTS):08d}"),
+        'product_id': [PRODUCTS[i % len(PRODUCTS)] for i in pair_index],
+        'event_time': event_times.strftime('%Y-%m-%dT%H:%M:%S'),
+        'event_name': np.where(rng.random(len(pair_index)) < 0.9, 'RC Trial started', 'RC Initial purchase'),
+        'event_date': event_times.strftime('%Y-%m-%d'),
+    })
+
+
+def legacy_calculate_credited_dates(starter_events_df):
+    """The previous implementation: one sort per user-product group"""
+    credited_dates = {}
+    for (distinct_id, product_id), group in starter_events_df.groupby(['distinct_id', 'product_id']):
+        earliest_event = group.sort_values('event_time').iloc[0]
+        credited_dates[(distinct_id, product_id)] = earliest_event['event_date']
+    return credited_dates
+
+
+def build_metrics_db(path, credited_dates):
+    """Create a user_product_metrics table holding every benchmarked pair"""
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE user_product_metrics (
+            user_product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            distinct_id TEXT NOT NULL,
+            product_id TEXT NOT NULL,
+            credited_date DATE NOT NULL,
+            UNIQUE (distinct_id, product_id)
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO user_product_metrics (distinct_id, product_id, credited_date) VALUES (?, ?, 'PLACEHOLDER_DATE')",
+        credited_dates[['distinct_id', 'product_id']].itertuples(index=False, name=None)
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_update(path, credited_dates, batch_size):
+    """The previous implementation: lookup plus executemany UPDATE per pair"""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    updates = []
+    for distinct_id, product_id, credited_date in credited_dates.itertuples(index=False, name=None):
+        cursor.execute("""
+            SELECT user_product_id FROM user_product_metrics
+            WHERE distinct_id = ? AND product_id = ?
+        """, (distinct_id, product_id))
+        if cursor.fetchone():
+            updates.append((credited_date, distinct_id, product_id))
+    for i in range(0, len(updates), batch_size):
+        cursor.executemany("""
+            UPDATE user_product_metrics
+            SET credited_date = ?
+            WHERE distinct_id = ? AND product_id = ?
+        """, updates[i:i + batch_size])
+    conn.commit()
+    conn.close()
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<45} {elapsed:8.2f}s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark credited date assignment")
+    parser.add_argument('--pairs', type=int, default=1_000_000, help='Synthetic user-product pairs')
+    parser.add_argument('--legacy-sample', type=int, default=50_000, help='Pairs used to time the legacy loop')
+    args = parser.parse_args()
+
+    module = load_module()
+
+    print(f"📊 Generating starter events for {args.pairs:,} user-product pairs...")
+    events = make_starter_events(args.pairs)
+    print(f"   {len(events):,} starter events")
+
+    print("\n🔄 Credited date calculation")
+    credited, vectorized_time = timed("vectorized (sort + drop_duplicates)", module.calculate_credited_dates, events)
+
+    sample_pairs = events[['distinct_id', 'product_id']].drop_duplicates().head(args.legacy_sample)
+    sample = events.merge(sample_pairs, on=['distinct_id', 'product_id'])
+    legacy_result, legacy_time = timed(f"legacy groupby loop ({len(sample_pairs):,} pairs)", legacy_calculate_credited_dates, sample)
+    legacy_estimate = legacy_time * args.pairs / max(len(sample_pairs), 1)
+    print(f"  {'legacy groupby loop (extrapolated)':<45} {legacy_estimate:8.2f}s")
+
+    # Same earliest dates on the sample
+    vectorized_sample = credited.merge(sample_pairs, on=['distinct_id', 'product_id'])
+    vectorized_dict = {
+        (d, p): c for d, p, c in vectorized_sample.itertuples(index=False, name=None)
+    }
+    print(f"  results identical on sample: {vectorized_dict == legacy_result}")
+
+    print("\n💾 Database update")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        build_metrics_db(db_path, credited)
+        timed("temp table + UPDATE ... FROM join", module.update_credited_dates_in_db, credited, db_path)
+
+        sample_credited = credited.head(args.legacy_sample)
+        _, legacy_update_time = timed(f"legacy per-row UPDATE ({len(sample_credited):,} pairs)",
+                                      legacy_update, db_path, sample_credited, module.BATCH_SIZE)
+        print(f"  {'legacy per-row UPDATE (extrapolated)':<45} "
+              f"{legacy_update_time * len(credited) / max(len(sample_credited), 1):8.2f}s")
+
+    print(f"\n✅ Vectorized calculation speedup: {legacy_estimate / max(vectorized_time, 1e-9):.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,10 +9,14 @@ Created: 2024
 """
 
 import os
+import re
+import json
+import zlib
 import sqlite3
 import logging
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
@@ -419,6 +423,630 @@ def reset_database_manager():
     _db_manager = None
 
 
+# Bulk-load bookkeeping lives in the interrupted_pipelines table (see database/schema.sql).
+# A checkpoint row is written *before* any index is dropped and stays 'interrupted' until the
+# indexes have been rebuilt, so a crashed bulk load can always be resumed or rolled back.
+BULK_LOAD_CHECKPOINT_DDL = """
+CREATE TABLE IF NOT EXISTS interrupted_pipelines (
+    pipeline_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pipeline_name TEXT NOT NULL,
+    interruption_time DATETIME NOT NULL,
+    last_processed_record TEXT,
+    recovery_checkpoint TEXT,
+    status TEXT
+)
+"""
+
+
+def get_pending_bulk_load(conn: sqlite3.Connection, pipeline_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the unfinished bulk-load checkpoint for a pipeline, if any.
+    
+    Args:
+        conn: SQLite connection to the database being bulk loaded
+        pipeline_name: Bookkeeping key of the bulk load (e.g. 'ingest_data_bulk_load')
+        
+    Returns:
+        Checkpoint dict with 'pipeline_id', 'deferred_indexes', 'loaded_records' and
+        'last_processed_record', or None when no bulk load is pending
+    """
+    conn.execute(BULK_LOAD_CHECKPOINT_DDL)
+    row = conn.execute(
+        """
+        SELECT pipeline_id, last_processed_record, recovery_checkpoint
+        FROM interrupted_pipelines
+        WHERE pipeline_name = ? AND status IN ('interrupted', 'recovering')
+        ORDER BY pipeline_id DESC
+        LIMIT 1
+        """,
+        (pipeline_name,)
+    ).fetchone()
+    
+    if not row:
+        return None
+    
+    checkpoint = json.loads(row[2]) if row[2] else {}
+    return {
+        'pipeline_id': row[0],
+        'last_processed_record': row[1],
+        'deferred_indexes': checkpoint.get('deferred_indexes', []),
+        'loaded_records': checkpoint.get('loaded_records', [])
+    }
+
+
+def begin_bulk_load(conn: sqlite3.Connection, pipeline_name: str, tables: List[str],
+                    exclusive: bool = True) -> Dict[str, Any]:
+    """
+    Put a connection into bulk-load mode.
+    
+    Non-unique secondary indexes on the given tables are recorded in a checkpoint row and
+    dropped in the same transaction, then the connection switches to synchronous=OFF (and,
+    if exclusive, to an exclusive lock). If a previous bulk load for the same pipeline was
+    interrupted, its checkpoint is resumed instead (its indexes are already gone); one that
+    crashed while rebuilding indexes goes back to 'interrupted' so progress is recorded again.
+    
+    Args:
+        conn: SQLite connection to the database being bulk loaded
+        pipeline_name: Bookkeeping key of the bulk load
+        tables: Tables whose non-unique indexes should be deferred
+        exclusive: Hold an exclusive lock until finish_bulk_load. Leave off when the load
+            is interleaved with slow work (e.g. network fetches) and readers must not be
+            locked out meanwhile
+        
+    Returns:
+        The active checkpoint (see get_pending_bulk_load)
+    """
+    pending = get_pending_bulk_load(conn, pipeline_name)
+    
+    if pending:
+        logger.info(f"Resuming interrupted bulk load '{pipeline_name}' "
+                    f"({len(pending['loaded_records'])} records already committed)")
+        conn.execute(
+            "UPDATE interrupted_pipelines SET status = 'interrupted' WHERE pipeline_id = ? AND status = 'recovering'",
+            (pending['pipeline_id'],)
+        )
+        conn.commit()
+    else:
+        deferred_indexes = []
+        for table in tables:
+            for _, index_name, is_unique, origin, _ in conn.execute(f"PRAGMA index_list([{table}])").fetchall():
+                # Only indexes created with CREATE INDEX; keep UNIQUE/PRIMARY KEY for conflict handling
+                if is_unique or origin != 'c':
+                    continue
+                index_sql = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,)
+                ).fetchone()[0]
+                deferred_indexes.append({'name': index_name, 'table': table, 'sql': index_sql})
+        
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                """
+                INSERT INTO interrupted_pipelines
+                (pipeline_name, interruption_time, last_processed_record, recovery_checkpoint, status)
+                VALUES (?, ?, NULL, ?, 'interrupted')
+                """,
+                (pipeline_name, datetime.now().isoformat(),
+                 json.dumps({'deferred_indexes': deferred_indexes, 'loaded_records': []}))
+            )
+            for index in deferred_indexes:
+                cursor.execute(f"DROP INDEX IF EXISTS [{index['name']}]")
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        
+        logger.info(f"Bulk load '{pipeline_name}' started: deferred {len(deferred_indexes)} indexes on {', '.join(tables)}")
+        pending = get_pending_bulk_load(conn, pipeline_name)
+    
+    conn.execute("PRAGMA synchronous = OFF")
+    if exclusive:
+        conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+    return pending
+
+
+def record_bulk_load_progress(cursor: sqlite3.Cursor, pipeline_name: str, record: str):
+    """
+    Record a committed unit of work (e.g. an event date) on the active bulk-load checkpoint.
+    
+    Call inside the same transaction that writes the unit's data so the checkpoint and the
+    data always agree after a crash.
+    """
+    row = cursor.execute(
+        """
+        SELECT pipeline_id, recovery_checkpoint FROM interrupted_pipelines
+        WHERE pipeline_name = ? AND status = 'interrupted'
+        ORDER BY pipeline_id DESC LIMIT 1
+        """,
+        (pipeline_name,)
+    ).fetchone()
+    if not row:
+        return
+    
+    checkpoint = json.loads(row[1]) if row[1] else {}
+    loaded_records = checkpoint.setdefault('loaded_records', [])
+    if record not in loaded_records:
+        loaded_records.append(record)
+    
+    cursor.execute(
+        "UPDATE interrupted_pipelines SET last_processed_record = ?, recovery_checkpoint = ? WHERE pipeline_id = ?",
+        (record, json.dumps(checkpoint), row[0])
+    )
+
+
+def finish_bulk_load(conn: sqlite3.Connection, pipeline_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Leave bulk-load mode: rebuild deferred indexes, run ANALYZE and restore normal pragmas.
+    
+    Safe to call when no bulk load is pending (only the pragmas are restored). Also used to
+    recover indexes after an interrupted bulk load that will not be resumed.
+    
+    Returns:
+        The checkpoint that was completed, or None if nothing was pending
+    """
+    pending = get_pending_bulk_load(conn, pipeline_name)
+    
+    if pending:
+        conn.execute(
+            "UPDATE interrupted_pipelines SET status = 'recovering' WHERE pipeline_id = ?",
+            (pending['pipeline_id'],)
+        )
+        conn.commit()
+        
+        logger.info(f"Rebuilding {len(pending['deferred_indexes'])} deferred indexes for '{pipeline_name}'...")
+        for index in pending['deferred_indexes']:
+            index_sql = index['sql']
+            if 'IF NOT EXISTS' not in index_sql.upper():
+                index_sql = index_sql.replace('CREATE INDEX ', 'CREATE INDEX IF NOT EXISTS ', 1)
+            conn.execute(index_sql)
+        conn.commit()
+        
+        conn.execute("ANALYZE")
+        conn.execute(
+            "UPDATE interrupted_pipelines SET status = 'recovered' WHERE pipeline_id = ?",
+            (pending['pipeline_id'],)
+        )
+        conn.commit()
+        logger.info(f"Bulk load '{pipeline_name}' finalized")
+    
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA locking_mode = NORMAL")
+    # The exclusive lock is only released by the next access after switching modes
+    conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+    
+    return pending
+
+
+# Full Mixpanel event payloads live zlib-compressed in mixpanel_event_payload so that
+# mixpanel_event rows stay narrow; payloads are only decompressed when explicitly requested.
+EVENT_PAYLOAD_COMPRESSION_LEVEL = 6
+EVENT_PAYLOAD_LOOKUP_BATCH_SIZE = 500
+
+
+def compress_event_payload(event_json: str) -> bytes:
+    """Compress a raw event JSON string for mixpanel_event_payload.payload"""
+    return zlib.compress(event_json.encode('utf-8'), EVENT_PAYLOAD_COMPRESSION_LEVEL)
+
+
+def decompress_event_payload(payload: Optional[bytes]) -> Optional[str]:
+    """Decompress a mixpanel_event_payload.payload value back to the raw event JSON string"""
+    if payload is None:
+        return None
+    return zlib.decompress(payload).decode('utf-8')
+
+
+def get_event_payloads(conn: sqlite3.Connection, event_uuids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Load and decode the full Mixpanel payloads for specific events.
+    
+    Args:
+        conn: Connection to the mixpanel_data database
+        event_uuids: Events to load (missing or undecodable payloads are left out)
+        
+    Returns:
+        Dictionary mapping event_uuid to the parsed event payload
+    """
+    payloads = {}
+    unique_uuids = list(dict.fromkeys(event_uuids))
+    
+    for i in range(0, len(unique_uuids), EVENT_PAYLOAD_LOOKUP_BATCH_SIZE):
+        batch = unique_uuids[i:i + EVENT_PAYLOAD_LOOKUP_BATCH_SIZE]
+        placeholders = ','.join('?' for _ in batch)
+        rows = conn.execute(
+            f"SELECT event_uuid, payload FROM mixpanel_event_payload WHERE event_uuid IN ({placeholders})",
+            batch
+        ).fetchall()
+        
+        for event_uuid, payload in rows:
+            try:
+                payloads[event_uuid] = json.loads(decompress_event_payload(payload))
+            except (zlib.error, json.JSONDecodeError, UnicodeDecodeError) as e:
+                logger.warning(f"Could not decode payload for event {event_uuid}: {e}")
+    
+    return payloads
+
+
+def register_event_payload_functions(conn: sqlite3.Connection):
+    """
+    Register an event_payload(payload) SQL function on a connection so ad-hoc queries can read
+    compressed payloads, e.g. JSON_EXTRACT(event_payload(p.payload), '$.properties.store').
+    """
+    conn.create_function('event_payload', 1, decompress_event_payload, deterministic=True)
+
+
+# Dirty-set ledger (see database/schema.sql): user-product pairs whose pre-processing outputs
+# (credited date, price bucket, rates, value) may be stale. Ingest marks the pairs of events it
+# writes or deletes, lifecycle validation marks every relationship it (re)writes, and the
+# pre-processing run itself marks pairs whose time-dependent value phase can have moved since its
+# last success. Incremental pre-processing works only on the marked pairs and clears the entries
+# it covered once 03_estimate_values finishes.
+DIRTY_PAIRS_DDL = """
+CREATE TABLE IF NOT EXISTS dirty_user_products (
+    distinct_id TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    reason TEXT,
+    marked_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (distinct_id, product_id)
+)
+"""
+
+PRE_PROCESSING_JOB_NAME = 'pre_processing_pipeline'
+
+# A pair's value phase, status and the rates it uses stop depending on the calendar 38 days after
+# its latest starter event (or its conversion-fallback credited date); one extra day covers
+# timezone differences between runs
+VALUE_SETTLEMENT_DAYS = 39
+
+
+def ensure_dirty_pairs_table(cursor: Union[sqlite3.Connection, sqlite3.Cursor]):
+    """Create the dirty-set ledger on databases set up before it existed"""
+    cursor.execute(DIRTY_PAIRS_DDL)
+
+
+def mark_dirty_pairs(cursor: sqlite3.Cursor, pairs, reason: str, refresh: bool = True) -> None:
+    """
+    Add (distinct_id, product_id) pairs to the dirty-set ledger (caller commits).
+    
+    Re-marking a pair refreshes its reason and marked_at unless refresh is False, in which case
+    pairs already in the ledger keep their entry. Pairs without a product_id are skipped since
+    pre-processing works per product.
+    """
+    unique_pairs = {(distinct_id, product_id) for distinct_id, product_id in pairs if distinct_id and product_id}
+    if not unique_pairs:
+        return
+    ensure_dirty_pairs_table(cursor)
+    conflict_action = "UPDATE SET reason = excluded.reason, marked_at = excluded.marked_at" if refresh else "NOTHING"
+    cursor.executemany(
+        f"""
+        INSERT INTO dirty_user_products (distinct_id, product_id, reason, marked_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(distinct_id, product_id) DO {conflict_action}
+        """,
+        ((distinct_id, product_id, reason) for distinct_id, product_id in sorted(unique_pairs))
+    )
+
+
+def mark_dirty_pairs_from_query(cursor: sqlite3.Cursor, pair_query: str, params: Tuple = (), reason: str = '') -> int:
+    """
+    Add the (distinct_id, product_id) rows selected by pair_query to the dirty-set ledger
+    in one INSERT ... SELECT (caller commits).
+    
+    Returns:
+        Number of ledger rows inserted or refreshed
+    """
+    ensure_dirty_pairs_table(cursor)
+    cursor.execute(
+        f"""
+        INSERT INTO dirty_user_products (distinct_id, product_id, reason, marked_at)
+        SELECT pairs.distinct_id, pairs.product_id, ?, CURRENT_TIMESTAMP
+        FROM ({pair_query}) pairs
+        WHERE pairs.distinct_id IS NOT NULL AND pairs.product_id IS NOT NULL AND pairs.product_id != ''
+        ON CONFLICT(distinct_id, product_id) DO UPDATE SET
+            reason = excluded.reason,
+            marked_at = excluded.marked_at
+        """,
+        (reason,) + tuple(params)
+    )
+    return cursor.rowcount
+
+
+def begin_pre_processing_run(conn: sqlite3.Connection, requested_mode: str) -> str:
+    """
+    Open a pre-processing run (called by 00_assign_credited_date).
+    
+    In incremental mode, pairs whose value phase can have moved since the last successful run
+    are added to the ledger first. The run start is recorded after that, so everything marked
+    up to that point is cleared when the run completes. Incremental mode falls back to full
+    when no run has completed yet.
+    
+    Returns:
+        The effective mode ('full' or 'incremental'), which steps 01-03 read back through
+        get_pre_processing_run_mode
+    """
+    cursor = conn.cursor()
+    ensure_dirty_pairs_table(cursor)
+    
+    last_success = None
+    row = cursor.execute(
+        "SELECT last_success_timestamp FROM etl_job_control WHERE job_name = ?",
+        (PRE_PROCESSING_JOB_NAME,)
+    ).fetchone()
+    if row:
+        last_success = row[0]
+    
+    mode = 'incremental' if requested_mode == 'incremental' and last_success else 'full'
+    if requested_mode == 'incremental' and mode == 'full':
+        logger.info("No previous successful pre-processing run recorded - running full")
+    
+    if mode == 'incremental':
+        shifted = mark_dirty_pairs_from_query(
+            cursor,
+            f"""
+            SELECT DISTINCT e.distinct_id, e.product_id
+            FROM mixpanel_event e
+            WHERE e.event_date >= date(?, '-{VALUE_SETTLEMENT_DAYS} days')
+              AND e.event_name IN ('RC Trial started', 'RC Initial purchase', 'RC Trial converted')
+            """,
+            (last_success,),
+            'value_window'
+        )
+        logger.info(f"Marked {shifted:,} pairs whose value window is still open since {last_success}")
+    
+    cursor.execute(
+        """
+        INSERT INTO etl_job_control (job_name, last_run_timestamp, status, error_message)
+        VALUES (?, CURRENT_TIMESTAMP, ?, NULL)
+        ON CONFLICT(job_name) DO UPDATE SET
+            last_run_timestamp = excluded.last_run_timestamp,
+            status = excluded.status,
+            error_message = NULL
+        """,
+        (PRE_PROCESSING_JOB_NAME, f'running_{mode}')
+    )
+    conn.commit()
+    
+    dirty_count = cursor.execute("SELECT COUNT(*) FROM dirty_user_products").fetchone()[0]
+    logger.info(f"Pre-processing run started in {mode} mode ({dirty_count:,} dirty pairs in ledger)")
+    return mode
+
+
+def get_pre_processing_run_mode(conn: sqlite3.Connection, requested_mode: str) -> str:
+    """
+    Mode for steps 01-03: incremental only when requested and the open run (started by
+    00_assign_credited_date) is incremental, so a step never narrows a run that began full.
+    """
+    if requested_mode != 'incremental':
+        return 'full'
+    ensure_dirty_pairs_table(conn)
+    row = conn.execute(
+        "SELECT status FROM etl_job_control WHERE job_name = ?", (PRE_PROCESSING_JOB_NAME,)
+    ).fetchone()
+    return 'incremental' if row and row[0] == 'running_incremental' else 'full'
+
+
+def complete_pre_processing_run(conn: sqlite3.Connection) -> int:
+    """
+    Close the open pre-processing run (called by 03_estimate_values after a successful pass).
+    
+    Clears ledger entries marked up to the run start, plus the 'rate_changed' entries that
+    02_assign_conversion_rates added during this run (03 has re-valued them by now), and
+    records the run start as the last success, which the next incremental run measures its
+    value window from.
+    
+    Returns:
+        Number of ledger entries cleared
+    """
+    cursor = conn.cursor()
+    ensure_dirty_pairs_table(cursor)
+    row = cursor.execute(
+        "SELECT last_run_timestamp FROM etl_job_control WHERE job_name = ?", (PRE_PROCESSING_JOB_NAME,)
+    ).fetchone()
+    if not row or not row[0]:
+        return 0
+    
+    run_started_at = row[0]
+    cursor.execute(
+        "DELETE FROM dirty_user_products WHERE marked_at <= ? OR reason = 'rate_changed'",
+        (run_started_at,)
+    )
+    cleared = cursor.rowcount
+    cursor.execute(
+        """
+        UPDATE etl_job_control
+        SET status = 'success', last_success_timestamp = last_run_timestamp, error_message = NULL
+        WHERE job_name = ?
+        """,
+        (PRE_PROCESSING_JOB_NAME,)
+    )
+    conn.commit()
+    return cleared
+
+
+def stage_dirty_pairs(cursor: sqlite3.Cursor, table_name: str = 'temp_dirty_pairs') -> int:
+    """
+    Copy the ledger into a keyed temp table that incremental steps join against.
+    
+    Returns:
+        Number of dirty pairs staged
+    """
+    ensure_dirty_pairs_table(cursor)
+    cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+    cursor.execute(f"""
+        CREATE TEMP TABLE {table_name} (
+            distinct_id TEXT NOT NULL,
+            product_id TEXT NOT NULL,
+            PRIMARY KEY (distinct_id, product_id)
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO {table_name} (distinct_id, product_id)
+        SELECT distinct_id, product_id FROM dirty_user_products ORDER BY distinct_id, product_id
+    """)
+    return cursor.rowcount
+
+
+# Precomputed dashboard tables (daily_mixpanel_metrics, id_name_mapping, id_hierarchy_mapping)
+# are rebuilt into a shadow copy and swapped in with renames inside one transaction, so readers
+# only ever see the previous or the new contents. Each swap publishes a new version number,
+# increasing across all tables, that caches can key on.
+DATA_VERSION_DDL = """
+CREATE TABLE IF NOT EXISTS precomputed_data_version (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    published_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+SHADOW_SUFFIX = '__shadow'
+SHADOW_INDEX_SUFFIX = '__build'
+RETIRED_SUFFIX = '__retired'
+
+
+def _canonical_index_name(index_name: str) -> str:
+    """
+    Name an index has on the live table. Shadow indexes carry a build-only suffix until the
+    swap, and databases built before that may still have '__shadow'-suffixed live indexes.
+    """
+    for suffix in (SHADOW_INDEX_SUFFIX, SHADOW_SUFFIX):
+        if index_name.endswith(suffix):
+            return index_name[:-len(suffix)]
+    return index_name
+
+
+def _rename_index_sql(index_sql: str, index_name: str, new_index_name: str, table_name: str) -> str:
+    """Rewrite a CREATE INDEX statement to create new_index_name on table_name"""
+    return re.sub(
+        rf'^CREATE (UNIQUE )?INDEX\s+(?:IF NOT EXISTS\s+)?["`\[]?{index_name}["`\]]?\s+ON\s+["`\[]?\w+["`\]]?',
+        lambda match: f"CREATE {match.group(1) or ''}INDEX {new_index_name} ON {table_name}",
+        index_sql, count=1, flags=re.IGNORECASE
+    )
+
+
+def create_shadow_table(conn: sqlite3.Connection, table_name: str) -> str:
+    """
+    Create an empty copy of table_name (same columns, constraints and indexes) to build into.
+    
+    A shadow left behind by an interrupted build is dropped first. The shadow's indexes use
+    build-only names that never exist on the live table, so schema.sql keeps matching the
+    live table and nothing here touches its indexes.
+    
+    Returns:
+        Name of the shadow table
+    """
+    shadow_name = table_name + SHADOW_SUFFIX
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {shadow_name}")
+    
+    row = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone()
+    if not row:
+        raise RuntimeError(f"Table '{table_name}' not found - run database setup first")
+    table_sql = re.sub(
+        rf'^CREATE TABLE\s+(?:IF NOT EXISTS\s+)?["`\[]?{table_name}["`\]]?',
+        f'CREATE TABLE {shadow_name}', row[0], count=1, flags=re.IGNORECASE
+    )
+    cursor.execute(table_sql)
+    
+    index_rows = cursor.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL "
+        "ORDER BY name",
+        (table_name,)
+    ).fetchall()
+    built = set()
+    for index_name, index_sql in index_rows:
+        canonical_name = _canonical_index_name(index_name)
+        if canonical_name in built:
+            continue  # duplicate left on the live table by an older build
+        built.add(canonical_name)
+        build_index = canonical_name + SHADOW_INDEX_SUFFIX
+        cursor.execute(f"DROP INDEX IF EXISTS {build_index}")
+        cursor.execute(_rename_index_sql(index_sql, index_name, build_index, shadow_name))
+    return shadow_name
+
+
+def swap_shadow_table(conn: sqlite3.Connection, table_name: str) -> int:
+    """
+    Swap the shadow built by create_shadow_table in for table_name and publish a new data version.
+    
+    The renames and the version bump run in the caller's open transaction (one is started if
+    none is), so they become visible together when the caller commits. The shadow's build-only
+    indexes are recreated under their schema.sql names in the same transaction. References to
+    table_name in views and triggers are left as written and follow the new table.
+    
+    Returns:
+        The published data version
+    """
+    shadow_name = table_name + SHADOW_SUFFIX
+    retired_name = table_name + RETIRED_SUFFIX
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    cursor = conn.cursor()
+    cursor.execute(DATA_VERSION_DDL)
+    cursor.execute(f"DROP TABLE IF EXISTS {retired_name}")
+    
+    cursor.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        cursor.execute(f"ALTER TABLE {table_name} RENAME TO {retired_name}")
+        cursor.execute(f"ALTER TABLE {shadow_name} RENAME TO {table_name}")
+    finally:
+        cursor.execute("PRAGMA legacy_alter_table = OFF")
+    cursor.execute(f"DROP TABLE {retired_name}")
+    
+    # The retired table took the canonical index names with it; give them to the new table
+    index_rows = cursor.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table_name,)
+    ).fetchall()
+    for index_name, index_sql in index_rows:
+        if not index_name.endswith(SHADOW_INDEX_SUFFIX):
+            continue
+        cursor.execute(f"DROP INDEX {index_name}")
+        cursor.execute(_rename_index_sql(index_sql, index_name, _canonical_index_name(index_name), table_name))
+    
+    return publish_data_version(cursor, table_name)
+
+
+def publish_data_version(cursor: sqlite3.Cursor, table_name: str) -> int:
+    """
+    Record that table_name has new contents (caller commits).
+    
+    Returns:
+        The new version: one more than the highest version of any table
+    """
+    cursor.execute(DATA_VERSION_DDL)
+    cursor.execute("""
+        INSERT INTO precomputed_data_version (table_name, version, published_at)
+        VALUES (?, (SELECT COALESCE(MAX(version), 0) + 1 FROM precomputed_data_version), CURRENT_TIMESTAMP)
+        ON CONFLICT(table_name) DO UPDATE SET
+            version = excluded.version,
+            published_at = excluded.published_at
+    """, (table_name,))
+    return cursor.execute(
+        "SELECT version FROM precomputed_data_version WHERE table_name = ?", (table_name,)
+    ).fetchone()[0]
+
+
+def get_data_version(conn: sqlite3.Connection, table_name: Optional[str] = None) -> int:
+    """
+    Current data version of one precomputed table, or of all of them when table_name is None
+    (0 if nothing has been published yet)
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'precomputed_data_version'"
+    ).fetchone()
+    if not exists:
+        return 0
+    if table_name is None:
+        row = conn.execute("SELECT MAX(version) FROM precomputed_data_version").fetchone()
+    else:
+        row = conn.execute(
+            "SELECT version FROM precomputed_data_version WHERE table_name = ?", (table_name,)
+        ).fetchone()
+    return row[0] if row and row[0] is not None else 0
+
+
 # Export commonly used functions
 __all__ = [
     'DatabaseManager',
@@ -426,5 +1054,24 @@ __all__ = [
     'get_database_manager',
     'get_database_path',
     'get_database_connection',
-    'reset_database_manager'
+    'reset_database_manager',
+    'get_pending_bulk_load',
+    'begin_bulk_load',
+    'record_bulk_load_progress',
+    'finish_bulk_load',
+    'compress_event_payload',
+    'decompress_event_payload',
+    'get_event_payloads',
+    'register_event_payload_functions',
+    'ensure_dirty_pairs_table',
+    'mark_dirty_pairs',
+    'mark_dirty_pairs_from_query',
+    'begin_pre_processing_run',
+    'get_pre_processing_run_mode',
+    'complete_pre_processing_run',
+    'stage_dirty_pairs',
+    'create_shadow_table',
+    'swap_shadow_table',
+    'publish_data_version',
+    'get_data_version'
 ] 
\ No newline at end of file
@@ -0,0 +1,325 @@
+"""
+Pricing Rule Engine Module
+
+Compiled, cached view of data/pricing_rules/pricing_rules.json shared by the
+value estimation pipeline and the /api/pricing endpoints.
+
+The JSON is compiled once into per-(product_id, country) sorted start-date
+arrays so a price lookup is a bisect instead of a sort plus linear scan.
+The compiled form is versioned by the file's content hash: refresh() re-stats
+the file and recompiles only when the mtime/size changed and the content hash
+differs, and every rule edit made through the engine rewrites the file and
+recompiles in the same step.
+"""
+
+import os
+import copy
+import json
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+from bisect import bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = Path(__file__).resolve().parent.parent / "data" / "pricing_rules" / "pricing_rules.json"
+
+# Country key whose rules apply when a country has no matching rule of its own
+FALLBACK_COUNTRY = 'ALL'
+
+
+class PricingRuleEngine:
+    """
+    Loads, compiles and edits pricing rules.
+
+    The file keeps two views of the same rules: the flat 'rules' list edited
+    through the API, and the 'products' view (product -> country -> rules,
+    newest start_date first) that price lookups read. Edits update the flat
+    list and rebuild the affected product's view from it.
+    """
+
+    def __init__(self, rules_path: Optional[Union[str, Path]] = None):
+        self.rules_path = Path(rules_path) if rules_path else DEFAULT_RULES_PATH
+        self.version = None
+        self._data = {'products': {}}
+        self._index: Dict[Tuple[str, str], Tuple[List[str], List[float]]] = {}
+        self._stat_key = None
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled; process-pool workers get their own
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Loading and compilation
+    # ------------------------------------------------------------------
+
+    def refresh(self) -> str:
+        """
+        Recompile if the rules file changed since the last load.
+
+        Returns:
+            The current version (content hash), or None if no rules file exists
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self.rules_path)
+            except FileNotFoundError:
+                if self._stat_key != 'missing':
+                    logger.warning(f"Pricing rules file not found at {self.rules_path}")
+                    self._install({'products': {}}, None)
+                    self._stat_key = 'missing'
+                return self.version
+
+            stat_key = (stat.st_mtime_ns, stat.st_size)
+            if stat_key == self._stat_key:
+                return self.version
+
+            with open(self.rules_path, 'rb') as f:
+                raw = f.read()
+            version = hashlib.sha256(raw).hexdigest()[:16]
+            if version != self.version:
+                self._install(json.loads(raw), version)
+                logger.info(f"Compiled pricing rules version {version} "
+                            f"({len(self._data.get('products', {}))} products)")
+            self._stat_key = stat_key
+            return self.version
+
+    def _install(self, data: Dict[str, Any], version: Optional[str]) -> None:
+        """Swap in new rule data and its compiled index"""
+        self._index = self._compile(data)
+        self._data = data
+        self.version = version
+
+    @staticmethod
+    def _compile(data: Dict[str, Any]) -> Dict[Tuple[str, str], Tuple[List[str], List[float]]]:
+        """
+        Build {(product_id, country): (ascending start dates, prices)} from the products view.
+
+        Of several rules sharing a start_date, the one listed first wins, as it
+        did when each lookup sorted the list newest-first.
+        """
+        index = {}
+        for product_id, countries in data.get('products', {}).items():
+            for country, country_rules in countries.items():
+                start_dates = []
+                prices = []
+                for rule in sorted(country_rules['rules'], key=lambda r: r['start_date']):
+                    if start_dates and start_dates[-1] == rule['start_date']:
+                        continue
+                    start_dates.append(rule['start_date'])
+                    prices.append(rule['price_usd'])
+                index[(product_id, country)] = (start_dates, prices)
+        return index
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def get_active_price(self, product_id: str, country: str, trial_date: str) -> Optional[float]:
+        """
+        Find active price for product/country on specific date.
+        Rules with later start_date override earlier ones, even if end_date is null.
+        Country-specific rules are tried first, then 'ALL'.
+
+        Does not re-stat the rules file; call refresh() to pick up edits.
+        """
+        for country_key in (country, FALLBACK_COUNTRY):
+            compiled = self._index.get((product_id, country_key))
+            if not compiled:
+                continue
+            start_dates, prices = compiled
+            position = bisect_right(start_dates, trial_date)
+            if position:
+                return prices[position - 1]
+        return None
+
+    def get_rules_data(self) -> Dict[str, Any]:
+        """Current rules file contents (refreshed); treat as read-only"""
+        with self._lock:
+            self.refresh()
+            return self._data
+
+    def product_count(self) -> int:
+        return len(self._data.get('products', {}))
+
+    # ------------------------------------------------------------------
+    # Edits
+    # ------------------------------------------------------------------
+
+    def create_rule(self, product_id: str, price_usd: float, start_date: str, countries: List[str],
+                    notes: str = '', user: str = 'api_user') -> Dict[str, Any]:
+        """Add a rule, rebuild its product's view and persist"""
+        rule = {
+            'rule_id': uuid.uuid4().hex[:8],
+            'product_id': product_id,
+            'countries': list(countries),
+            'price_usd': float(price_usd),
+            'start_date': start_date,
+            'created_at': datetime.now().isoformat(),
+            'notes': notes or ''
+        }
+        self._validate_rule(rule)
+
+        with self._lock:
+            data = self._editable_copy()
+            data.setdefault('rules', []).append(rule)
+            self._record_history(data, rule, 'created', f"Rule created by {user}")
+            self._save(data, [product_id], user)
+        return rule
+
+    def update_rule(self, rule_id: str, changes: Dict[str, Any], user: str = 'api_user') -> Optional[Dict[str, Any]]:
+        """
+        Apply changes (product_id, price_usd, start_date, countries, notes) to a rule.
+
+        Returns:
+            The updated rule, or None if no rule has that rule_id
+        """
+        with self._lock:
+            data = self._editable_copy()
+            rule = next((r for r in data.get('rules', []) if r['rule_id'] == rule_id), None)
+            if rule is None:
+                return None
+
+            previous_product = rule['product_id']
+            previous_price = rule['price_usd']
+            for field in ('product_id', 'price_usd', 'start_date', 'countries', 'notes'):
+                if field in changes and changes[field] is not None:
+                    rule[field] = changes[field]
+            rule['price_usd'] = float(rule['price_usd'])
+            rule['countries'] = list(rule['countries'])
+            self._validate_rule(rule)
+
+            self._record_history(data, rule, 'updated', f"Rule updated by {user} (was: ${previous_price})")
+            if previous_product != rule['product_id']:
+                # Keep the old product's history complete: it lost this rule
+                self._record_history(data, rule, 'updated',
+                                     f"Rule moved to {rule['product_id']} by {user} (was: ${previous_price})",
+                                     product_id=previous_product)
+            self._save(data, {previous_product, rule['product_id']}, user)
+            return rule
+
+    def delete_rule(self, rule_id: str, user: str = 'api_user') -> bool:
+        """Remove a rule; returns False if no rule has that rule_id"""
+        with self._lock:
+            data = self._editable_copy()
+            rules = data.get('rules', [])
+            rule = next((r for r in rules if r['rule_id'] == rule_id), None)
+            if rule is None:
+                return False
+
+            rules.remove(rule)
+            self._record_history(data, rule, 'deleted', f"Rule hard deleted by {user}")
+            self._save(data, [rule['product_id']], user)
+            return True
+
+    def _editable_copy(self) -> Dict[str, Any]:
+        """Deep copy of the freshest rule data, so a failed edit leaves the cache untouched"""
+        self.refresh()
+        return copy.deepcopy(self._data)
+
+    @staticmethod
+    def _validate_rule(rule: Dict[str, Any]) -> None:
+        if not rule['product_id']:
+            raise ValueError("product_id is required")
+        if not rule['countries']:
+            raise ValueError("At least one country is required")
+        if rule['price_usd'] < 0:
+            raise ValueError("price_usd must not be negative")
+        try:
+            datetime.strptime(rule['start_date'], '%Y-%m-%d')
+        except (TypeError, ValueError):
+            raise ValueError("start_date must be YYYY-MM-DD")
+
+    @staticmethod
+    def _record_history(data: Dict[str, Any], rule: Dict[str, Any], action: str, user_notes: str,
+                        product_id: Optional[str] = None) -> None:
+        data.setdefault('rule_history', {}).setdefault(product_id or rule['product_id'], []).append({
+            'entry_id': uuid.uuid4().hex[:8],
+            'action': action,
+            'rule_data': copy.deepcopy(rule),
+            'timestamp': datetime.now().isoformat(),
+            'user_notes': user_notes
+        })
+
+    @staticmethod
+    def _rebuild_product_view(data: Dict[str, Any], product_id: str) -> None:
+        """Regenerate products[product_id] from the flat rule list"""
+        countries = {}
+        for rule in data.get('rules', []):
+            if rule['product_id'] != product_id:
+                continue
+            for country in rule['countries']:
+                countries.setdefault(country, []).append({
+                    'start_date': rule['start_date'],
+                    'end_date': None,
+                    'price_usd': rule['price_usd'],
+                    'rule_id': rule['rule_id'],
+                    'notes': f"Applied from user rule {rule['rule_id']}",
+                    'created_at': rule['created_at']
+                })
+
+        products = data.setdefault('products', {})
+        if not countries:
+            products.pop(product_id, None)
+            return
+        products[product_id] = {
+            country: {
+                'rules': sorted(country_rules, key=lambda r: r['start_date'], reverse=True),
+                'last_rule_update': max(r['start_date'] for r in country_rules)
+            }
+            for country, country_rules in countries.items()
+        }
+
+    def _save(self, data: Dict[str, Any], product_ids, user: str) -> None:
+        """Rebuild the touched product views, write the file atomically and recompile"""
+        for product_id in product_ids:
+            self._rebuild_product_view(data, product_id)
+        data['last_updated'] = datetime.now().isoformat()
+        data['last_updated_by'] = user
+
+        raw = json.dumps(data, indent=2).encode('utf-8')
+        self.rules_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.rules_path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(raw)
+            os.replace(tmp_path, self.rules_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        stat = os.stat(self.rules_path)
+        self._install(data, hashlib.sha256(raw).hexdigest()[:16])
+        self._stat_key = (stat.st_mtime_ns, stat.st_size)
+        logger.info(f"Saved pricing rules version {self.version}")
+
+
+# Global engine instance
+_pricing_rule_engine = None
+
+
+def get_pricing_rule_engine() -> PricingRuleEngine:
+    """
+    Get the global pricing rule engine, refreshed against the rules file.
+
+    Returns:
+        PricingRuleEngine instance (singleton)
+    """
+    global _pricing_rule_engine
+    if _pricing_rule_engine is None:
+        _pricing_rule_engine = PricingRuleEngine()
+    _pricing_rule_engine.refresh()
+    return _pricing_rule_engine